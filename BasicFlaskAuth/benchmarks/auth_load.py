@@ -0,0 +1,229 @@
+"""Load test of GET /headers against a local token issuer standing in for Auth0.
+
+Run from the BasicFlaskAuth folder:
+    python benchmarks/auth_load.py --concurrency 32 --requests 2000 --jwks-latency-ms 50
+
+The app runs on a threaded local server; every client thread keeps its
+own connection. Scenarios:
+- baseline: a route without auth, the cost of the server itself, under
+  load and in a wave of simultaneous requests
+- warm keys: the key set is cached, every request sends the same token
+  (token cache hits) or a new one (signature check on every request)
+- cold keys: the key set and token caches are emptied, then every client
+  sends a request at the same moment
+- key rotation: the issuer switches to a new key, then every client sends a
+  token signed with it at the same moment
+--jwks-latency-ms delays every key set response to mimic the round trip to Auth0.
+"""
+import argparse
+import contextlib
+import http.client
+import itertools
+import os
+import statistics
+import sys
+import threading
+import time
+
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+BASIC_AUTH_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASIC_AUTH_DIR)
+
+from shared_auth.issuer import ALGORITHMS, LocalIssuer  # noqa: E402
+from shared_auth.metrics import STAGES  # noqa: E402
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    def log_request(self, *args):
+        pass
+
+
+class Client:
+    def __init__(self, port):
+        self.connection = http.client.HTTPConnection('localhost', port)
+        self.connection.connect()
+
+    def get(self, path, token=None):
+        headers = {'Authorization': f'Bearer {token}'} if token else {}
+        start = time.perf_counter()
+        self.connection.request('GET', path, headers=headers)
+        response = self.connection.getresponse()
+        response.read()
+        return response.status, (time.perf_counter() - start) * 1000
+
+    def close(self):
+        self.connection.close()
+
+
+# run(port, concurrency, requests, path, tokens)
+#     sends requests from concurrency client threads, as fast as they can
+#     tokens: a function of the request number, or None for no token
+
+def run(port, concurrency, requests, path, tokens=None):
+    numbers = itertools.count()
+    latencies, errors = [], []
+
+    def client_thread():
+        client = Client(port)
+        for number in iter(lambda: next(numbers), None):
+            if number >= requests:
+                break
+            status, elapsed = client.get(path, tokens(number) if tokens else None)
+            latencies.append(elapsed)
+            if status != 200:
+                errors.append(status)
+        client.close()
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=client_thread) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors, requests / (time.perf_counter() - start)
+
+
+# wave(port, path, tokens)
+#     one request per token, all sent at the same moment from their own thread
+
+def wave(port, path, tokens):
+    barrier = threading.Barrier(len(tokens))
+    latencies, errors = [], []
+
+    def client_thread(token):
+        client = Client(port)
+        barrier.wait()
+        status, elapsed = client.get(path, token)
+        latencies.append(elapsed)
+        if status != 200:
+            errors.append(status)
+        client.close()
+
+    threads = [threading.Thread(target=client_thread, args=(token,)) for token in tokens]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--rounds', type=int, default=5, help='of the cold key and key rotation waves')
+    parser.add_argument('--jwks-latency-ms', type=float, default=50)
+    parser.add_argument('--algorithm', choices=ALGORITHMS, default='RS256', help='of the issued tokens')
+    args = parser.parse_args()
+
+    os.environ['AUTH0_ALGORITHMS'] = args.algorithm
+    import app as basic_auth
+
+    issuer = LocalIssuer(f'https://{basic_auth.AUTH0_DOMAIN}/', basic_auth.API_AUDIENCE, args.algorithm,
+                         latency=args.jwks_latency_ms / 1000)
+    issuer.start()
+    key_source = basic_auth.auth.key_source
+    key_source.url = issuer.jwks_url
+    # a rotation is picked up at once instead of 30 seconds after the last fetch
+    key_source.min_refresh_interval = 0
+    token_cache = basic_auth.auth.token_cache
+    metrics = basic_auth.auth.metrics
+
+    app = basic_auth.app
+    app.add_url_rule('/baseline', 'baseline', lambda: 'ok')
+    server = make_server('localhost', 0, app, threaded=True, request_handler=QuietRequestHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    print(f'minting tokens for {args.requests} requests ...')
+    token = issuer.mint(['get:image'])
+    new_tokens = [issuer.mint(['get:image'], jti=str(n)) for n in range(args.requests)]
+
+    results = []
+    stages = []
+
+    # the auth p50 column compares with the baseline of the same kind of run;
+    # the stages of requires_auth come from auth.metrics, as measured by the app
+    def record(name, latencies, errors, fetches, throughput=None):
+        p50 = statistics.median(latencies)
+        baseline = next((result[4] for result in results if result[0].startswith('baseline')
+                         and (result[3] is None) == (throughput is None)), p50)
+        results.append((name, len(latencies), len(errors), throughput, p50, percentile(latencies, 0.95),
+                        percentile(latencies, 0.99), max(latencies), fetches, p50 - baseline))
+        if not name.startswith('baseline'):
+            stages.append((name, metrics.stats()['stages']))
+        metrics.clear()
+
+    # /headers prints every payload
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        run(server.port, args.concurrency, args.concurrency, '/headers', lambda n: token)
+        metrics.clear()
+
+        latencies, errors, throughput = run(server.port, args.concurrency, args.requests, '/baseline')
+        record('baseline, no auth', latencies, errors, 0, throughput)
+
+        fetches = issuer.jwks_requests
+        latencies, errors, throughput = run(server.port, args.concurrency, args.requests, '/headers',
+                                            lambda n: token)
+        record('warm keys, same token', latencies, errors, issuer.jwks_requests - fetches, throughput)
+
+        token_cache.clear()
+        fetches = issuer.jwks_requests
+        latencies, errors, throughput = run(server.port, args.concurrency, args.requests, '/headers',
+                                            lambda n: new_tokens[n])
+        record('warm keys, new tokens', latencies, errors, issuer.jwks_requests - fetches, throughput)
+
+        latencies = []
+        for _ in range(args.rounds):
+            latencies += wave(server.port, '/baseline', [None] * args.concurrency)[0]
+        record(f'baseline, {args.rounds} waves', latencies, [], 0)
+
+        cold = ([], [], 0)
+        for _ in range(args.rounds):
+            tokens = [issuer.mint(['get:image'], jti=f'cold-{n}') for n in range(args.concurrency)]
+            key_source.clear()
+            token_cache.clear()
+            fetches = issuer.jwks_requests
+            latencies, errors = wave(server.port, '/headers', tokens)
+            cold = (cold[0] + latencies, cold[1] + errors, cold[2] + issuer.jwks_requests - fetches)
+        record(f'cold keys, {args.rounds} waves', *cold)
+
+        rotation = ([], [], 0)
+        for _ in range(args.rounds):
+            issuer.rotate()
+            tokens = [issuer.mint(['get:image'], jti=f'rotation-{n}') for n in range(args.concurrency)]
+            fetches = issuer.jwks_requests
+            latencies, errors = wave(server.port, '/headers', tokens)
+            rotation = (rotation[0] + latencies, rotation[1] + errors,
+                        rotation[2] + issuer.jwks_requests - fetches)
+        record(f'key rotation, {args.rounds} waves', *rotation)
+
+    server.shutdown()
+    issuer.stop()
+
+    print(f'{args.concurrency} clients, {args.algorithm} tokens, JWKS latency {args.jwks_latency_ms:.0f} ms, '
+          f'latencies in ms')
+    print(f'{"scenario":<26}{"requests":>9}{"errors":>7}{"req/s":>8}'
+          f'{"p50":>8}{"p95":>8}{"p99":>8}{"max":>8}{"JWKS":>6}{"auth p50":>10}')
+    for name, requests, errors, throughput, p50, p95, p99, slowest, fetches, auth_p50 in results:
+        rate = f'{throughput:.0f}' if throughput else '-'
+        print(f'{name:<26}{requests:>9}{errors:>7}{rate:>8}'
+              f'{p50:>8.2f}{p95:>8.2f}{p99:>8.2f}{slowest:>8.2f}{fetches:>6}{auth_p50:>10.2f}')
+
+    print()
+    print('time in requires_auth per stage, mean / p95 in ms')
+    columns = [stage for stage in STAGES if any(stage in by_stage for _, by_stage in stages)]
+    print(f'{"scenario":<26}' + ''.join(f'{stage:>16}' for stage in columns))
+    for name, by_stage in stages:
+        print(f'{name:<26}' + ''.join(
+            f'{by_stage[stage]["mean_ms"]:>8.3f} /{by_stage[stage]["p95_ms"]:>6.2f}' if stage in by_stage
+            else f'{"-":>16}' for stage in columns))
+
+
+if __name__ == '__main__':
+    main()
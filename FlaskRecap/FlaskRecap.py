@@ -1,33 +1,30 @@
 from flask import Flask, request, jsonify, abort
 
+from greeting_store import create_store
+
 app = Flask(__name__)
 
-greetings = {
-            'en': 'hello', 
-            'es': 'Hola', 
-            'ar': 'مرحبا',
-            'ru': 'Привет',
-            'fi': 'Hei',
-            'he': 'שלום',
-            'ja': 'こんにちは'
-            }
+# in memory, or in the SQLite file named by GREETINGS_DB for all workers
+greetings = create_store()
 
 @app.route('/greeting', methods=['GET'])
 def greeting_all():
-    return jsonify({'greetings': greetings})
+    return jsonify({'greetings': greetings.all()})
 
 @app.route('/greeting/<lang>', methods=['GET'])
 def greeting_one(lang):
     print(lang)
-    if(lang not in greetings):
+    greeting = greetings.get(lang)
+    if(greeting is None):
         abort(404)
-    return jsonify({'greeting': greetings[lang
-    ]})
+    return jsonify({'greeting': greeting})
 
 @app.route('/greeting', methods=['POST'])
 def greeting_add():
     info = request.get_json()
     if('lang' not in info or 'greeting' not in info):
         abort(422)
-    greetings[info['lang']] = info['greeting']
-    return jsonify({'greetings':greetings})
+    # a greeting that is not a string would be stored as it is
+    if(not isinstance(info['lang'], str) or not isinstance(info['greeting'], str)):
+        abort(400)
+    return jsonify({'greetings': greetings.add(info['lang'], info['greeting'])})
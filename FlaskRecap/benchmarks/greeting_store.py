@@ -0,0 +1,150 @@
+"""Benchmark of mixed greeting reads and writes on each greeting store.
+
+Run from the FlaskRecap folder:
+    python benchmarks/greeting_store.py --processes 4 --threads 4 --write-ratio 0.1
+
+Every process runs several threads that read all greetings or one
+greeting, serialized to JSON like the routes do, or add one of --langs
+greetings. The old module level dict is measured as a baseline. After the
+run a fresh store in the parent process, like a new worker or a restart,
+checks which of the written languages it knows: a store that all workers
+share knows every one of them.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from greeting_store import DEFAULT_GREETINGS, MemoryGreetingStore, SQLiteGreetingStore  # noqa: E402
+
+
+# the greetings dict of the app before the stores, changed in place
+class DictGreetingStore:
+    def __init__(self, greetings=DEFAULT_GREETINGS):
+        self.greetings = dict(greetings)
+
+    def all(self):
+        return self.greetings
+
+    def get(self, lang):
+        return self.greetings.get(lang)
+
+    def add(self, lang, greeting):
+        self.greetings[lang] = greeting
+        return self.greetings
+
+
+def create_store(name, path):
+    if name == 'dict':
+        return DictGreetingStore()
+    if name == 'memory':
+        return MemoryGreetingStore()
+    return SQLiteGreetingStore(path)
+
+
+def run_thread(store, args, worker, deadline, results, written):
+    langs = [f'lang-{n}' for n in range(args.langs)]
+    writes = 0
+
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            if random.random() < args.write_ratio:
+                kind = 'write'
+                writes += 1
+                lang = random.choice(langs)
+                greeting = f'{worker}-{writes}'
+                json.dumps({'greetings': store.add(lang, greeting)})
+                written.add(lang)
+            elif random.random() < 0.5:
+                kind = 'read all'
+                json.dumps({'greetings': store.all()})
+            else:
+                kind = 'read one'
+                json.dumps({'greeting': store.get(random.choice(langs))})
+        except Exception:
+            results['errors'] += 1
+            continue
+        results[kind].append((time.perf_counter() - start) * 1e6)
+
+
+def run_process(name, args, path, worker, deadline, queue):
+    store = create_store(name, path)
+    results = {'read all': [], 'read one': [], 'write': [], 'errors': 0}
+    written = set()
+    threads = [threading.Thread(target=run_thread,
+                                args=(store, args, f'{worker}.{n}', deadline, results, written))
+               for n in range(args.threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    queue.put((results, written))
+
+
+def run_store(name, args):
+    folder = tempfile.mkdtemp()
+    path = os.path.join(folder, 'greetings.db')
+    # created before the workers fork, so the sqlite file exists
+    create_store(name, path)
+
+    queue = multiprocessing.Queue()
+    deadline = time.perf_counter() + args.seconds
+    processes = [multiprocessing.Process(target=run_process, args=(name, args, path, n, deadline, queue))
+                 for n in range(args.processes)]
+    for process in processes:
+        process.start()
+    outputs = [queue.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    merged = {'read all': [], 'read one': [], 'write': [], 'errors': 0}
+    written = set()
+    for results, langs in outputs:
+        merged['errors'] += results['errors']
+        for kind in ('read all', 'read one', 'write'):
+            merged[kind] += results[kind]
+        written.update(langs)
+
+    seen = create_store(name, path).all()
+    visible = sum(1 for lang in written if lang in seen)
+    return merged, len(written), visible
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=3)
+    parser.add_argument('--write-ratio', type=float, default=0.1)
+    parser.add_argument('--langs', type=int, default=100, help='distinct greetings that are written')
+    parser.add_argument('--stores', default='dict,memory,sqlite')
+    args = parser.parse_args()
+
+    print(f'{args.processes} processes x {args.threads} threads, {args.seconds:.0f} s, '
+          f'{args.write_ratio:.0%} writes, latencies in us')
+    print(f'{"store":<8}{"ops/s":>9}{"errors":>8}{"read all p50":>14}{"p99":>8}'
+          f'{"write p50":>11}{"p99":>8}{"langs seen":>12}')
+    for name in args.stores.split(','):
+        results, written, visible = run_store(name, args)
+        operations = sum(len(results[kind]) for kind in ('read all', 'read one', 'write'))
+
+        def p(kind, fraction):
+            values = sorted(results[kind])
+            return values[min(len(values) - 1, int(len(values) * fraction))] if values else 0
+
+        print(f'{name:<8}{operations / args.seconds:>9.0f}{results["errors"]:>8}'
+              f'{statistics.median(results["read all"]):>14.1f}{p("read all", 0.99):>8.1f}'
+              f'{p("write", 0.5):>11.1f}{p("write", 0.99):>8.1f}{f"{visible}/{written}":>12}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+DEFAULT_GREETINGS = {
+    'en': 'hello',
+    'es': 'Hola',
+    'ar': 'مرحبا',
+    'ru': 'Привет',
+    'fi': 'Hei',
+    'he': 'שלום',
+    'ja': 'こんにちは'
+}
+
+# A greeting store keeps the greetings by language:
+#     store.all()                  all greetings, a dict the caller must not modify
+#     store.get(lang)              one greeting, or None
+#     store.add(lang, greeting)    adds or replaces a greeting, returns all()
+
+
+# MemoryGreetingStore
+#     greetings of this process only, lost on restart
+#     - copy-on-write: a write copies the dict, changes the copy and swaps it
+#       in, so a dict handed to a reader never changes while it is serialized
+#     - readers take no lock; writers take one, so no write is lost
+
+class MemoryGreetingStore:
+    def __init__(self, greetings=DEFAULT_GREETINGS):
+        self._greetings = dict(greetings)
+        self._lock = threading.Lock()
+
+    def all(self):
+        return self._greetings
+
+    def get(self, lang):
+        return self._greetings.get(lang)
+
+    def add(self, lang, greeting):
+        with self._lock:
+            greetings = dict(self._greetings)
+            greetings[lang] = greeting
+            self._greetings = greetings
+        return greetings
+
+
+# SQLiteGreetingStore
+#     greetings in a SQLite file shared by all worker processes, kept across restarts
+#     - WAL mode: readers never wait for the writer; a second writer waits
+#       up to 5 seconds for the lock instead of failing
+#     - connections are pooled per process and reused by any thread
+#     - every connection keeps the greetings it read last, and reads the
+#       table again only when PRAGMA data_version says another connection
+#       committed since
+#     - the default greetings are added when the table is created
+
+class SQLiteGreetingStore:
+    def __init__(self, path, greetings=DEFAULT_GREETINGS):
+        self.path = path
+        self._pid = None
+        self._pool = None
+
+        # workers starting at the same time create and seed the table once
+        with self._connection() as pooled:
+            connection = pooled.connection
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                connection.execute('CREATE TABLE IF NOT EXISTS greeting ('
+                                   'lang TEXT PRIMARY KEY, greeting TEXT NOT NULL)')
+                if connection.execute('SELECT 1 FROM greeting LIMIT 1').fetchone() is None:
+                    connection.executemany('INSERT INTO greeting (lang, greeting) VALUES (?, ?)',
+                                           greetings.items())
+                connection.execute('COMMIT')
+            except sqlite3.Error:
+                connection.execute('ROLLBACK')
+                raise
+
+    @contextmanager
+    def _connection(self):
+        # a forked worker opens its own connections
+        if self._pid != os.getpid():
+            self._pool = queue.LifoQueue()
+            self._pid = os.getpid()
+
+        pool = self._pool
+        try:
+            pooled = pool.get_nowait()
+        except queue.Empty:
+            pooled = PooledConnection(self.path)
+        try:
+            yield pooled
+        finally:
+            pool.put(pooled)
+
+    def all(self):
+        with self._connection() as pooled:
+            return pooled.greetings()
+
+    def get(self, lang):
+        return self.all().get(lang)
+
+    def add(self, lang, greeting):
+        with self._connection() as pooled:
+            pooled.connection.execute('INSERT OR REPLACE INTO greeting (lang, greeting) VALUES (?, ?)',
+                                      (lang, greeting))
+            # data_version does not change for the connection's own commits
+            pooled.cached = None
+            return pooled.greetings()
+
+
+class PooledConnection:
+    __slots__ = ('connection', 'data_version', 'cached')
+
+    def __init__(self, path):
+        # autocommit, every statement is its own transaction
+        self.connection = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.data_version = None
+        self.cached = None
+
+    def greetings(self):
+        data_version = self.connection.execute('PRAGMA data_version').fetchone()[0]
+        if self.cached is None or data_version != self.data_version:
+            self.cached = dict(self.connection.execute('SELECT lang, greeting FROM greeting'))
+            self.data_version = data_version
+        return self.cached
+
+
+# create_store()
+#     SQLiteGreetingStore when GREETINGS_DB names a file, else MemoryGreetingStore
+
+def create_store():
+    path = os.environ.get('GREETINGS_DB')
+    if path:
+        return SQLiteGreetingStore(path)
+    return MemoryGreetingStore()
@@ -0,0 +1,94 @@
+import os
+import tempfile
+import unittest
+
+# the app keeps its greetings in memory, never in the GREETINGS_DB file
+os.environ.pop('GREETINGS_DB', None)
+
+from FlaskRecap import app  # noqa: E402
+from greeting_store import DEFAULT_GREETINGS, MemoryGreetingStore, SQLiteGreetingStore  # noqa: E402
+
+
+class MemoryGreetingStoreTestCase(unittest.TestCase):
+    """Checks that the in-memory store copies on write"""
+
+    def setUp(self):
+        self.store = MemoryGreetingStore()
+
+    def test_add_leaves_dict_of_readers_unchanged(self):
+        before = self.store.all()
+        after = self.store.add('de', 'Hallo')
+
+        self.assertNotIn('de', before)
+        self.assertEqual(after['de'], 'Hallo')
+        self.assertIs(self.store.all(), after)
+
+    def test_add_leaves_default_greetings_unchanged(self):
+        self.store.add('en', 'hi')
+
+        self.assertEqual(self.store.get('en'), 'hi')
+        self.assertEqual(DEFAULT_GREETINGS['en'], 'hello')
+        self.assertEqual(MemoryGreetingStore().get('en'), 'hello')
+
+
+class SQLiteGreetingStoreTestCase(unittest.TestCase):
+    """Checks the SQLite store against a fresh file, read by two stores as by two workers"""
+
+    def setUp(self):
+        self.path = os.path.join(tempfile.mkdtemp(), 'greetings.db')
+        self.store = SQLiteGreetingStore(self.path)
+        # its own connection, like another worker process
+        self.other = SQLiteGreetingStore(self.path)
+
+    def test_default_greetings_added_once(self):
+        self.store.add('en', 'hi')
+        SQLiteGreetingStore(self.path)
+
+        self.assertEqual(self.store.all(), dict(DEFAULT_GREETINGS, en='hi'))
+
+    def test_read_is_cached_until_data_version_changes(self):
+        greetings = self.other.all()
+
+        self.assertIs(self.other.all(), greetings)
+
+        self.store.add('de', 'Hallo')
+
+        self.assertEqual(self.other.get('de'), 'Hallo')
+        self.assertIsNot(self.other.all(), greetings)
+
+    def test_add_is_seen_by_own_connection(self):
+        # data_version does not change for the connection's own commits
+        self.store.all()
+
+        self.assertEqual(self.store.add('de', 'Hallo')['de'], 'Hallo')
+        self.assertEqual(self.store.get('de'), 'Hallo')
+
+
+class GreetingTestCase(unittest.TestCase):
+    """Checks POST /greeting"""
+
+    def setUp(self):
+        self.client = app.test_client()
+
+    def test_add_greeting(self):
+        res = self.client.post('/greeting', json={'lang': 'de', 'greeting': 'Hallo'})
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json['greetings']['de'], 'Hallo')
+
+    def test_422_greeting_missing(self):
+        res = self.client.post('/greeting', json={'lang': 'de'})
+
+        self.assertEqual(res.status_code, 422)
+
+    def test_400_greeting_not_a_string(self):
+        for info in ({'lang': 'nl', 'greeting': {'text': 'Hallo'}}, {'lang': 'nl', 'greeting': 1},
+                     {'lang': ['nl'], 'greeting': 'Hallo'}):
+            res = self.client.post('/greeting', json=info)
+
+            self.assertEqual(res.status_code, 400)
+        self.assertEqual(self.client.get('/greeting/nl').status_code, 404)
+
+
+if __name__ == "__main__":
+    unittest.main()
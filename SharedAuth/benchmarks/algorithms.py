@@ -0,0 +1,93 @@
+"""Benchmark of token verification per algorithm, and of session cookies.
+
+Run from the SharedAuth folder:
+    python benchmarks/algorithms.py --tokens 1000
+
+Every token is different, so each one is verified (the token cache is
+off). Verification is measured on its own and per request of an authorized
+endpoint through the Flask test client; a session cookie is checked with an
+HMAC instead of the token signature.
+"""
+import argparse
+import os
+import sys
+import time
+
+from flask import Flask
+from jose import jwk
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared_auth import Auth, PEMKeySource  # noqa: E402
+from shared_auth.issuer import ALGORITHMS, LocalIssuer  # noqa: E402
+
+ISSUER = 'https://benchmark.local/'
+AUDIENCE = 'benchmark'
+SESSION_SECRET = 'benchmark-session-secret-of-32-bytes'
+
+
+def create_app(auth):
+    app = Flask(__name__)
+
+    @app.route('/image')
+    @auth.requires_auth('get:image')
+    def image(payload):
+        return 'Access Granted'
+
+    return app
+
+
+def rate(count, function):
+    start = time.perf_counter()
+    function()
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tokens', type=int, default=1000)
+    args = parser.parse_args()
+
+    print(f'python-jose backend: RSA {jwk.get_key("RS256").__name__}, EC {jwk.get_key("ES256").__name__}')
+    print(f'{"":<22}{"verifications/s":>16}{"requests/s":>12}')
+
+    for algorithm in ALGORITHMS:
+        issuer = LocalIssuer(ISSUER, AUDIENCE, algorithm)
+        public_key = jwk.construct(issuer.jwks()['keys'][0], algorithm)
+        auth = Auth(PEMKeySource(public_key.to_pem().decode(), algorithm),
+                    audience=AUDIENCE, issuer=ISSUER, algorithms=[algorithm], token_cache_size=0)
+        tokens = [issuer.mint(['get:image'], jti=str(n)) for n in range(args.tokens)]
+
+        def verify():
+            for token in tokens:
+                auth.verify_decode_jwt(token)
+
+        client = create_app(auth).test_client()
+
+        def request():
+            for token in tokens:
+                assert client.get('/image', headers={'Authorization': f'Bearer {token}'}).status_code == 200
+
+        print(f'{algorithm + " token":<22}{rate(len(tokens), verify):>16.0f}{rate(len(tokens), request):>12.0f}')
+
+    # sessions, started from the last tokens
+    auth = Auth(auth.key_source, audience=AUDIENCE, issuer=ISSUER, algorithms=auth.algorithms,
+                token_cache_size=0, session_secret=SESSION_SECRET)
+    sessions = [auth.sessions.sign(auth.verify_decode_jwt(token))[0] for token in tokens]
+
+    def verify():
+        for session in sessions:
+            auth.verify_session(session)
+
+    # the cookie is sent as a header, like a browser would
+    client = create_app(auth).test_client(use_cookies=False)
+
+    def request():
+        for session in sessions:
+            assert client.get('/image', headers={'Cookie': f'{auth.session_cookie}={session}'}).status_code == 200
+
+    print(f'{"HS256 session cookie":<22}{rate(len(sessions), verify):>16.0f}{rate(len(sessions), request):>12.0f}')
+
+
+if __name__ == '__main__':
+    main()
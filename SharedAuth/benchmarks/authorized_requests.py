@@ -0,0 +1,89 @@
+"""Benchmark of requests/sec of an authorized Flask endpoint.
+
+Run from the SharedAuth folder:
+    python benchmarks/authorized_requests.py --requests 2000
+
+Compares a key parsed from its JWK on every request, as the apps used to
+do, with a prepared key object, and with a prepared key plus the token cache.
+"""
+import argparse
+import base64
+import os
+import sys
+import time
+
+from Crypto.PublicKey import RSA
+from flask import Flask
+from jose import jwt
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared_auth import Auth, PEMKeySource  # noqa: E402
+
+ISSUER = 'https://benchmark.local/'
+AUDIENCE = 'benchmark'
+KID = 'benchmark-key'
+
+
+def b64_int(value):
+    data = value.to_bytes((value.bit_length() + 7) // 8, 'big')
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode()
+
+
+# the key as it comes in a JWKS, parsed again by jose on every decode
+class JWKDictKeySource:
+    def __init__(self, public_key):
+        self.key = {'kty': 'RSA', 'kid': KID, 'use': 'sig', 'n': b64_int(public_key.n), 'e': b64_int(public_key.e)}
+
+    def get_key(self, kid):
+        return self.key if kid == KID else None
+
+
+def create_app(auth):
+    app = Flask(__name__)
+
+    @app.route('/image')
+    @auth.requires_auth('get:image')
+    def image(payload):
+        return 'Access Granted'
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--permissions', type=int, default=20, help='permissions in the token')
+    args = parser.parse_args()
+
+    private_key = RSA.generate(2048)
+    public_pem = private_key.publickey().export_key().decode()
+    token = jwt.encode({
+        'iss': ISSUER,
+        'aud': AUDIENCE,
+        'exp': int(time.time()) + 3600,
+        'permissions': [f'do:thing-{n}' for n in range(args.permissions - 1)] + ['get:image']
+    }, private_key.export_key().decode(), algorithm='RS256', headers={'kid': KID})
+    headers = {'Authorization': f'Bearer {token}'}
+
+    variants = [
+        ('JWK parsed per request', JWKDictKeySource(private_key.publickey()), 0),
+        ('prepared key', PEMKeySource(public_pem, kid=KID), 0),
+        ('prepared key + token cache', PEMKeySource(public_pem, kid=KID), 1024),
+    ]
+
+    print(f'GET /image with a valid token, {args.requests} requests')
+    for name, key_source, token_cache_size in variants:
+        auth = Auth(key_source, audience=AUDIENCE, issuer=ISSUER, token_cache_size=token_cache_size)
+        client = create_app(auth).test_client()
+        assert client.get('/image', headers=headers).status_code == 200
+
+        start = time.perf_counter()
+        for _ in range(args.requests):
+            client.get('/image', headers=headers)
+        elapsed = time.perf_counter() - start
+        print(f'{name:<28}{args.requests / elapsed:>10.0f} requests/s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,18 @@
+from setuptools import setup
+
+setup(
+    name='shared-auth',
+    version='0.1.0',
+    description='Auth0 JWT verification for the Flask apps of this repository',
+    packages=['shared_auth'],
+    install_requires=[
+        'Flask>=1.1',
+        'python-jose>=3.3',
+    ],
+    extras_require={
+        # shared_auth.issuer, the local stand-in for Auth0
+        'issuer': ['pycryptodome'],
+        # python-jose verifies with it instead of the pure python rsa and ecdsa
+        'cryptography': ['cryptography>=3.4'],
+    },
+)
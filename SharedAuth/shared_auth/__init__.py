@@ -0,0 +1,6 @@
+from .audit import AuditLog
+from .auth import Auth, AuthError, Claims, get_token_auth_header
+from .keys import SUPPORTED_ALGORITHMS, JWKSKeySource, PEMKeySource
+from .metrics import AuthMetrics
+from .sessions import SessionSigner
+from .token_cache import TokenCache
@@ -0,0 +1,91 @@
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from logging.handlers import QueueListener
+
+from flask import has_request_context, request
+
+
+# the stop sentinel waits for room on a full queue, QueueListener's own
+# put_nowait raises queue.Full there
+class AuditQueueListener(QueueListener):
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+
+# AuditLog
+#     a sampled log of requires_auth calls, one JSON line per call
+#         AuditLog(logging.FileHandler('auth_audit.log', delay=True), sample_rate=0.01)
+#     - authorized calls are logged with sample_rate, failed ones with
+#       failure_sample_rate (default all of them)
+#     - requests only put the record on a bounded queue; a background thread
+#       writes it to the handler (default stderr). When the queue is full the
+#       record is dropped and counted, a request never waits for the log
+#     - the thread is started with the first record, again after a fork
+
+class AuditLog:
+    def __init__(self, handler=None, sample_rate=0.01, failure_sample_rate=1.0, queue_size=10000):
+        self.handler = handler or logging.StreamHandler()
+        self.sample_rate = sample_rate
+        self.failure_sample_rate = failure_sample_rate
+        self.queue_size = queue_size
+        self.queued = 0
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self._queue = None
+        self._listener = None
+        self._pid = None
+
+    def _start(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                self._queue = queue.Queue(self.queue_size)
+                self._listener = AuditQueueListener(self._queue, self.handler)
+                self._listener.start()
+                self._pid = os.getpid()
+        return self._queue
+
+    def record(self, attempt, permission):
+        rate = self.sample_rate if attempt.code is None else self.failure_sample_rate
+        if rate < 1 and random.random() >= rate:
+            return
+
+        event = {
+            'time': round(time.time(), 3),
+            'outcome': attempt.code or 'authorized',
+            'permission': permission,
+            'sub': attempt.sub,
+            'ms': {stage: round(seconds * 1000, 3) for stage, seconds in attempt.timings.items()}
+        }
+        if has_request_context():
+            event['method'] = request.method
+            event['path'] = request.path
+
+        audit_queue = self._queue if self._pid == os.getpid() else self._start()
+        try:
+            audit_queue.put_nowait(logging.makeLogRecord({
+                'name': 'shared_auth.audit',
+                'levelno': logging.INFO,
+                'levelname': 'INFO',
+                'msg': json.dumps(event)
+            }))
+            self.queued += 1
+        except queue.Full:
+            self.dropped += 1
+
+    # stop()
+    #     writes the queued records and stops the thread
+
+    def stop(self):
+        with self._lock:
+            if self._listener is not None and self._pid == os.getpid():
+                self._listener.stop()
+            self._listener = None
+            self._pid = None
+
+    def stats(self):
+        return {'queued': self.queued, 'dropped': self.dropped}
@@ -0,0 +1,304 @@
+import time
+from functools import wraps
+
+from flask import abort, after_this_request, request
+from jose import jwt
+from jose.exceptions import JWTError
+
+from .keys import check_algorithms
+from .metrics import NO_ATTEMPT, Attempt, AuthMetrics
+from .sessions import SessionSigner
+from .token_cache import TokenCache
+
+
+# AuthError Exception: standardized way to communicate auth failure modes
+
+class AuthError(Exception):
+    def __init__(self, error, status_code):
+        self.error = error
+        self.status_code = status_code
+
+
+# Claims
+#     the verified payload of a token, a plain dict for the route handlers
+#     - the permissions claim is turned into a frozenset once, when the token
+#       is verified, so every permission check is a set lookup
+#     - with the token cache, the same Claims object is shared by all
+#       requests with that token and must not be modified
+
+class Claims(dict):
+    __slots__ = ('permissions',)
+
+    def __init__(self, payload):
+        super().__init__(payload)
+        permissions = payload.get('permissions')
+        self.permissions = frozenset(permissions) if isinstance(permissions, list) else None
+
+
+def get_token_auth_header():
+    # get the header from the request
+    auth = request.headers.get('Authorization', None)
+    # raise an AuthError if no header is present
+    if not auth:
+        raise AuthError({
+            'code': 'authorization_header_missing',
+            'description': 'Authorization header is expected.'
+        }, 401)
+
+    # split bearer and the token
+    parts = auth.split()
+    if parts[0].lower() != 'bearer':
+        raise AuthError({
+            'code': 'invalid_header',
+            'description': 'Authorization header must start with "Bearer".'
+        }, 401)
+
+    # raise an AuthError if the header is malformed
+    elif len(parts) == 1:
+        raise AuthError({
+            'code': 'invalid_header',
+            'description': 'Token not found.'
+        }, 401)
+
+    elif len(parts) > 2:
+        raise AuthError({
+            'code': 'invalid_header',
+            'description': 'Authorization header must be bearer token.'
+        }, 401)
+
+    # return the token part of the header
+    return parts[1]
+
+
+# Auth
+#     verifies the tokens of one API and guards its routes
+#         auth = Auth(JWKSKeySource(f'https://{AUTH0_DOMAIN}/.well-known/jwks.json'),
+#                     audience=API_AUDIENCE, issuer=f'https://{AUTH0_DOMAIN}/')
+#
+#         @app.route('/headers')
+#         @auth.requires_auth('get:image')
+#         def headers(payload):
+#             ...
+#     - key_source: a JWKSKeySource or PEMKeySource, see keys.py
+#     - algorithms: some of keys.SUPPORTED_ALGORITHMS
+#     - token_cache_size: verified tokens kept until they expire, 0 turns the cache off
+#     - permission_denied_status: answer to a valid token without the permission
+#     - session_secret: turns on sessions, see SessionSigner in sessions.py;
+#       a request with a verified bearer token gets a session cookie, a
+#       request without an Authorization header is authorized by its cookie
+#     - session_max_age, session_cookie, session_cookie_secure: of the cookie
+#     - audit_log: an AuditLog of the requires_auth calls, see audit.py
+#     every requires_auth call is timed per stage and counted by outcome in
+#     auth.metrics, see metrics.py
+
+class Auth:
+    def __init__(self, key_source, audience, issuer, algorithms=('RS256',),
+                 token_cache_size=1024, permission_denied_status=403,
+                 session_secret=None, session_max_age=300,
+                 session_cookie='auth_session', session_cookie_secure=True,
+                 audit_log=None):
+        self.key_source = key_source
+        self.audience = audience
+        self.issuer = issuer
+        self.algorithms = check_algorithms(algorithms)
+        self.token_cache = TokenCache(token_cache_size)
+        self.permission_denied_status = permission_denied_status
+        self.sessions = SessionSigner(session_secret, session_max_age) if session_secret else None
+        self.session_cookie = session_cookie
+        self.session_cookie_secure = session_cookie_secure
+        self.metrics = AuthMetrics()
+        self.audit_log = audit_log
+
+    def verify_decode_jwt(self, token, attempt=NO_ATTEMPT):
+        # a token verified before is trusted until it expires
+        claims = self.token_cache.get(token)
+        attempt.lap('token_cache')
+        if claims is not None:
+            return claims
+
+        try:
+            unverified_header = jwt.get_unverified_header(token)
+        except JWTError:
+            raise AuthError({
+                'code': 'invalid_header',
+                'description': 'Unable to parse authentication token.'
+            }, 401)
+
+        # check whether the token names its signing key (kid)
+        if 'kid' not in unverified_header:
+            raise AuthError({
+                'code': 'invalid_header',
+                'description': 'Authorization malformed.'
+            }, 401)
+
+        attempt.lap('header')
+        try:
+            key = self.key_source.get_key(unverified_header['kid'])
+        except (OSError, ValueError, KeyError):
+            raise AuthError({
+                'code': 'jwks_unavailable',
+                'description': 'Unable to fetch the signing keys.'
+            }, 503)
+
+        if key is None:
+            raise AuthError({
+                'code': 'invalid_header',
+                'description': 'Unable to find the appropriate key.'
+            }, 400)
+
+        attempt.lap('key')
+        try:
+            # the key is a prepared jose key object, nothing is parsed here
+            payload = jwt.decode(token, key, algorithms=self.algorithms,
+                                 audience=self.audience, issuer=self.issuer)
+
+        # validate the claims
+        except jwt.ExpiredSignatureError:
+            raise AuthError({
+                'code': 'token_expired',
+                'description': 'Token expired.'
+            }, 401)
+
+        except jwt.JWTClaimsError:
+            raise AuthError({
+                'code': 'invalid_claims',
+                'description': 'Incorrect claims. Please, check the audience and issuer.'
+            }, 401)
+
+        except Exception:
+            raise AuthError({
+                'code': 'invalid_header',
+                'description': 'Unable to parse authentication token.'
+            }, 400)
+
+        claims = Claims(payload)
+        self.token_cache.put(token, claims)
+        attempt.lap('signature')
+        return claims
+
+    # verify_session(session)
+    #     the claims of a session cookie; an invalid or expired one is deleted
+    #     and answered with 401, so the client sends its token again
+
+    def verify_session(self, session):
+        claims = self.sessions.verify(session)
+        if claims is None:
+            error = AuthError({
+                'code': 'invalid_session',
+                'description': 'Unable to parse the session.'
+            }, 401)
+        elif claims['exp'] <= time.time():
+            error = AuthError({
+                'code': 'session_expired',
+                'description': 'Session expired, send the token again.'
+            }, 401)
+        else:
+            return Claims(claims)
+
+        @after_this_request
+        def delete_session_cookie(response):
+            response.delete_cookie(self.session_cookie)
+            return response
+
+        raise error
+
+    # start_session(payload)
+    #     sets a session cookie for the verified payload on the response
+
+    def start_session(self, payload):
+        session, expires_at = self.sessions.sign(payload)
+
+        @after_this_request
+        def set_session_cookie(response):
+            response.set_cookie(self.session_cookie, session, max_age=max(0, expires_at - int(time.time())),
+                                secure=self.session_cookie_secure, httponly=True, samesite='Strict')
+            return response
+
+    # authenticate(attempt)
+    #     the claims of the current request, from its session cookie when it
+    #     has no Authorization header, else from its bearer token
+
+    def authenticate(self, attempt=NO_ATTEMPT):
+        if self.sessions is not None and 'Authorization' not in request.headers:
+            session = request.cookies.get(self.session_cookie)
+            if session:
+                claims = self.verify_session(session)
+                attempt.lap('session')
+                return claims
+
+        token = get_token_auth_header()
+        attempt.lap('header')
+
+        try:
+            payload = self.verify_decode_jwt(token, attempt)
+        except AuthError as error:
+            # the key set could not be fetched, not the client's fault
+            if error.status_code == 503:
+                raise
+            attempt.code = error.error['code']
+            abort(401)
+
+        if self.sessions is not None:
+            self.start_session(payload)
+        return payload
+
+    # permission_error(permission, payload)
+    #     None if the payload has the permission, else the failure code
+    #     permission is one permission or a list that are all required
+
+    def permission_error(self, permission, payload):
+        permissions = payload.permissions if isinstance(payload, Claims) else Claims(payload).permissions
+
+        # the token was issued without RBAC permissions
+        if permissions is None:
+            return 'permissions_missing'
+
+        required = (permission,) if isinstance(permission, str) else permission
+        if any(name not in permissions for name in required):
+            return 'permission_denied'
+
+        return None
+
+    def check_permissions(self, permission, payload):
+        code = self.permission_error(permission, payload)
+        if code == 'permissions_missing':
+            abort(400)
+        if code is not None:
+            abort(self.permission_denied_status)
+
+        return True
+
+    def observe(self, attempt, permission):
+        attempt.finish()
+        self.metrics.observe(attempt)
+        if self.audit_log is not None:
+            self.audit_log.record(attempt, permission)
+
+    def requires_auth(self, permission=''):
+        def requires_auth_decorator(f):
+            @wraps(f)
+            def wrapper(*args, **kwargs):
+                attempt = Attempt()
+                try:
+                    payload = self.authenticate(attempt)
+                    attempt.sub = payload.get('sub')
+                    attempt.code = self.permission_error(permission, payload)
+                    attempt.lap('permissions')
+                except AuthError as error:
+                    attempt.code = error.error['code']
+                    raise
+                except Exception:
+                    # abort(401) after a failed verification has set the code
+                    attempt.code = attempt.code or 'error'
+                    raise
+                finally:
+                    self.observe(attempt, permission)
+
+                self.check_permissions(permission, payload)
+
+                # pass the decoded payload to the decorated method
+                return f(payload, *args, **kwargs)
+
+            return wrapper
+
+        return requires_auth_decorator
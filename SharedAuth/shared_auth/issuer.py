@@ -0,0 +1,188 @@
+"""A local stand-in for an Auth0 tenant, for development, tests and benchmarks.
+
+Serve a key set and print a token:
+    python -m shared_auth.issuer --issuer https://fsnd-l-m-k-b.eu.auth0.com/ \
+        --audience image --permissions get:image --port 8765
+
+then point the app to http://localhost:8765/.well-known/jwks.json. More
+tokens are minted with GET /token?permissions=get:image&expires_in=60.
+"""
+import argparse
+import json
+import secrets
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from Crypto.PublicKey import ECC, RSA
+from jose import jwk, jwt
+
+ALGORITHMS = ('RS256', 'ES256')
+
+
+def generate_key(algorithm):
+    if algorithm == 'RS256':
+        pem = RSA.generate(2048).export_key()
+    elif algorithm == 'ES256':
+        pem = ECC.generate(curve='P-256').export_key(format='PEM', use_pkcs8=False)
+    else:
+        raise ValueError(f'unsupported algorithm {algorithm}, expected one of {ALGORITHMS}')
+    return jwk.construct(pem, algorithm)
+
+
+# LocalIssuer
+#     mints tokens like an Auth0 tenant and serves their public keys
+#         issuer = LocalIssuer(f'https://{AUTH0_DOMAIN}/', API_AUDIENCE)
+#         os.environ['AUTH0_JWKS_URL'] = issuer.start()
+#         token = issuer.mint(['get:image'], expires_in=600)
+#     - keys are generated in memory, RS256 or ES256
+#     - rotate() signs new tokens with a new key; the old key stays in the
+#       key set until it is retired, like a rotation on Auth0
+#     - latency delays every key set response, to mimic the round trip to Auth0
+#     - jwks_requests counts the key set responses
+
+class LocalIssuer:
+    def __init__(self, issuer, audience, algorithm='RS256', latency=0):
+        self.issuer = issuer
+        self.audience = audience
+        self.algorithm = algorithm
+        self.latency = latency
+        self.jwks_requests = 0
+        self._keys = {}
+        self._lock = threading.Lock()
+        self._server = None
+        self.kid = self.add_key()
+
+    def add_key(self, algorithm=None):
+        algorithm = algorithm or self.algorithm
+        kid = secrets.token_hex(8)
+        with self._lock:
+            self._keys[kid] = (algorithm, generate_key(algorithm))
+        return kid
+
+    # rotate(retire=False)
+    #     signs all new tokens with a new key, retire=True also removes the
+    #     previous keys from the key set
+    #     returns the new kid
+
+    def rotate(self, retire=False):
+        kid = self.add_key()
+        with self._lock:
+            if retire:
+                self._keys = {kid: self._keys[kid]}
+            self.kid = kid
+        return kid
+
+    # mint(permissions, expires_in=3600, subject='local|user', kid=None, **claims)
+    #     a signed access token with the permissions claim of an RBAC API;
+    #     a negative expires_in gives an expired token
+
+    def mint(self, permissions=(), expires_in=3600, subject='local|user', kid=None, **claims):
+        kid = kid or self.kid
+        algorithm, key = self._keys[kid]
+        now = int(time.time())
+        payload = {
+            'iss': self.issuer,
+            'sub': subject,
+            'aud': self.audience,
+            'iat': now,
+            'exp': now + expires_in,
+            'permissions': list(permissions)
+        }
+        payload.update(claims)
+        return jwt.encode(payload, key, algorithm=algorithm, headers={'kid': kid})
+
+    def jwks(self):
+        with self._lock:
+            keys = list(self._keys.items())
+
+        jwks = []
+        for kid, (algorithm, key) in keys:
+            public = key.public_key().to_dict()
+            public.update({'kid': kid, 'use': 'sig', 'alg': algorithm})
+            jwks.append(public)
+        return {'keys': jwks}
+
+    @property
+    def jwks_url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}/.well-known/jwks.json'
+
+    # start(host='localhost', port=0)
+    #     serves the key set and /token in a background thread, port 0 picks
+    #     a free port; returns the key set URL
+
+    def start(self, host='localhost', port=0):
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self.jwks_url
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def _handler(self):
+        issuer = self
+
+        class IssuerHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                if url.path == '/.well-known/jwks.json':
+                    time.sleep(issuer.latency)
+                    with issuer._lock:
+                        issuer.jwks_requests += 1
+                    self.send_json(issuer.jwks())
+                elif url.path == '/token':
+                    query = parse_qs(url.query)
+                    permissions = [p for p in query.get('permissions', [''])[0].split(',') if p]
+                    expires_in = int(query.get('expires_in', ['3600'])[0])
+                    self.send_json({
+                        'access_token': issuer.mint(permissions, expires_in),
+                        'token_type': 'Bearer',
+                        'expires_in': expires_in
+                    })
+                else:
+                    self.send_error(404)
+
+            def send_json(self, body):
+                data = json.dumps(body).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        return IssuerHandler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--issuer', required=True, help='iss claim, e.g. https://<tenant>.auth0.com/')
+    parser.add_argument('--audience', required=True, help='aud claim, the API identifier')
+    parser.add_argument('--algorithm', choices=ALGORITHMS, default='RS256')
+    parser.add_argument('--permissions', default='', help='comma separated, for the printed token')
+    parser.add_argument('--expires-in', type=int, default=3600)
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    issuer = LocalIssuer(args.issuer, args.audience, args.algorithm)
+    url = issuer.start(port=args.port)
+    print(f'key set: {url}')
+    print(f'token:   {issuer.mint([p for p in args.permissions.split(",") if p], args.expires_in)}')
+
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        issuer.stop()
+
+
+if __name__ == '__main__':
+    main()
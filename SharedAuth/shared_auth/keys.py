@@ -0,0 +1,155 @@
+import json
+import threading
+import time
+from urllib.request import urlopen
+
+from jose import jwk
+from jose.exceptions import JWKError
+
+# algorithms tokens can be verified with from a public key
+# - EdDSA is missing from python-jose
+# - HS256 and the other HMAC algorithms are left out on purpose, with them a
+#   public key would be accepted as the shared secret
+SUPPORTED_ALGORITHMS = ('RS256', 'RS384', 'RS512', 'ES256', 'ES384', 'ES512')
+
+# the algorithm of a key without an alg member, by its curve
+CURVE_ALGORITHMS = {'P-256': 'ES256', 'P-384': 'ES384', 'P-521': 'ES512'}
+
+
+def check_algorithms(algorithms):
+    unsupported = [algorithm for algorithm in algorithms if algorithm not in SUPPORTED_ALGORITHMS]
+    if unsupported or not algorithms:
+        raise ValueError(f'unsupported algorithms {unsupported}, expected some of {SUPPORTED_ALGORITHMS}')
+    return list(algorithms)
+
+
+def key_algorithm(key, algorithms):
+    # Auth0 names the algorithm of every key, other issuers may leave it out
+    if 'alg' in key:
+        return key['alg']
+    if key.get('kty') == 'EC':
+        return CURVE_ALGORITHMS.get(key.get('crv'))
+    return next((algorithm for algorithm in algorithms if algorithm.startswith('RS')), None)
+
+
+# A key source maps the key id (kid) in a token header to a ready-to-use
+# jose key object, or None. Keys are parsed once when they are loaded, not
+# on every request.
+#     key_source.get_key(kid)
+
+
+# JWKSKeySource
+#     keeps the signing keys of a remote JSON Web Key Set by kid
+#     - keys are fetched once and reused for ttl seconds
+#     - once expired, the old keys keep being served while a background
+#       thread fetches the new set, so no request waits for the refresh
+#     - an unknown kid (e.g. after a key rotation) forces a synchronous
+#       refresh, at most once every min_refresh_interval seconds
+#     - concurrent requests that need a synchronous refresh share one fetch
+#     - every fetch gives up after timeout seconds
+#     fetch errors (OSError, ValueError) are raised only while no keys are cached
+
+class JWKSKeySource:
+    def __init__(self, url, algorithms=('RS256',), ttl=600, timeout=3, min_refresh_interval=30):
+        self.url = url
+        self.algorithms = check_algorithms(algorithms)
+        self.ttl = ttl
+        self.timeout = timeout
+        self.min_refresh_interval = min_refresh_interval
+        self._lock = threading.Lock()
+        self._fetch_lock = threading.Lock()
+        self._fetches = 0
+        self._keys = None
+        self._fetched_at = 0
+        self._refreshing = False
+
+    def _fetch(self):
+        with urlopen(self.url, timeout=self.timeout) as response:
+            jwks = json.loads(response.read())
+
+        keys = {}
+        for key in jwks['keys']:
+            if 'kid' not in key or key.get('use', 'sig') != 'sig':
+                continue
+            algorithm = key_algorithm(key, self.algorithms)
+            if algorithm not in self.algorithms:
+                continue
+            try:
+                keys[key['kid']] = jwk.construct(key, algorithm)
+            except JWKError:
+                # e.g. a key type this server does not verify with
+                continue
+        return keys
+
+    def refresh(self):
+        keys = self._fetch()
+        with self._lock:
+            self._keys = keys
+            self._fetched_at = time.monotonic()
+        return keys
+
+    def _refresh_once(self, fetches):
+        # a request that waited for another request's fetch takes its result
+        with self._fetch_lock:
+            if self._fetches != fetches:
+                if self._keys is None:
+                    raise OSError('fetching the signing keys failed')
+                return self._keys
+            try:
+                return self.refresh()
+            finally:
+                self._fetches += 1
+
+    def _refresh_in_background(self):
+        try:
+            self.refresh()
+        except (OSError, ValueError, KeyError):
+            # keep serving the cached keys, the next request retries
+            pass
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def get_key(self, kid):
+        with self._lock:
+            keys = self._keys
+            fetches = self._fetches
+            age = time.monotonic() - self._fetched_at
+            if keys is not None and age > self.ttl and not self._refreshing:
+                self._refreshing = True
+                threading.Thread(target=self._refresh_in_background, daemon=True).start()
+
+        if keys is None:
+            keys = self._refresh_once(fetches)
+        elif kid not in keys and age > self.min_refresh_interval:
+            try:
+                keys = self._refresh_once(fetches)
+            except (OSError, ValueError, KeyError):
+                pass
+
+        return keys.get(kid)
+
+    def clear(self):
+        with self._lock:
+            self._keys = None
+            self._fetched_at = 0
+
+
+# PEMKeySource
+#     a single public key from a PEM string or file, for a local issuer or
+#     for tests; without a kid it verifies tokens with any kid
+
+class PEMKeySource:
+    def __init__(self, pem, algorithm='RS256', kid=None):
+        self.kid = kid
+        self.key = jwk.construct(pem, check_algorithms([algorithm])[0])
+
+    @classmethod
+    def from_file(cls, path, algorithm='RS256', kid=None):
+        with open(path) as file:
+            return cls(file.read(), algorithm, kid)
+
+    def get_key(self, kid):
+        if self.kid is None or kid == self.kid:
+            return self.key
+        return None
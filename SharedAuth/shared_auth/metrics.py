@@ -0,0 +1,111 @@
+import bisect
+import threading
+import time
+from collections import Counter
+
+# the stages of a requires_auth call, in order; total covers all of them
+#     header: splitting the Authorization header and parsing the token header
+#     token_cache: looking the token up in the cache of verified tokens
+#     key: finding the signing key, a key set fetch included
+#     signature: checking the signature and the claims of the token
+#     session: checking a session cookie instead of a token
+#     permissions: checking the permission of the route
+STAGES = ('header', 'token_cache', 'key', 'signature', 'session', 'permissions', 'total')
+
+# upper bounds of the latency histogram buckets (ms), the last one is open
+BUCKETS_MS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 1000, 2500)
+
+
+# Attempt
+#     the timings of one requires_auth call and how it ended
+#     - lap(stage) adds the time since the previous lap to the stage
+#     - code is None for an authorized request, else the failure code, e.g.
+#       token_expired or permission_denied
+
+class Attempt:
+    __slots__ = ('timings', 'code', 'sub', 'started', '_mark')
+
+    def __init__(self):
+        self.timings = {}
+        self.code = None
+        self.sub = None
+        self.started = self._mark = time.perf_counter()
+
+    def lap(self, stage):
+        now = time.perf_counter()
+        self.timings[stage] = self.timings.get(stage, 0) + now - self._mark
+        self._mark = now
+
+    def finish(self):
+        self.timings['total'] = time.perf_counter() - self.started
+
+
+# stands in for an Attempt when verify_decode_jwt is called on its own
+class NoAttempt:
+    __slots__ = ()
+
+    def lap(self, stage):
+        pass
+
+
+NO_ATTEMPT = NoAttempt()
+
+
+# AuthMetrics
+#     counts requires_auth calls by outcome and keeps a latency histogram
+#     per stage, in memory and per process
+#         auth.metrics.stats()
+#     percentiles are upper bounds of their histogram bucket
+
+class AuthMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
+
+    def observe(self, attempt):
+        with self._lock:
+            self._outcomes[attempt.code or 'authorized'] += 1
+            for stage, seconds in attempt.timings.items():
+                ms = seconds * 1000
+                histogram = self._stages.get(stage)
+                if histogram is None:
+                    histogram = self._stages[stage] = [0, 0.0, 0.0, [0] * (len(BUCKETS_MS) + 1)]
+                histogram[0] += 1
+                histogram[1] += ms
+                histogram[2] = max(histogram[2], ms)
+                histogram[3][bisect.bisect_left(BUCKETS_MS, ms)] += 1
+
+    def clear(self):
+        with self._lock:
+            self._outcomes = Counter()
+            self._stages = {}
+
+    def stats(self):
+        with self._lock:
+            outcomes = dict(self._outcomes)
+            stages = {stage: (count, total, slowest, list(buckets))
+                      for stage, (count, total, slowest, buckets) in self._stages.items()}
+
+        return {
+            'requests': sum(outcomes.values()),
+            'outcomes': outcomes,
+            'stages': {stage: {
+                'count': count,
+                'mean_ms': round(total / count, 4),
+                'p50_ms': percentile(buckets, count, 0.5, slowest),
+                'p95_ms': percentile(buckets, count, 0.95, slowest),
+                'p99_ms': percentile(buckets, count, 0.99, slowest),
+                'max_ms': round(slowest, 4)
+            } for stage, (count, total, slowest, buckets) in sorted(
+                stages.items(), key=lambda item: STAGES.index(item[0]))}
+        }
+
+
+def percentile(buckets, count, fraction, slowest):
+    rank = count * fraction
+    seen = 0
+    for bound, in_bucket in zip(BUCKETS_MS, buckets):
+        seen += in_bucket
+        if seen >= rank:
+            return min(bound, round(slowest, 4))
+    return round(slowest, 4)
@@ -0,0 +1,63 @@
+import base64
+import hashlib
+import hmac
+import json
+import time
+
+
+def b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode()
+
+
+def b64decode(text):
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+
+# SessionSigner
+#     short-lived sessions for clients that already sent a verified token,
+#     checked with one HMAC-SHA256 instead of a public key signature
+#     - a session is base64url(claims).base64url(HMAC of the claims)
+#     - it keeps the sub and the permissions of the token and expires after
+#       max_age seconds, or with the token if that is sooner
+#     - every worker needs the same secret, at least 32 bytes
+
+class SessionSigner:
+    def __init__(self, secret, max_age=300):
+        if isinstance(secret, str):
+            secret = secret.encode()
+        if len(secret) < 32:
+            raise ValueError('the session secret needs at least 32 bytes')
+        self.secret = secret
+        self.max_age = max_age
+
+    def _signature(self, data):
+        return hmac.new(self.secret, data, hashlib.sha256).digest()
+
+    # sign(payload)
+    #     a session for the verified payload of a token and the time it expires
+
+    def sign(self, payload):
+        claims = {
+            'sub': payload.get('sub'),
+            # None when the token had no permissions claim, like the token
+            'permissions': payload.get('permissions'),
+            'exp': min(int(time.time()) + self.max_age, payload.get('exp', float('inf')))
+        }
+        data = json.dumps(claims, separators=(',', ':')).encode()
+        return f'{b64encode(data)}.{b64encode(self._signature(data))}', claims['exp']
+
+    # verify(session)
+    #     the claims of a session signed with this secret, with its exp, or
+    #     None for a malformed or forged session; expiry is up to the caller
+
+    def verify(self, session):
+        try:
+            data, signature = session.split('.')
+            data, signature = b64decode(data), b64decode(signature)
+        except ValueError:
+            return None
+
+        if not hmac.compare_digest(signature, self._signature(data)):
+            return None
+
+        return json.loads(data)
@@ -0,0 +1,70 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+# TokenCache
+#     keeps the payloads of verified tokens, so a token is verified once
+#     instead of on every request
+#     - entries are keyed by the SHA-256 of the token, never the token itself
+#     - an entry expires at the exp claim of its token
+#     - at most maxsize entries, the least recently used one is evicted first
+#     permissions are still checked on every request
+
+class TokenCache:
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _key(token):
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token):
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                payload, expires_at = entry
+                if time.time() < expires_at:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return payload
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, token, payload):
+        # tokens without an expiry are verified every time
+        if not self.maxsize or 'exp' not in payload:
+            return
+
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = (payload, payload['exp'])
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
@@ -0,0 +1,345 @@
+import logging
+import threading
+import time
+import unittest
+from unittest import mock
+
+from flask import Flask, jsonify
+
+from shared_auth import Auth, AuditLog, AuthError, AuthMetrics, JWKSKeySource, SessionSigner, TokenCache
+from shared_auth.issuer import LocalIssuer
+from shared_auth.metrics import Attempt
+from shared_auth.sessions import b64decode, b64encode
+
+ISSUER = 'https://shared-auth.test/'
+AUDIENCE = 'test'
+SESSION_SECRET = 'a' * 32
+
+
+def create_app(key_source):
+    app = Flask(__name__)
+    auth = Auth(key_source, audience=AUDIENCE, issuer=ISSUER, session_secret=SESSION_SECRET,
+                session_cookie_secure=False)
+
+    @app.route('/headers')
+    @auth.requires_auth('get:image')
+    def headers(payload):
+        return jsonify({'sub': payload['sub']})
+
+    @app.errorhandler(AuthError)
+    def auth_error(error):
+        return jsonify(error.error), error.status_code
+
+    @app.errorhandler(401)
+    def unauthorized(error):
+        return jsonify({'code': 'unauthorized'}), 401
+
+    return app, auth
+
+
+class SharedAuthTestCase(unittest.TestCase):
+    """Verifies tokens, sessions and key set refreshes against a LocalIssuer"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.issuer = LocalIssuer(ISSUER, AUDIENCE)
+        cls.jwks_url = cls.issuer.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.issuer.stop()
+
+    def setUp(self):
+        # a key set fetch is allowed right away, a rotation is seen at once
+        self.key_source = JWKSKeySource(self.jwks_url, min_refresh_interval=0)
+        self.app, self.auth = create_app(self.key_source)
+        # cookies are sent by hand, so a test can forge them
+        self.client = self.app.test_client(use_cookies=False)
+        self.issuer.jwks_requests = 0
+
+    def get(self, token=None, session=None):
+        headers = {}
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        if session:
+            headers['Cookie'] = f'{self.auth.session_cookie}={session}'
+        return self.client.get('/headers', headers=headers)
+
+    def start_session(self):
+        res = self.get(token=self.issuer.mint(['get:image']))
+        self.assertEqual(res.status_code, 200)
+        return res.headers['Set-Cookie'].split(';')[0].split('=', 1)[1]
+
+    def assertSessionDeleted(self, res):
+        cookie = res.headers['Set-Cookie']
+        self.assertTrue(cookie.startswith(f'{self.auth.session_cookie}=;'))
+        self.assertIn('Max-Age=0', cookie)
+
+    # sessions
+
+    def test_session_authorizes_without_token(self):
+        res = self.get(session=self.start_session())
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json['sub'], 'local|user')
+
+    def test_401_forged_session_claims(self):
+        data, signature = self.start_session().split('.')
+        # the same signature over a session with another sub
+        forged = b64decode(data).replace(b'local|user', b'local|root')
+        res = self.get(session=f'{b64encode(forged)}.{signature}')
+
+        self.assertEqual(res.status_code, 401)
+        self.assertEqual(res.json['code'], 'invalid_session')
+        self.assertEqual(self.auth.metrics.stats()['outcomes']['invalid_session'], 1)
+        self.assertSessionDeleted(res)
+
+    def test_401_session_signed_with_another_secret(self):
+        session, _ = SessionSigner('b' * 32).sign({'sub': 'local|user', 'permissions': ['get:image']})
+        res = self.get(session=session)
+
+        self.assertEqual(res.status_code, 401)
+        self.assertEqual(self.auth.metrics.stats()['outcomes']['invalid_session'], 1)
+        self.assertSessionDeleted(res)
+
+    def test_401_malformed_session(self):
+        res = self.get(session='not-a-session')
+
+        self.assertEqual(res.status_code, 401)
+        self.assertSessionDeleted(res)
+
+    def test_401_expired_session(self):
+        # a session expires with its token
+        session, _ = SessionSigner(SESSION_SECRET).sign(
+            {'sub': 'local|user', 'permissions': ['get:image'], 'exp': int(time.time()) - 1})
+        res = self.get(session=session)
+
+        self.assertEqual(res.status_code, 401)
+        self.assertEqual(self.auth.metrics.stats()['outcomes']['session_expired'], 1)
+        self.assertSessionDeleted(res)
+
+    def test_session_keeps_permissions_of_token(self):
+        res = self.get(token=self.issuer.mint(['get:other']))
+        session = res.headers['Set-Cookie'].split(';')[0].split('=', 1)[1]
+        res = self.get(session=session)
+
+        self.assertEqual(res.status_code, 403)
+
+    # token cache
+
+    def test_cached_token_is_verified_once(self):
+        token = self.issuer.mint(['get:image'])
+        self.assertEqual(self.get(token=token).status_code, 200)
+        self.assertEqual(self.get(token=token).status_code, 200)
+
+        stats = self.auth.token_cache.stats()
+        self.assertEqual((stats['size'], stats['hits'], stats['misses']), (1, 1, 1))
+        self.assertEqual(self.auth.metrics.stats()['stages']['signature']['count'], 1)
+
+    def test_cached_token_without_permission_is_still_refused(self):
+        token = self.issuer.mint(['get:other'])
+        self.assertEqual(self.get(token=token).status_code, 403)
+        res = self.get(token=token)
+
+        self.assertEqual(res.status_code, 403)
+        self.assertEqual(self.auth.token_cache.stats()['hits'], 1)
+        self.assertEqual(self.auth.metrics.stats()['outcomes']['permission_denied'], 2)
+
+    # metrics
+
+    def test_request_is_timed_per_stage(self):
+        self.get(token=self.issuer.mint(['get:image']))
+        self.get(token='not-a-token')
+        stats = self.auth.metrics.stats()
+
+        self.assertEqual(stats['requests'], 2)
+        self.assertEqual(stats['outcomes'], {'authorized': 1, 'invalid_header': 1})
+        self.assertEqual(list(stats['stages']), ['header', 'token_cache', 'key', 'signature', 'permissions', 'total'])
+        self.assertEqual(stats['stages']['total']['count'], 2)
+        self.assertEqual(stats['stages']['signature']['count'], 1)
+
+    # key set
+
+    def test_unknown_kid_forces_one_refetch(self):
+        self.assertEqual(self.get(token=self.issuer.mint(['get:image'])).status_code, 200)
+        self.issuer.rotate()
+        token = self.issuer.mint(['get:image'])
+
+        self.assertEqual(self.get(token=token).status_code, 200)
+        self.assertEqual(self.get(token=self.issuer.mint(['get:image'], subject='local|other')).status_code, 200)
+        self.assertEqual(self.issuer.jwks_requests, 2)
+
+    def test_unknown_kid_within_min_refresh_interval_is_not_refetched(self):
+        self.key_source.min_refresh_interval = 30
+        self.assertEqual(self.get(token=self.issuer.mint(['get:image'])).status_code, 200)
+        self.issuer.rotate()
+        res = self.get(token=self.issuer.mint(['get:image']))
+
+        self.assertEqual(res.status_code, 401)
+        self.assertEqual(self.issuer.jwks_requests, 1)
+
+    def test_503_key_set_unreachable(self):
+        unreachable = LocalIssuer(ISSUER, AUDIENCE)
+        url = unreachable.start()
+        unreachable.stop()
+        app, auth = create_app(JWKSKeySource(url, timeout=1))
+        token = self.issuer.mint(['get:image'])
+        res = app.test_client().get('/headers', headers={'Authorization': f'Bearer {token}'})
+
+        self.assertEqual(res.status_code, 503)
+        self.assertEqual(res.json['code'], 'jwks_unavailable')
+        self.assertEqual(auth.metrics.stats()['outcomes']['jwks_unavailable'], 1)
+
+
+class TokenCacheTestCase(unittest.TestCase):
+    """Checks expiry, eviction and the counters of TokenCache, with a fixed clock"""
+
+    def setUp(self):
+        self.cache = TokenCache(maxsize=2)
+        self.now = 1000.0
+        clock = mock.patch('shared_auth.token_cache.time.time', lambda: self.now)
+        clock.start()
+        self.addCleanup(clock.stop)
+
+    def test_entry_expires_at_exp(self):
+        self.cache.put('a', {'exp': 1010})
+        self.now = 1009.9
+        self.assertEqual(self.cache.get('a'), {'exp': 1010})
+        self.now = 1010
+        self.assertIsNone(self.cache.get('a'))
+
+        self.assertEqual(self.cache.stats()['size'], 0)
+
+    def test_token_without_exp_is_not_kept(self):
+        self.cache.put('a', {'sub': 'local|user'})
+
+        self.assertIsNone(self.cache.get('a'))
+        self.assertEqual(self.cache.stats()['size'], 0)
+
+    def test_least_recently_used_is_evicted(self):
+        self.cache.put('a', {'exp': 2000})
+        self.cache.put('b', {'exp': 2000})
+        # a is used, so b is the least recently used one
+        self.cache.get('a')
+        self.cache.put('c', {'exp': 2000})
+
+        self.assertIsNone(self.cache.get('b'))
+        self.assertIsNotNone(self.cache.get('a'))
+        self.assertIsNotNone(self.cache.get('c'))
+        self.assertEqual(self.cache.stats()['evictions'], 1)
+
+    def test_stats_count_hits_and_misses(self):
+        self.cache.put('a', {'exp': 2000})
+        self.cache.get('a')
+        self.cache.get('a')
+        self.cache.get('b')
+
+        self.assertEqual(self.cache.stats(), {'size': 1, 'maxsize': 2, 'hits': 2, 'misses': 1,
+                                              'evictions': 0, 'hit_rate': 2 / 3})
+
+    def test_maxsize_0_keeps_nothing(self):
+        cache = TokenCache(maxsize=0)
+        cache.put('a', {'exp': 2000})
+
+        self.assertIsNone(cache.get('a'))
+
+
+class RecordingHandler(logging.Handler):
+    """Keeps the records written by an AuditLog; blocks in emit while paused"""
+
+    def __init__(self):
+        super().__init__()
+        self.records = []
+        self.emitting = threading.Event()
+        self.resume = threading.Event()
+        self.resume.set()
+
+    def emit(self, record):
+        self.emitting.set()
+        self.resume.wait(5)
+        self.records.append(record)
+
+
+class MetricsTestCase(unittest.TestCase):
+    """Checks AuthMetrics and AuditLog with a fixed clock, sample rate and queue"""
+
+    def attempt(self, code=None):
+        # laps of 1 ms, 0.1 ms and 4 ms on a fixed clock
+        clock = iter([0.0, 0.001, 0.0011, 0.0051, 0.0051])
+        with mock.patch('shared_auth.metrics.time.perf_counter', lambda: next(clock)):
+            attempt = Attempt()
+            attempt.lap('header')
+            attempt.lap('token_cache')
+            attempt.lap('signature')
+            attempt.code = code
+            attempt.finish()
+        return attempt
+
+    def audit_log(self, **kwargs):
+        handler = RecordingHandler()
+        audit_log = AuditLog(handler, **kwargs)
+        self.addCleanup(audit_log.stop)
+        return audit_log, handler
+
+    # AuthMetrics
+
+    def test_stage_timings(self):
+        metrics = AuthMetrics()
+        metrics.observe(self.attempt())
+        metrics.observe(self.attempt('token_expired'))
+        stats = metrics.stats()
+
+        self.assertEqual(stats['requests'], 2)
+        self.assertEqual(stats['outcomes'], {'authorized': 1, 'token_expired': 1})
+        self.assertEqual(list(stats['stages']), ['header', 'token_cache', 'signature', 'total'])
+        self.assertEqual(stats['stages']['header'], {'count': 2, 'mean_ms': 1.0, 'p50_ms': 1.0, 'p95_ms': 1.0,
+                                                     'p99_ms': 1.0, 'max_ms': 1.0})
+        # percentiles are the upper bound of their bucket, at most the slowest
+        self.assertEqual(stats['stages']['signature']['p50_ms'], 4.0)
+        self.assertEqual(stats['stages']['total']['mean_ms'], 5.1)
+
+    def test_clear(self):
+        metrics = AuthMetrics()
+        metrics.observe(self.attempt())
+        metrics.clear()
+
+        self.assertEqual(metrics.stats(), {'requests': 0, 'outcomes': {}, 'stages': {}})
+
+    # AuditLog
+
+    def test_audit_log_samples_authorized_calls(self):
+        audit_log, handler = self.audit_log(sample_rate=0.5)
+        with mock.patch('shared_auth.audit.random.random', side_effect=[0.2, 0.7, 0.4, 0.9]):
+            for _ in range(4):
+                audit_log.record(self.attempt(), 'get:image')
+        audit_log.stop()
+
+        self.assertEqual(audit_log.stats(), {'queued': 2, 'dropped': 0})
+        self.assertEqual(len(handler.records), 2)
+
+    def test_audit_log_keeps_every_failure(self):
+        audit_log, handler = self.audit_log(sample_rate=0)
+        audit_log.record(self.attempt(), 'get:image')
+        audit_log.record(self.attempt('permission_denied'), 'get:image')
+        audit_log.stop()
+
+        self.assertEqual(audit_log.stats(), {'queued': 1, 'dropped': 0})
+        self.assertIn('"outcome": "permission_denied"', handler.records[0].getMessage())
+
+    def test_audit_log_drops_when_queue_is_full(self):
+        audit_log, handler = self.audit_log(sample_rate=1, queue_size=1)
+        handler.resume.clear()
+        audit_log.record(self.attempt(), 'get:image')
+        # the thread holds the first record, the second one fills the queue
+        self.assertTrue(handler.emitting.wait(5))
+        for _ in range(3):
+            audit_log.record(self.attempt(), 'get:image')
+        handler.resume.set()
+        audit_log.stop()
+
+        self.assertEqual(audit_log.stats(), {'queued': 2, 'dropped': 2})
+        self.assertEqual(len(handler.records), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
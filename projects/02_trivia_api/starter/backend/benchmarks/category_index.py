@@ -0,0 +1,84 @@
+"""Benchmark of the category and quiz endpoints with and without the
+(category, id) index on questions.
+
+Run from the backend folder:
+    python benchmarks/category_index.py --questions 100000
+    python benchmarks/category_index.py --database-url postgresql://laura@localhost:5432/trivia_bench
+
+ALL TABLES OF THE DATABASE ARE DROPPED and re-seeded, by default it is a
+new SQLite file. DATABASE_URL, the app's own database, is never used.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from flaskr import create_app  # noqa: E402
+from models import db, Question, Category  # noqa: E402
+
+CATEGORIES = ['Science', 'Art', 'Geography', 'History', 'Entertainment', 'Sports']
+
+
+def seed(total):
+    db.drop_all()
+    db.create_all()
+    db.session.execute(Category.__table__.insert(), [{'type': name} for name in CATEGORIES])
+    rows = [{
+        'question': f'Question {number}',
+        'answer': f'Answer {number}',
+        'category': random.randint(1, len(CATEGORIES)),
+        'difficulty': random.randint(1, 5)
+    } for number in range(total)]
+    db.session.execute(Question.__table__.insert(), rows)
+    db.session.commit()
+
+
+def measure(client, requests):
+    timings = {'category': [], 'quizzes': []}
+
+    for _ in range(requests):
+        category = random.randint(1, len(CATEGORIES))
+
+        start = time.perf_counter()
+        client.get(f'/category/{category}/questions')
+        timings['category'].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        client.post('/quizzes', json={'previous_questions': [], 'quiz_category': category})
+        timings['quizzes'].append(time.perf_counter() - start)
+
+    return {name: sorted(values)[len(values) // 2] * 1000 for name, values in timings.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database-url')
+    parser.add_argument('--questions', type=int, default=10000)
+    parser.add_argument('--requests', type=int, default=20)
+    args = parser.parse_args()
+
+    database_url = args.database_url or 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'trivia_bench.db')
+    app = create_app({'database_path': database_url})
+    client = app.test_client()
+
+    with app.app_context():
+        seed(args.questions)
+        with_index = measure(client, args.requests)
+
+        db.session.execute('DROP INDEX ix_questions_category_id')
+        db.session.commit()
+        without_index = measure(client, args.requests)
+
+    print(f'{args.questions} questions, median of {args.requests} requests (ms)')
+    print(f'{"endpoint":<10}{"no index":>12}{"index":>12}')
+    for name in with_index:
+        print(f'{name:<10}{without_index[name]:>12.2f}{with_index[name]:>12.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""Concurrency benchmark of score submissions and leaderboard queries.
+
+Run from the backend folder:
+    python benchmarks/leaderboard.py --threads 8 --submissions 20000
+
+Measures the in-memory leaderboard on its own and POST /scores end to end.
+LEADERBOARD_REDIS_URL switches to the Redis backend.
+ALL TABLES OF THE DATABASE ARE DROPPED, by default it is a new SQLite file
+(--database-url selects another one). DATABASE_URL, the app's own
+database, is never used.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from flaskr import create_app  # noqa: E402
+from models import db, Category  # noqa: E402
+from leaderboard import leaderboard, GLOBAL  # noqa: E402
+
+CATEGORIES = ['Science', 'Art', 'Geography', 'History', 'Entertainment', 'Sports']
+
+
+def run_threads(threads, work):
+    workers = [threading.Thread(target=work) for _ in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return time.perf_counter() - start
+
+
+def bench_board(threads, submissions, players):
+    per_thread = submissions // threads
+
+    def work():
+        for _ in range(per_thread):
+            player = f'player{random.randrange(players)}'
+            leaderboard.submit(random.randint(1, len(CATEGORIES)), player, random.randrange(1000))
+            leaderboard.rank(GLOBAL, player)
+
+    elapsed = run_threads(threads, work)
+    return per_thread * threads / elapsed
+
+
+def bench_endpoint(app, threads, submissions, players):
+    per_thread = submissions // threads
+
+    def work():
+        client = app.test_client()
+        for _ in range(per_thread):
+            client.post('/scores', json={
+                'player': f'player{random.randrange(players)}',
+                'score': random.randrange(1000),
+                'quiz_category': random.randint(0, len(CATEGORIES))
+            })
+
+    elapsed = run_threads(threads, work)
+    return per_thread * threads / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database-url')
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--submissions', type=int, default=20000)
+    parser.add_argument('--players', type=int, default=5000)
+    args = parser.parse_args()
+
+    database_url = args.database_url or 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'trivia_bench.db')
+    app = create_app({'database_path': database_url})
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        db.session.execute(Category.__table__.insert(), [{'type': name} for name in CATEGORIES])
+        db.session.commit()
+        leaderboard.invalidate()
+
+        board_rate = bench_board(args.threads, args.submissions, args.players)
+        leaderboard.invalidate()
+        # every request commits a row, so the end to end run is kept smaller
+        endpoint_rate = bench_endpoint(app, args.threads, args.submissions // 10, args.players)
+
+        start = time.perf_counter()
+        for _ in range(1000):
+            leaderboard.top(GLOBAL, 10)
+            leaderboard.rank(GLOBAL, f'player{random.randrange(args.players)}')
+        query_time = (time.perf_counter() - start) / 1000
+
+    print(f'{args.threads} threads, {args.players} players')
+    print(f'leaderboard submit + rank:  {board_rate:>10.0f} /s')
+    print(f'POST /scores:               {endpoint_rate:>10.0f} /s')
+    print(f'top 10 + my rank:           {query_time * 1e6:>10.1f} us')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""Load test of the quiz room server: fan-out latency of questions.
+
+Start the server first, then run from the backend folder:
+    python quiz_rooms.py --port 8765
+    python benchmarks/quiz_rooms_load.py --players 2000 --rooms 20
+
+Every simulated player joins a room and answers each question at once.
+The fan-out latency is the time from the server sending a question
+(sent_at) to a player receiving it. Server and load test should run on
+the same machine so that their clocks agree. Raise the open files limit
+(ulimit -n) for thousands of connections.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import websockets
+
+
+async def play(url, room, player, rounds, starter, latencies, ready):
+    async with websockets.connect(url, compression=None, open_timeout=60) as websocket:
+        await websocket.send(json.dumps({'type': 'join', 'room': room, 'player': player}))
+        ready.release()
+
+        if starter:
+            await ready.all_joined.wait()
+            await websocket.send(json.dumps({'type': 'start', 'quiz_category': 0, 'rounds': rounds}))
+
+        async for raw_message in websocket:
+            message = json.loads(raw_message)
+            if message['type'] == 'question':
+                latencies.append(time.time() - message['sent_at'])
+                await websocket.send(json.dumps({'type': 'answer', 'answer': 'no idea'}))
+            elif message['type'] in ('finished', 'error'):
+                break
+
+
+class Ready:
+    """Counts joined players, starters wait until everyone has joined."""
+
+    def __init__(self, total):
+        self.remaining = total
+        self.all_joined = asyncio.Event()
+
+    def release(self):
+        self.remaining -= 1
+        if self.remaining == 0:
+            self.all_joined.set()
+
+
+async def main(args):
+    latencies = []
+    ready = Ready(args.players)
+    start = time.perf_counter()
+
+    await asyncio.gather(*(
+        play(args.url, f'room{number % args.rooms}', f'player{number}', args.rounds,
+             number < args.rooms, latencies, ready)
+        for number in range(args.players)
+    ))
+
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    percentile = lambda p: latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000  # noqa: E731
+
+    print(f'{args.players} players in {args.rooms} rooms, {args.rounds} rounds, {elapsed:.1f} s')
+    print(f'questions received: {len(latencies)}')
+    print(f'fan-out latency (ms): median {statistics.median(latencies) * 1000:.1f}, '
+          f'p95 {percentile(0.95):.1f}, p99 {percentile(0.99):.1f}, max {latencies[-1] * 1000:.1f}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default='ws://localhost:8765')
+    parser.add_argument('--players', type=int, default=1000)
+    parser.add_argument('--rooms', type=int, default=10)
+    parser.add_argument('--rounds', type=int, default=3)
+    asyncio.run(main(parser.parse_args()))
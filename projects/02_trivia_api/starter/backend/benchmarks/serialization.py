@@ -0,0 +1,71 @@
+"""Benchmark of response generation for 10/100/1000-question payloads.
+
+Run from the backend folder:
+    python benchmarks/serialization.py
+
+Compares Question.format() + jsonify with encoding row tuples through
+serialization.json_response (orjson when installed, stdlib otherwise).
+No database is needed.
+"""
+import argparse
+import os
+import sys
+import timeit
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from flask import Flask, jsonify  # noqa: E402
+from models import Question  # noqa: E402
+from serialization import json_response, dump_question_rows, ENCODER  # noqa: E402
+
+
+def make_rows(size):
+    return [(number, f'Question number {number}, with an "escaped" part?', f'Answer {number}',
+             number % 6 + 1, number % 5 + 1) for number in range(size)]
+
+
+def make_questions(rows):
+    questions = []
+    for row in rows:
+        question = Question(question=row[1], answer=row[2], category=row[3], difficulty=row[4])
+        question.id = row[0]
+        questions.append(question)
+    return questions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+
+    print(f'encoder: {ENCODER}, mean of {args.repeat} responses (us)')
+    print(f'{"questions":<10}{"jsonify":>12}{"rows":>12}{"speedup":>10}')
+
+    with app.app_context():
+        for size in (10, 100, 1000):
+            rows = make_rows(size)
+            questions = make_questions(rows)
+
+            def with_jsonify():
+                return jsonify({
+                    'success': True,
+                    'questions': [question.format() for question in questions],
+                    'total_questions': size
+                }).get_data()
+
+            def with_rows():
+                return json_response({
+                    'success': True,
+                    'total_questions': size
+                }, questions=dump_question_rows(rows)).get_data()
+
+            before = timeit.timeit(with_jsonify, number=args.repeat) / args.repeat * 1e6
+            after = timeit.timeit(with_rows, number=args.repeat) / args.repeat * 1e6
+            print(f'{size:<10}{before:>12.1f}{after:>12.1f}{before / after:>9.1f}x')
+
+
+if __name__ == '__main__':
+    main()
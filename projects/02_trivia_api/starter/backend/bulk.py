@@ -0,0 +1,133 @@
+import csv
+import io
+import json
+
+from models import db, Question, Category, question_statistics, question_pools
+from serialization import dump_question_row, QUESTION_COLUMNS
+
+# ##--------------------------------------------------## #
+# ##---------------- bulk import/export --------------## #
+# ##--------------------------------------------------## #
+
+IMPORT_BATCH_SIZE = 1000
+EXPORT_CHUNK_SIZE = 1000
+
+QUESTION_FIELDS = ('question', 'answer', 'category', 'difficulty')
+
+_category_ids = None
+
+
+def get_category_ids(refresh=False):
+    """Returns the set of valid category ids, loaded once per process."""
+    global _category_ids
+
+    if _category_ids is None or refresh:
+        _category_ids = frozenset(
+            category_id for (category_id,) in db.session.query(Category.id))
+
+    return _category_ids
+
+
+# ##--------------------------------------------------## #
+
+def read_ndjson(stream):
+    """Yields one row per non-empty line.
+
+    A line that is not valid JSON is yielded as the ValueError that
+    describes it, so it is reported like any other invalid row.
+    """
+    for line in stream:
+        line = line.strip()
+        if line:
+            try:
+                yield json.loads(line)
+            except ValueError as error:
+                yield ValueError(f'invalid JSON: {getattr(error, "msg", error)}')
+
+
+def read_csv(stream):
+    return csv.DictReader(stream)
+
+
+def open_text_stream(binary_stream):
+    return io.TextIOWrapper(binary_stream, encoding='utf-8', newline='')
+
+
+# ##--------------------------------------------------## #
+
+def validate_question(row, category_ids):
+    """Returns a mapping ready for insertion, raises ValueError otherwise."""
+    if isinstance(row, ValueError):
+        raise row
+
+    missing = [field for field in QUESTION_FIELDS if row.get(field) in (None, '')]
+    if missing:
+        raise ValueError(f'missing fields: {", ".join(missing)}')
+
+    category = int(row['category'])
+    if category not in category_ids:
+        raise ValueError(f'unknown category: {category}')
+
+    return {
+        'question': row['question'],
+        'answer': row['answer'],
+        'category': category,
+        'difficulty': int(row['difficulty'])
+    }
+
+
+def import_questions(rows, batch_size=IMPORT_BATCH_SIZE):
+    """Inserts rows in batched transactions.
+
+    Invalid rows are skipped and reported by their (1-based) position,
+    so a single bad line does not throw away the rest of the file.
+    """
+    category_ids = get_category_ids()
+    insert = Question.__table__.insert()
+
+    imported = 0
+    errors = []
+    batch = []
+
+    def flush():
+        db.session.execute(insert, batch)
+        db.session.commit()
+        for row in batch:
+            question_statistics.add(row['category'], row['difficulty'])
+        # executemany does not hand back the new ids
+        question_pools.invalidate()
+        batch.clear()
+
+    for number, row in enumerate(rows, start=1):
+        try:
+            batch.append(validate_question(row, category_ids))
+        except (ValueError, TypeError, AttributeError) as error:
+            errors.append({'row': number, 'error': str(error)})
+            continue
+
+        if len(batch) >= batch_size:
+            imported += len(batch)
+            flush()
+
+    if batch:
+        imported += len(batch)
+        flush()
+
+    return imported, errors
+
+
+def export_questions(chunk_size=EXPORT_CHUNK_SIZE):
+    """Yields every question as one NDJSON line.
+
+    The query streams from a server-side cursor, so only one chunk of
+    rows is held in memory at a time.
+    """
+    columns = Question.__table__.c
+    query = db.session.query(*(columns[name] for name in QUESTION_COLUMNS)) \
+        .filter(Question.not_deleted()) \
+        .order_by(columns.id) \
+        .execution_options(stream_results=True) \
+        .yield_per(chunk_size)
+
+    for row in query:
+        yield dump_question_row(row) + b'\n'
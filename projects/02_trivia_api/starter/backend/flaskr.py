@@ -1,28 +1,77 @@
-from flask import Flask, request, abort, jsonify
+from flask import Flask, request, abort, jsonify, Response, stream_with_context
 from flask_cors import CORS
+import click
 import random
 
 from sqlalchemy.exc import SQLAlchemyError
 
-from models import setup_db, Question, Category
+from models import setup_db, db, Question, Category, Score, question_statistics, question_pools
+from leaderboard import leaderboard, GLOBAL
+from bulk import import_questions, export_questions, read_csv, read_ndjson, open_text_stream
+from serialization import json_response, dump_question_rows, QUESTION_COLUMNS
 
 # ##--------------------------------------------------## #
 # ##--------------------- helpers --------------------## #
 # ##--------------------------------------------------## #
 
 QUESTIONS_PER_PAGE = 10
+LEADERS_PER_PAGE = 10
 
 
-def paginate_questions(selection):
+def query_question_rows():
+    # plain (id, question, answer, category, difficulty) tuples,
+    # they are encoded to JSON without building model objects or dicts
+    columns = Question.__table__.c
+    return db.session.query(*(columns[name] for name in QUESTION_COLUMNS)) \
+        .filter(Question.not_deleted()) \
+        .order_by(columns.id)
+
+
+def count_questions(query):
+    return query.order_by(None).count()
+
+
+def paginate_questions(query):
+    # only the requested page is fetched from the database
     page = request.args.get('page', 1, type=int)
 
-    start = (page - 1) * QUESTIONS_PER_PAGE
-    end = start + QUESTIONS_PER_PAGE
+    start = max(page - 1, 0) * QUESTIONS_PER_PAGE
+
+    current_questions = query.offset(start).limit(QUESTIONS_PER_PAGE).all()
+
+    return dump_question_rows(current_questions)
+
 
-    formatted_questions = [question.format() for question in selection]
-    current_questions = formatted_questions[start:end]
+# ##--------------------------------------------------## #
+
+def select_questions(data):
+    # questions matching all given filters: ids, category and search term;
+    # None if no filter is given, so a batch never hits the whole table by accident,
+    # or if ids or category are not whole numbers
+    ids = data.get('ids')
+    category = data.get('category')
+    search_term = data.get('searchTerm')
+
+    if not (ids or category or search_term):
+        return None
+
+    try:
+        if ids:
+            ids = [int(question_id) for question_id in ids]
+        if category:
+            category = int(category)
+    except (TypeError, ValueError):
+        return None
 
-    return current_questions
+    selection = Question.query
+    if ids:
+        selection = selection.filter(Question.id.in_(ids))
+    if category:
+        selection = selection.filter(Question.category == category)
+    if search_term:
+        selection = selection.filter(Question.question.ilike(f'%{search_term}%'))
+
+    return selection
 
 
 # ##--------------------------------------------------## #
@@ -36,6 +85,40 @@ def create_categories_dict(query_res):
     return categories_dict
 
 
+# ##--------------------------------------------------## #
+
+DIFFICULTIES = range(1, 6)
+
+
+def adaptive_difficulties(num_correct, num_answered):
+    # the running accuracy picks the target difficulty, e.g. 100% -> 5, 0% -> 1;
+    # the other difficulties follow ordered by their distance to the target
+    accuracy = min(num_correct / num_answered, 1) if num_answered else 0.5
+    target = DIFFICULTIES[0] + round(accuracy * (len(DIFFICULTIES) - 1))
+
+    return sorted(DIFFICULTIES, key=lambda difficulty: (abs(difficulty - target), difficulty))
+
+
+# ##--------------------------------------------------## #
+
+def create_leaderboard_response(board):
+    # at least one leader, the redis range for 0 would be the whole board
+    limit = max(request.args.get('limit', LEADERS_PER_PAGE, type=int), 1)
+    player = request.args.get('player')
+
+    response = {
+        'success': True,
+        'leaders': [{'rank': rank, 'player': name, 'score': score}
+                    for rank, (name, score) in enumerate(leaderboard.top(board, limit), start=1)]
+    }
+
+    if player:
+        rank, score = leaderboard.rank(board, player)
+        response['player'] = {'rank': rank, 'player': player, 'score': score}
+
+    return response
+
+
 # ##--------------------------------------------------## #
 
 def row2dict(row):
@@ -51,8 +134,12 @@ def row2dict(row):
 
 def create_app(test_config=None):
     # create and configure the app
+    # no database I/O happens here, the schema is managed by the migrations
     app = Flask(__name__)
-    setup_db(app)
+    if test_config is None:
+        setup_db(app)
+    else:
+        setup_db(app, test_config['database_path'])
     # Set up CORS. Allow '*' for origins. Delete the sample route after completing the TODOs
     CORS(app)
 
@@ -84,28 +171,31 @@ def create_app(test_config=None):
     # including pagination (every 10 questions).
     @app.route('/questions', methods=['GET'])
     def get_questions():
-        questions = Question.query.all()
+        questions = query_question_rows()
+        total_questions = count_questions(questions)
         categories = Category.query.all()
 
-        if len(questions) == 0:
+        if total_questions == 0:
             abort(404)
         elif len(categories) == 0:
             abort(404)
 
         categories_dict = create_categories_dict(categories)
 
-        return jsonify({
+        return json_response({
             'success': True,
-            'questions': paginate_questions(questions),
-            'total_questions': len(questions),
+            'total_questions': total_questions,
             'categories': categories_dict
-        })
+        }, questions=paginate_questions(questions))
 
     # Create an endpoint to DELETE question using a question ID.
     @app.route('/question/<int:question_id>', methods=['DELETE'])
     def delete_question(question_id):
         try:
-            question = Question.query.filter(Question.id == question_id).one_or_none()
+            # a soft deleted question was already taken out of the statistics
+            question = Question.query \
+                .filter(Question.id == question_id, Question.not_deleted()) \
+                .one_or_none()
 
             if not question:
                 abort(422)
@@ -119,6 +209,60 @@ def create_app(test_config=None):
         except SQLAlchemyError:
             abort(422)
 
+    # Create an endpoint to DELETE many questions at once, selected by
+    # ids, category and/or search term. Questions are only flagged as deleted
+    # (and can be restored) unless 'permanent' is true.
+    @app.route('/questions', methods=['DELETE'])
+    def batch_delete_questions():
+        selection = select_questions(request.get_json())
+
+        if selection is None:
+            abort(400)
+
+        try:
+            if request.get_json().get('permanent'):
+                deleted = selection.delete(synchronize_session=False)
+            else:
+                deleted = selection.filter(Question.not_deleted()) \
+                    .update({'deleted': True}, synchronize_session=False)
+            db.session.commit()
+        except SQLAlchemyError:
+            db.session.rollback()
+            abort(422)
+
+        question_statistics.invalidate()
+        question_pools.invalidate()
+
+        return jsonify({
+            'success': True,
+            'deleted': deleted
+        })
+
+    # Create an endpoint to restore soft deleted questions,
+    # selected the same way as for the batch delete.
+    @app.route('/questions/restore', methods=['POST'])
+    def restore_questions():
+        selection = select_questions(request.get_json())
+
+        if selection is None:
+            abort(400)
+
+        try:
+            restored = selection.filter(Question.deleted.is_(True)) \
+                .update({'deleted': False}, synchronize_session=False)
+            db.session.commit()
+        except SQLAlchemyError:
+            db.session.rollback()
+            abort(422)
+
+        question_statistics.invalidate()
+        question_pools.invalidate()
+
+        return jsonify({
+            'success': True,
+            'restored': restored
+        })
+
     # Create an endpoint to POST a new question,
     # which will require the question and answer text,
     # category, and difficulty score.
@@ -148,17 +292,17 @@ def create_app(test_config=None):
         search_term = request.get_json()['searchTerm']
 
         try:
-            suggestions = Question.query.filter(
-                Question.question.ilike(f'%{search_term}%')).all()
+            suggestions = query_question_rows().filter(
+                Question.question.ilike(f'%{search_term}%'))
+            total_questions = count_questions(suggestions)
 
-            if not suggestions:
+            if not total_questions:
                 abort(404)
 
-            return jsonify({
+            return json_response({
                 'success': True,
-                'questions': paginate_questions(suggestions),
-                'total_questions': len(suggestions)
-            })
+                'total_questions': total_questions
+            }, questions=paginate_questions(suggestions))
         except SQLAlchemyError:
             abort(422)
 
@@ -166,16 +310,16 @@ def create_app(test_config=None):
     @app.route('/category/<int:category_id>/questions', methods=['GET'])
     def get_questions_by_category(category_id):
         try:
-            questions = Question.query.filter(Question.category == category_id).all()
+            questions = query_question_rows().filter(Question.category == category_id)
+            total_questions = count_questions(questions)
 
-            if not questions:
+            if not total_questions:
                 abort(404)
 
-            return jsonify({
+            return json_response({
                 'success': True,
-                'questions': paginate_questions(questions),
-                'total_questions': len(questions)
-            })
+                'total_questions': total_questions
+            }, questions=paginate_questions(questions))
         except SQLAlchemyError:
             abort(422)
 
@@ -183,24 +327,175 @@ def create_app(test_config=None):
     # This endpoint should take category and previous question parameters
     # and return a random questions within the given category,
     # if provided, and that is not one of the previous questions.
+    # With 'adaptive': true the question is taken from the difficulty band that
+    # matches the player's accuracy so far ('num_correct' of the previous questions).
     @app.route('/quizzes', methods=['POST'])
     def play_quiz():
         previous_questions = request.get_json()['previous_questions']
         quiz_category = int(request.get_json()['quiz_category'])
 
+        if request.get_json().get('adaptive'):
+            return play_adaptive_quiz(previous_questions, quiz_category)
+
         try:
             if quiz_category:
                 suggestions = Question.query \
+                    .filter(Question.not_deleted()) \
                     .filter(Question.category == quiz_category) \
-                    .filter(Question.id.notin_(previous_questions)) \
-                    .all()
+                    .filter(Question.id.notin_(previous_questions))
             else:
-                suggestions = Question.query.filter(Question.id.notin_(previous_questions)).all()
+                suggestions = Question.query \
+                    .filter(Question.not_deleted()) \
+                    .filter(Question.id.notin_(previous_questions))
 
-            if not suggestions:
-                new_question = None
-            else:
-                new_question = row2dict(random.choice(suggestions))
+            # count the candidates and fetch only the randomly chosen one
+            total_suggestions = suggestions.count()
+
+            new_question = None
+            if total_suggestions:
+                question = suggestions.offset(random.randrange(total_suggestions)).first()
+                if question:
+                    new_question = row2dict(question)
+
+            return jsonify({
+                'success': True,
+                'question': new_question,
+            })
+        except SQLAlchemyError:
+            abort(422)
+
+    # Create a POST endpoint to record the score of a finished quiz.
+    # quiz_category 0 stands for a quiz over all categories.
+    @app.route('/scores', methods=['POST'])
+    def create_score():
+        data = request.get_json()
+        player = data.get('player')
+        score = data.get('score')
+
+        if not isinstance(player, str) or not player or not isinstance(score, int) or score < 0:
+            abort(400)
+
+        try:
+            # 0 or null for a quiz over all categories
+            quiz_category = int(data.get('quiz_category') or 0) or None
+        except (TypeError, ValueError):
+            abort(400)
+
+        try:
+            new_score = Score(player=player, category=quiz_category, score=score)
+            new_score.insert()
+        except SQLAlchemyError:
+            abort(422)
+
+        leaderboard.submit(quiz_category, player, score)
+        rank, best = leaderboard.rank(GLOBAL, player)
+
+        return jsonify({
+            'success': True,
+            'created': new_score.id,
+            'rank': rank,
+            'best_score': best
+        })
+
+    # Create GET endpoints for the global and the per-category leaderboard.
+    # ?limit=<n> sets the number of leaders, ?player=<name> adds the player's own rank.
+    @app.route('/leaderboard', methods=['GET'])
+    def get_leaderboard():
+        try:
+            return jsonify(create_leaderboard_response(GLOBAL))
+        except SQLAlchemyError:
+            abort(422)
+
+    @app.route('/category/<int:category_id>/leaderboard', methods=['GET'])
+    def get_category_leaderboard(category_id):
+        try:
+            return jsonify(create_leaderboard_response(category_id))
+        except SQLAlchemyError:
+            abort(422)
+
+    # Create a GET endpoint for the number of questions per category and difficulty.
+    # The counts are served from memory and kept current by the insert and delete paths.
+    @app.route('/questions/statistics', methods=['GET'])
+    def get_question_statistics():
+        try:
+            statistics = question_statistics.by_category()
+        except SQLAlchemyError:
+            abort(422)
+
+        return jsonify({
+            'success': True,
+            'statistics': statistics,
+            'total_questions': sum(entry['total'] for entry in statistics.values())
+        })
+
+    # Create an endpoint to import many questions at once.
+    # The body is streamed as NDJSON (default) or CSV (Content-Type: text/csv)
+    # and inserted in batched transactions.
+    @app.route('/questions/import', methods=['POST'])
+    def bulk_import_questions():
+        stream = open_text_stream(request.stream)
+
+        if request.mimetype == 'text/csv':
+            rows = read_csv(stream)
+        else:
+            rows = read_ndjson(stream)
+
+        try:
+            imported, errors = import_questions(rows)
+        except ValueError:
+            abort(400)
+        except SQLAlchemyError:
+            abort(422)
+
+        return jsonify({
+            'success': True,
+            'imported': imported,
+            'errors': errors
+        })
+
+    # Create an endpoint to export all questions as NDJSON.
+    # Rows are streamed to the client and never collected in memory.
+    @app.route('/questions/export', methods=['GET'])
+    def bulk_export_questions():
+        return Response(stream_with_context(export_questions()),
+                        mimetype='application/x-ndjson')
+
+    # Command line counterpart of the import endpoint:
+    # flask import-questions questions.ndjson
+    @app.cli.command('import-questions')
+    @click.argument('path', type=click.Path(exists=True, dir_okay=False))
+    def import_questions_command(path):
+        with open(path, encoding='utf-8', newline='') as file:
+            rows = read_csv(file) if path.endswith('.csv') else read_ndjson(file)
+            imported, errors = import_questions(rows)
+
+        for error in errors:
+            click.echo(f"row {error['row']}: {error['error']}", err=True)
+        click.echo(f'imported {imported} questions')
+
+    def play_adaptive_quiz(previous_questions, quiz_category):
+        num_correct = request.get_json().get('num_correct', 0)
+        if not isinstance(num_correct, int) or isinstance(num_correct, bool) or num_correct < 0:
+            abort(400)
+        exclude = set(previous_questions)
+
+        try:
+            new_question = None
+            for difficulty in adaptive_difficulties(num_correct, len(previous_questions)):
+                question_id = question_pools.pick(quiz_category, difficulty, exclude)
+                if question_id is None:
+                    continue
+
+                question = Question.query \
+                    .filter(Question.id == question_id, Question.not_deleted()) \
+                    .one_or_none()
+                if question is None:
+                    # deleted by another worker, reload the pools next time
+                    question_pools.invalidate()
+                    continue
+
+                new_question = row2dict(question)
+                break
 
             return jsonify({
                 'success': True,
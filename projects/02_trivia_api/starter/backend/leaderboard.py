@@ -0,0 +1,140 @@
+import bisect
+import os
+import threading
+
+from sqlalchemy import func
+
+from models import db, Score
+
+# ##--------------------------------------------------## #
+# ##------------------- leaderboard ------------------## #
+# ##--------------------------------------------------## #
+
+# board of all scores, the category boards are keyed by category id
+GLOBAL = 'all'
+
+
+class RankedBoard:
+    """Best score per player, kept sorted by (-score, player).
+
+    rank() is a binary search, top(n) a slice of the sorted list.
+    """
+
+    def __init__(self):
+        self._best = {}
+        self._ranking = []
+
+    def submit(self, player, score):
+        best = self._best.get(player)
+        if best is not None:
+            if score <= best:
+                return
+            del self._ranking[bisect.bisect_left(self._ranking, (-best, player))]
+
+        self._best[player] = score
+        bisect.insort(self._ranking, (-score, player))
+
+    def top(self, limit):
+        return [(player, -score) for score, player in self._ranking[:limit]]
+
+    def rank(self, player):
+        best = self._best.get(player)
+        if best is None:
+            return None, None
+        return bisect.bisect_left(self._ranking, (-best, player)) + 1, best
+
+    def __len__(self):
+        return len(self._ranking)
+
+
+class MemoryLeaderboard:
+    """In-process leaderboard, rebuilt from the scores table on first use."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._boards = None
+
+    def _ensure_loaded(self):
+        if self._boards is not None:
+            return
+
+        self._boards = {GLOBAL: RankedBoard()}
+        rows = db.session.query(Score.player, Score.category, func.max(Score.score)) \
+            .group_by(Score.player, Score.category)
+        for player, category, score in rows:
+            self._submit(category, player, score)
+
+    def _submit(self, category, player, score):
+        self._boards[GLOBAL].submit(player, score)
+        if category:
+            self._boards.setdefault(category, RankedBoard()).submit(player, score)
+
+    def submit(self, category, player, score):
+        with self._lock:
+            self._ensure_loaded()
+            self._submit(category, player, score)
+
+    def top(self, board, limit):
+        with self._lock:
+            self._ensure_loaded()
+            return self._boards.get(board, RankedBoard()).top(limit)
+
+    def rank(self, board, player):
+        with self._lock:
+            self._ensure_loaded()
+            return self._boards.get(board, RankedBoard()).rank(player)
+
+    def invalidate(self):
+        with self._lock:
+            self._boards = None
+
+
+class RedisLeaderboard:
+    """Leaderboard on Redis sorted sets, shared by all worker processes.
+
+    Any server speaking the Redis protocol works. The sets only ever
+    raise a player's score (ZADD GT), the scores table stays the
+    durable record.
+    """
+
+    def __init__(self, url, prefix='trivia:leaderboard:'):
+        import redis
+
+        self._redis = redis.Redis.from_url(url)
+        self._prefix = prefix
+
+    def _key(self, board):
+        return f'{self._prefix}{board}'
+
+    def submit(self, category, player, score):
+        pipeline = self._redis.pipeline()
+        pipeline.zadd(self._key(GLOBAL), {player: score}, gt=True)
+        if category:
+            pipeline.zadd(self._key(category), {player: score}, gt=True)
+        pipeline.execute()
+
+    def top(self, board, limit):
+        entries = self._redis.zrevrange(self._key(board), 0, limit - 1, withscores=True)
+        return [(player.decode(), int(score)) for player, score in entries]
+
+    def rank(self, board, player):
+        pipeline = self._redis.pipeline()
+        pipeline.zrevrank(self._key(board), player)
+        pipeline.zscore(self._key(board), player)
+        rank, score = pipeline.execute()
+        if rank is None:
+            return None, None
+        return rank + 1, int(score)
+
+    def invalidate(self):
+        pass
+
+
+def create_leaderboard():
+    redis_url = os.environ.get('LEADERBOARD_REDIS_URL')
+    if redis_url:
+        return RedisLeaderboard(redis_url)
+    return MemoryLeaderboard()
+
+
+leaderboard = create_leaderboard()
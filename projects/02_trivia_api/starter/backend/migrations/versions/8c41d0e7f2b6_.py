@@ -0,0 +1,53 @@
+"""integer foreign key and (category, id) index for questions.category
+
+Revision ID: 8c41d0e7f2b6
+Revises: 3b9f1c2d4e5a
+Create Date: 2020-03-14 10:47:26.118305
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8c41d0e7f2b6'
+down_revision = '3b9f1c2d4e5a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    category_column = next(column for column in inspector.get_columns('questions')
+                           if column['name'] == 'category')
+    has_foreign_key = any(fk['referred_table'] == 'categories'
+                          for fk in inspector.get_foreign_keys('questions'))
+
+    # data migration: rows created through the old String column may hold
+    # values that do not name an existing category, those can not be cast
+    if not isinstance(category_column['type'], sa.Integer):
+        op.execute(
+            "UPDATE questions SET category = NULL "
+            "WHERE category NOT IN (SELECT CAST(id AS VARCHAR) FROM categories)"
+        )
+
+    with op.batch_alter_table('questions') as batch_op:
+        if not isinstance(category_column['type'], sa.Integer):
+            batch_op.alter_column('category',
+                                  existing_type=sa.String(),
+                                  type_=sa.Integer(),
+                                  postgresql_using='category::integer')
+        if not has_foreign_key:
+            batch_op.create_foreign_key('category', 'categories', ['category'], ['id'],
+                                        onupdate='CASCADE', ondelete='SET NULL')
+        batch_op.create_index('ix_questions_category_id', ['category', 'id'])
+
+
+def downgrade():
+    with op.batch_alter_table('questions') as batch_op:
+        batch_op.drop_index('ix_questions_category_id')
+        batch_op.drop_constraint('category', type_='foreignkey')
+        batch_op.alter_column('category',
+                              existing_type=sa.Integer(),
+                              type_=sa.String(),
+                              postgresql_using='category::varchar')
@@ -0,0 +1,33 @@
+"""soft delete flag for questions
+
+Revision ID: f1e6b2a4c93d
+Revises: d5a7e93b1c08
+Create Date: 2020-03-28 11:32:17.664019
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1e6b2a4c93d'
+down_revision = 'd5a7e93b1c08'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('questions') as batch_op:
+        batch_op.add_column(sa.Column('deleted', sa.Boolean(), server_default=sa.false(), nullable=False))
+        # the category index only covers questions that are not deleted
+        batch_op.drop_index('ix_questions_category_id')
+        batch_op.create_index('ix_questions_category_id', ['category', 'id'],
+                              postgresql_where=sa.text('deleted IS false'),
+                              sqlite_where=sa.text('deleted IS 0'))
+
+
+def downgrade():
+    with op.batch_alter_table('questions') as batch_op:
+        batch_op.drop_index('ix_questions_category_id')
+        batch_op.create_index('ix_questions_category_id', ['category', 'id'])
+        batch_op.drop_column('deleted')
@@ -1,15 +1,22 @@
 import os
-from sqlalchemy import Column, String, Integer, create_engine
+import random
+import threading
+import time
+from sqlalchemy import Column, String, Integer, Boolean, ForeignKey, Index, create_engine, func, false, text
 from flask_sqlalchemy import SQLAlchemy
+from flask_migrate import Migrate
 import json
 
-database_path = "postgres://laura@localhost:5432/trivia"
+database_path = os.environ.get('DATABASE_URL', "postgres://laura@localhost:5432/trivia")
 
 db = SQLAlchemy()
+migrate = Migrate()
 
 '''
 setup_db(app)
     binds a flask application and a SQLAlchemy service
+    the schema is not touched here, it is managed by the migrations
+    (flask db upgrade)
 '''
 
 
@@ -18,7 +25,7 @@ def setup_db(app, database_path=database_path):
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
     db.app = app
     db.init_app(app)
-    db.create_all()
+    migrate.init_app(app, db)
 
 
 '''
@@ -28,12 +35,21 @@ Question
 
 class Question(db.Model):
     __tablename__ = 'questions'
+    # serves the category filter of /category/<id>/questions and /quizzes,
+    # ordered by id so paginated results need no extra sort step;
+    # soft deleted questions are left out of the index
+    __table_args__ = (
+        Index('ix_questions_category_id', 'category', 'id',
+              postgresql_where=text('deleted IS false'),
+              sqlite_where=text('deleted IS 0')),
+    )
 
     id = Column(Integer, primary_key=True)
     question = Column(String)
     answer = Column(String)
-    category = Column(String)
+    category = Column(Integer, ForeignKey('categories.id', onupdate='CASCADE', ondelete='SET NULL'))
     difficulty = Column(Integer)
+    deleted = Column(Boolean, nullable=False, default=False, server_default=false())
 
     def __init__(self, question, answer, category, difficulty):
         self.question = question
@@ -44,13 +60,24 @@ class Question(db.Model):
     def insert(self):
         db.session.add(self)
         db.session.commit()
+        question_statistics.add(self.category, self.difficulty)
+        question_pools.add(self.id, self.category, self.difficulty)
 
     def update(self):
         db.session.commit()
+        question_statistics.invalidate()
+        question_pools.invalidate()
 
     def delete(self):
         db.session.delete(self)
         db.session.commit()
+        question_statistics.add(self.category, self.difficulty, -1)
+        question_pools.remove(self.id, self.category, self.difficulty)
+
+    @classmethod
+    def not_deleted(cls):
+        # written as IS rather than = so that it matches the index predicate
+        return cls.deleted.is_(False)
 
     def format(self):
         return {
@@ -82,3 +109,179 @@ class Category(db.Model):
             'id': self.id,
             'type': self.type
         }
+
+
+'''
+Score
+    result of one played quiz, category is None for quizzes over all categories
+'''
+
+
+class Score(db.Model):
+    __tablename__ = 'scores'
+    __table_args__ = (
+        Index('ix_scores_player_category', 'player', 'category'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    player = Column(String, nullable=False)
+    category = Column(Integer, ForeignKey('categories.id', onupdate='CASCADE', ondelete='SET NULL'))
+    score = Column(Integer, nullable=False)
+
+    def __init__(self, player, category, score):
+        self.player = player
+        self.category = category
+        self.score = score
+
+    def insert(self):
+        db.session.add(self)
+        db.session.commit()
+
+    def format(self):
+        return {
+            'id': self.id,
+            'player': self.player,
+            'category': self.category,
+            'score': self.score
+        }
+
+
+'''
+QuestionStatistics
+    number of questions per (category, difficulty)
+    loaded with a single GROUP BY query and afterwards kept up to date
+    by the insert and delete paths, so reading it costs no query.
+    Each worker process holds its own copy, which is reloaded after
+    max_age seconds to pick up changes made by other workers.
+'''
+
+
+class QuestionStatistics:
+    def __init__(self, max_age=60):
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._counts = None
+        self._loaded_at = 0
+
+    def _load(self):
+        rows = db.session.query(Question.category, Question.difficulty, func.count(Question.id)) \
+            .filter(Question.not_deleted(), Question.category.isnot(None), Question.difficulty.isnot(None)) \
+            .group_by(Question.category, Question.difficulty) \
+            .all()
+        self._counts = {(category, difficulty): count for category, difficulty, count in rows}
+        self._loaded_at = time.monotonic()
+
+    def add(self, category, difficulty, count=1):
+        with self._lock:
+            if self._counts is None or category is None or difficulty is None:
+                return
+            key = (int(category), difficulty)
+            self._counts[key] = self._counts.get(key, 0) + count
+            if self._counts[key] <= 0:
+                del self._counts[key]
+
+    def invalidate(self):
+        with self._lock:
+            self._counts = None
+
+    def counts(self):
+        with self._lock:
+            if self._counts is None or time.monotonic() - self._loaded_at > self.max_age:
+                self._load()
+            return dict(self._counts)
+
+    def by_category(self):
+        statistics = {}
+        for (category, difficulty), count in self.counts().items():
+            entry = statistics.setdefault(category, {'total': 0, 'difficulties': {}})
+            entry['total'] += count
+            entry['difficulties'][difficulty] = count
+        return statistics
+
+
+question_statistics = QuestionStatistics()
+
+
+'''
+QuestionPools
+    ids of questions per (category, difficulty), plus one pool per
+    difficulty across all categories under the category ALL.
+    Every pool is a list with an id -> position map, so adding, removing
+    and picking a random id are O(1). Loaded once and then kept up to date
+    by the insert and delete paths, reloaded after max_age seconds.
+'''
+
+
+class QuestionPools:
+    ALL = 0
+
+    def __init__(self, max_age=60):
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._pools = None
+        self._loaded_at = 0
+
+    def _load(self):
+        rows = db.session.query(Question.id, Question.category, Question.difficulty) \
+            .filter(Question.not_deleted(), Question.category.isnot(None), Question.difficulty.isnot(None))
+        self._pools = {}
+        for question_id, category, difficulty in rows:
+            self._add(question_id, category, difficulty)
+        self._loaded_at = time.monotonic()
+
+    def _ensure_loaded(self):
+        if self._pools is None or time.monotonic() - self._loaded_at > self.max_age:
+            self._load()
+
+    def _add(self, question_id, category, difficulty):
+        for key in ((int(category), difficulty), (self.ALL, difficulty)):
+            ids, positions = self._pools.setdefault(key, ([], {}))
+            if question_id not in positions:
+                positions[question_id] = len(ids)
+                ids.append(question_id)
+
+    def _remove(self, question_id, category, difficulty):
+        for key in ((int(category), difficulty), (self.ALL, difficulty)):
+            ids, positions = self._pools.get(key, ([], {}))
+            if question_id not in positions:
+                continue
+            # move the last id into the freed slot
+            position = positions.pop(question_id)
+            last_id = ids.pop()
+            if last_id != question_id:
+                ids[position] = last_id
+                positions[last_id] = position
+
+    def add(self, question_id, category, difficulty):
+        with self._lock:
+            if self._pools is not None and category is not None and difficulty is not None:
+                self._add(question_id, category, difficulty)
+
+    def remove(self, question_id, category, difficulty):
+        with self._lock:
+            if self._pools is not None and category is not None and difficulty is not None:
+                self._remove(question_id, category, difficulty)
+
+    def invalidate(self):
+        with self._lock:
+            self._pools = None
+
+    def pick(self, category, difficulty, exclude=()):
+        '''returns a random question id of the pool that is not in exclude, or None'''
+        with self._lock:
+            self._ensure_loaded()
+            ids, positions = self._pools.get((category, difficulty), ([], {}))
+
+            if len(ids) > len(exclude):
+                # a quiz only excludes a handful of ids, so a few random draws
+                # nearly always succeed before falling back to a scan
+                for _ in range(8):
+                    question_id = random.choice(ids)
+                    if question_id not in exclude:
+                        return question_id
+
+            remaining = [question_id for question_id in ids if question_id not in exclude]
+            return random.choice(remaining) if remaining else None
+
+
+question_pools = QuestionPools()
@@ -0,0 +1,239 @@
+"""Multiplayer quiz rooms over WebSockets.
+
+Runs next to the Flask app, on its own port:
+    python quiz_rooms.py --port 8765
+
+Every player of a room gets the same question at the same time; answers
+are timed on the server from the moment the question was sent.
+
+Client messages:
+    {"type": "join", "room": "<name>", "player": "<name>"}
+    {"type": "start", "quiz_category": <id or 0>, "rounds": <n>}
+    {"type": "answer", "answer": "<text>"}
+
+Server messages:
+    {"type": "players", "players": [...]}
+    {"type": "question", "round": <n>, "question": {...}, "sent_at": <unix time>}
+    {"type": "result", "round": <n>, "answer": "<text>", "answers": [...]}
+    {"type": "finished", "scores": {...}}
+    {"type": "error", "message": "<text>"}
+
+A join with a player name that is already in the room is refused, the
+answers of a round are kept by name.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import websockets
+from sqlalchemy.exc import SQLAlchemyError
+
+from flaskr import create_app
+from models import db, Question, Score
+from leaderboard import leaderboard
+
+ROUND_SECONDS = 20
+DEFAULT_ROUNDS = 5
+POINTS_PER_ANSWER = 1
+
+
+# ##--------------------------------------------------## #
+# ##------------------- database ---------------------## #
+# ##--------------------------------------------------## #
+
+# database work is blocking, it runs in the default executor
+app = create_app()
+
+
+def fetch_question(quiz_category, previous_questions):
+    with app.app_context():
+        suggestions = Question.query.filter(Question.not_deleted())
+        if quiz_category:
+            suggestions = suggestions.filter(Question.category == quiz_category)
+        if previous_questions:
+            suggestions = suggestions.filter(Question.id.notin_(previous_questions))
+
+        total_suggestions = suggestions.count()
+        if not total_suggestions:
+            return None
+
+        question = suggestions.offset(random.randrange(total_suggestions)).first()
+        return question and question.format()
+
+
+def record_scores(quiz_category, scores):
+    category = quiz_category or None
+    with app.app_context():
+        db.session.add_all([Score(player=player, category=category, score=score)
+                            for player, score in scores.items()])
+        db.session.commit()
+        for player, score in scores.items():
+            leaderboard.submit(category, player, score)
+
+
+# ##--------------------------------------------------## #
+# ##--------------------- rooms ----------------------## #
+# ##--------------------------------------------------## #
+
+class QuizRoom:
+    def __init__(self, name):
+        self.name = name
+        self.players = {}
+        self.scores = {}
+        self.playing = False
+        self.round = 0
+        self.sent_at = None
+        self.answers = {}
+        self.all_answered = asyncio.Event()
+        # the running play(), the event loop only keeps a weak reference
+        self.task = None
+
+    def broadcast(self, message):
+        # encoded once, then written to every connection without awaiting
+        # the slowest one
+        websockets.broadcast(self.players, json.dumps(message))
+
+    def join(self, websocket, player):
+        if player in self.players.values():
+            return False
+        self.players[websocket] = player
+        self.scores.setdefault(player, 0)
+        self.broadcast({'type': 'players', 'players': sorted(self.players.values())})
+        return True
+
+    def leave(self, websocket):
+        self.players.pop(websocket, None)
+        if self.players:
+            self.broadcast({'type': 'players', 'players': sorted(self.players.values())})
+        if len(self.answers) >= len(self.players):
+            self.all_answered.set()
+
+    def answer(self, websocket, text):
+        player = self.players[websocket]
+        if self.sent_at is None or player in self.answers:
+            return
+
+        self.answers[player] = (text, time.monotonic() - self.sent_at)
+        if len(self.answers) >= len(self.players):
+            self.all_answered.set()
+
+    async def play(self, quiz_category, rounds):
+        loop = asyncio.get_running_loop()
+        previous_questions = []
+
+        try:
+            for self.round in range(1, rounds + 1):
+                question = await loop.run_in_executor(None, fetch_question, quiz_category, previous_questions)
+                if question is None or not self.players:
+                    break
+                previous_questions.append(question['id'])
+
+                self.answers = {}
+                self.all_answered.clear()
+                self.sent_at = time.monotonic()
+                self.broadcast({
+                    'type': 'question',
+                    'round': self.round,
+                    'question': {key: value for key, value in question.items() if key != 'answer'},
+                    'sent_at': time.time(),
+                    'seconds': ROUND_SECONDS
+                })
+
+                try:
+                    await asyncio.wait_for(self.all_answered.wait(), ROUND_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                self.sent_at = None
+
+                self.broadcast({
+                    'type': 'result',
+                    'round': self.round,
+                    'answer': question['answer'],
+                    'answers': self.score_round(question['answer'])
+                })
+
+            self.broadcast({'type': 'finished', 'scores': self.scores})
+            await loop.run_in_executor(None, record_scores, quiz_category, dict(self.scores))
+        except SQLAlchemyError:
+            self.broadcast({'type': 'error', 'message': 'unprocessable'})
+        finally:
+            self.playing = False
+            if not self.players:
+                rooms.pop(self.name, None)
+
+    def score_round(self, correct_answer):
+        results = []
+        for player, (text, seconds) in sorted(self.answers.items(), key=lambda item: item[1][1]):
+            correct = text.strip().lower() == correct_answer.strip().lower()
+            if correct:
+                self.scores[player] = self.scores.get(player, 0) + POINTS_PER_ANSWER
+            results.append({'player': player, 'correct': correct, 'time_ms': round(seconds * 1000)})
+        return results
+
+
+rooms = {}
+
+
+async def handle_player(websocket):
+    room = None
+
+    async def send_error(message):
+        await websocket.send(json.dumps({'type': 'error', 'message': message}))
+
+    try:
+        async for raw_message in websocket:
+            try:
+                message = json.loads(raw_message)
+                kind = message['type']
+            except (ValueError, KeyError, TypeError):
+                await send_error('bad request')
+                continue
+
+            if kind == 'join' and room is None:
+                name = str(message.get('room', 'lobby'))
+                joined = rooms.get(name) or rooms.setdefault(name, QuizRoom(name))
+                if not joined.join(websocket, str(message.get('player') or f'player{id(websocket)}')):
+                    await send_error('the name is taken')
+                    continue
+                room = joined
+            elif room is None:
+                await send_error('join a room first')
+            elif kind == 'start':
+                if room.playing:
+                    await send_error('the quiz already started')
+                    continue
+                try:
+                    rounds = int(message.get('rounds', DEFAULT_ROUNDS))
+                    quiz_category = int(message.get('quiz_category') or 0)
+                except (ValueError, TypeError):
+                    await send_error('bad request')
+                    continue
+                room.playing = True
+                room.task = asyncio.create_task(room.play(quiz_category, rounds))
+            elif kind == 'answer':
+                room.answer(websocket, str(message.get('answer', '')))
+            else:
+                await send_error('bad request')
+    finally:
+        if room is not None:
+            room.leave(websocket)
+            if not room.players and not room.playing:
+                rooms.pop(room.name, None)
+
+
+async def serve(host, port):
+    # no per-message compression: it costs memory and CPU per connection,
+    # and the messages are small
+    async with websockets.serve(handle_player, host, port, compression=None, max_size=2 ** 16):
+        await asyncio.Future()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Multiplayer quiz rooms over WebSockets')
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    asyncio.run(serve(args.host, args.port))
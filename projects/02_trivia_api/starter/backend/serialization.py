@@ -0,0 +1,65 @@
+import json
+
+from flask import Response
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# ##--------------------------------------------------## #
+# ##------------------ serialization -----------------## #
+# ##--------------------------------------------------## #
+
+# columns of a question row, in the order of Question.format()
+QUESTION_COLUMNS = ('id', 'question', 'answer', 'category', 'difficulty')
+
+if orjson is not None:
+    ENCODER = 'orjson'
+
+    def dumps(obj):
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SORT_KEYS)
+
+    encode_value = orjson.dumps
+else:
+    ENCODER = 'json'
+
+    def dumps(obj):
+        return json.dumps(obj, sort_keys=True, separators=(',', ':')).encode()
+
+    def encode_value(value):
+        return json.dumps(value).encode()
+
+
+# Rows go straight from the (id, question, answer, category, difficulty)
+# tuples into a single encoder call. Formatting each row into a bytes
+# template was measured to be slower than letting the C encoder handle
+# short-lived dicts, with both orjson and the stdlib encoder.
+
+def dump_question_row(row):
+    return dumps(dict(zip(QUESTION_COLUMNS, row)))
+
+
+def dump_question_rows(rows):
+    return dumps([dict(zip(QUESTION_COLUMNS, row)) for row in rows])
+
+
+def json_response(payload, status=200, **fragments):
+    """Builds a JSON response with the fastest available encoder.
+
+    fragments are keys whose values are already encoded JSON (bytes),
+    e.g. questions=dump_question_rows(rows); they are spliced into the
+    encoded payload as they are.
+    """
+    body = dumps(payload)
+
+    if fragments:
+        parts = [body[:-1]]
+        separator = b',' if payload else b''
+        for key, fragment in fragments.items():
+            parts.append(separator + encode_value(key) + b':' + fragment)
+            separator = b','
+        parts.append(b'}')
+        body = b''.join(parts)
+
+    return Response(body, status=status, mimetype='application/json')
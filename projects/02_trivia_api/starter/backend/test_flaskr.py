@@ -1,20 +1,51 @@
+import io
+import os
 import unittest
 import json
-from flask_sqlalchemy import SQLAlchemy
+
+from flask_migrate import stamp, upgrade
+from sqlalchemy import inspect
 
 from flaskr import create_app
-from models import setup_db
+from models import db, Question, question_statistics, question_pools
+from leaderboard import leaderboard
+from bulk import import_questions, read_ndjson
+
+database_path = os.environ.get('TEST_DATABASE_URL', "postgres://laura@localhost:5432/trivia_test")
+migrations_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+# the schema of trivia.psql
+BASELINE_REVISION = '3b9f1c2d4e5a'
+
+
+def upgrade_schema():
+    """Brings the test database to the latest migration."""
+    tables = inspect(db.engine).get_table_names()
+    # restored from trivia.psql, which has the tables but no migration state
+    if 'questions' in tables and 'alembic_version' not in tables:
+        stamp(migrations_dir, BASELINE_REVISION)
+    upgrade(migrations_dir)
 
 
 class TriviaTestCase(unittest.TestCase):
     """This class represents the trivia test case"""
 
+    @classmethod
+    def setUpClass(cls):
+        """Initialize the app and build the schema once for all tests."""
+        cls.app = create_app({'database_path': database_path})
+        cls.app_context = cls.app.app_context()
+        cls.app_context.push()
+        upgrade_schema()
+        cls.session = db.session
+
+    @classmethod
+    def tearDownClass(cls):
+        db.engine.dispose()
+        cls.app_context.pop()
+
     def setUp(self):
-        """Define test variables and initialize app."""
-        self.app = create_app()
+        """Define test variables and open a transaction for the test."""
         self.client = self.app.test_client
-        self.database_path = "postgres://laura@localhost:5432/trivia_test"
-        setup_db(self.app, self.database_path)
 
         self.new_question = {
             'question': 'The Answer to the Ultimate Question of Life, the Universe, and Everything',
@@ -23,16 +54,22 @@ class TriviaTestCase(unittest.TestCase):
             'difficulty': 100
         }
 
-        # binds the app to the current context
-        with self.app.app_context():
-            self.db = SQLAlchemy()
-            self.db.init_app(self.app)
-            # create all tables
-            self.db.create_all()
+        # every commit made by the app during the test only ends a
+        # subtransaction of this connection, tearDown rolls it all back
+        self.connection = db.engine.connect()
+        self.transaction = self.connection.begin()
+        db.session = db.create_scoped_session(options={'bind': self.connection, 'binds': {}})
 
     def tearDown(self):
         """Executed after reach test"""
-        pass
+        db.session.remove()
+        db.session = self.session
+        self.transaction.rollback()
+        self.connection.close()
+        # counts recorded for rolled back rows are no longer true
+        question_statistics.invalidate()
+        question_pools.invalidate()
+        leaderboard.invalidate()
 
     # Write at least one test for each test for successful operation and for expected errors.
 
@@ -85,6 +122,64 @@ class TriviaTestCase(unittest.TestCase):
         self.assertEqual(data['success'], False)
         self.assertEqual(data['message'], 'unprocessable')
 
+    def test_422_delete_soft_deleted_question(self):
+        new_id = self.client().post('/question', json=self.new_question).json['created']
+        self.client().delete('/questions', json={'ids': [new_id]})
+        before = self.client().get('/questions/statistics').json
+        res = self.client().delete(f'/question/{new_id}')
+        after = self.client().get('/questions/statistics').json
+
+        self.assertEqual(res.status_code, 422)
+        self.assertEqual(after['total_questions'], before['total_questions'])
+
+    # '/questions', methods=['DELETE']
+
+    def test_batch_soft_delete_questions(self):
+        new_ids = [self.client().post('/question', json=self.new_question).json['created'] for _ in range(2)]
+        res = self.client().delete('/questions', json={'ids': new_ids})
+        data = json.loads(res.data)
+        search = self.client().post('/questions/search', json={'searchTerm': 'Ultimate Question'})
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['success'], True)
+        self.assertEqual(data['deleted'], 2)
+        self.assertEqual(search.status_code, 404)
+
+    def test_restore_questions(self):
+        new_id = self.client().post('/question', json=self.new_question).json['created']
+        self.client().delete('/questions', json={'searchTerm': 'Ultimate Question'})
+        res = self.client().post('/questions/restore', json={'ids': [new_id]})
+        data = json.loads(res.data)
+        search = self.client().post('/questions/search', json={'searchTerm': 'Ultimate Question'})
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['restored'], 1)
+        self.assertEqual(search.json['total_questions'], 1)
+
+    def test_batch_permanent_delete_questions(self):
+        new_id = self.client().post('/question', json=self.new_question).json['created']
+        res = self.client().delete('/questions', json={'ids': [new_id], 'category': 1, 'permanent': True})
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['deleted'], 1)
+        self.assertIsNone(Question.query.get(new_id))
+
+    def test_400_batch_delete_with_malformed_category(self):
+        res = self.client().delete('/questions', json={'category': 'abc'})
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 400)
+        self.assertEqual(data['message'], 'bad request')
+
+    def test_400_batch_delete_without_filter(self):
+        res = self.client().delete('/questions', json={})
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 400)
+        self.assertEqual(data['success'], False)
+        self.assertEqual(data['message'], 'bad request')
+
     # '/question', methods=['POST']
 
     def test_create_new_question(self):
@@ -156,6 +251,177 @@ class TriviaTestCase(unittest.TestCase):
         self.assertEqual(data['success'], True)
         self.assertIsNone(data['question'])
 
+    def test_play_adaptive_quiz(self):
+        res = self.client().post('/quizzes', json={'previous_questions': [], 'quiz_category': '2',
+                                                   'adaptive': True, 'num_correct': 0})
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['success'], True)
+        self.assertEqual(data['question']['category'], 2)
+
+    def test_400_adaptive_quiz_num_correct_not_a_count(self):
+        for num_correct in ('3', 1.5, None, True, -1):
+            res = self.client().post('/quizzes', json={'previous_questions': [1], 'quiz_category': '2',
+                                                       'adaptive': True, 'num_correct': num_correct})
+
+            self.assertEqual(res.status_code, 400)
+            self.assertEqual(res.json['success'], False)
+
+    def test_adaptive_quiz_serves_hard_question_after_correct_answers(self):
+        hard_question = dict(self.new_question, difficulty=5)
+        new_id = self.client().post('/question', json=hard_question).json['created']
+        # every earlier answer was correct, at least one of them
+        previous_questions = [question.id for question in Question.query.filter(Question.difficulty == 5,
+                                                                                 Question.id != new_id)]
+        previous_questions.append(Question.query.filter(Question.difficulty != 5).first().id)
+        res = self.client().post('/quizzes', json={'previous_questions': previous_questions, 'quiz_category': '1',
+                                                   'adaptive': True, 'num_correct': len(previous_questions)})
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['question']['id'], new_id)
+
+    def test_adaptive_quiz_skips_question_soft_deleted_by_another_worker(self):
+        hard_question = dict(self.new_question, difficulty=5)
+        new_id = self.client().post('/question', json=hard_question).json['created']
+        # every earlier answer was correct, at least one of them
+        previous_questions = [question.id for question in Question.query.filter(Question.difficulty == 5,
+                                                                                 Question.id != new_id)]
+        previous_questions.append(Question.query.filter(Question.difficulty != 5).first().id)
+        body = {'previous_questions': previous_questions, 'quiz_category': '1',
+                'adaptive': True, 'num_correct': len(previous_questions)}
+        self.assertEqual(self.client().post('/quizzes', json=body).json['question']['id'], new_id)
+
+        # the pools of this worker still hold the question
+        Question.query.filter(Question.id == new_id).update({'deleted': True})
+        db.session.commit()
+        res = self.client().post('/quizzes', json=body)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertNotEqual((res.json['question'] or {}).get('id'), new_id)
+
+    # '/scores', methods=['POST']
+    def test_create_score(self):
+        res = self.client().post('/scores', json={'player': 'Arthur Dent', 'score': 1000, 'quiz_category': 1})
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['success'], True)
+        self.assertTrue(data['created'])
+        self.assertEqual(data['rank'], 1)
+        self.assertEqual(data['best_score'], 1000)
+
+    def test_400_score_without_player(self):
+        res = self.client().post('/scores', json={'score': 5, 'quiz_category': 1})
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 400)
+        self.assertEqual(data['success'], False)
+        self.assertEqual(data['message'], 'bad request')
+
+    def test_create_score_with_null_category(self):
+        res = self.client().post('/scores', json={'player': 'Arthur Dent', 'score': 42, 'quiz_category': None})
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json['best_score'], 42)
+
+    def test_400_score_with_malformed_category(self):
+        res = self.client().post('/scores', json={'player': 'Arthur Dent', 'score': 42, 'quiz_category': 'abc'})
+
+        self.assertEqual(res.status_code, 400)
+
+    # '/leaderboard', methods=['GET']
+    def test_get_leaderboard(self):
+        self.client().post('/scores', json={'player': 'Arthur Dent', 'score': 1000, 'quiz_category': 1})
+        self.client().post('/scores', json={'player': 'Ford Prefect', 'score': 999, 'quiz_category': 2})
+        res = self.client().get('/leaderboard?limit=2&player=Ford Prefect')
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['success'], True)
+        self.assertEqual([leader['player'] for leader in data['leaders']], ['Arthur Dent', 'Ford Prefect'])
+        self.assertEqual(data['player']['rank'], 2)
+
+    def test_leaderboard_limit_is_at_least_one(self):
+        self.client().post('/scores', json={'player': 'Arthur Dent', 'score': 1000, 'quiz_category': 1})
+        self.client().post('/scores', json={'player': 'Ford Prefect', 'score': 999, 'quiz_category': 2})
+        res = self.client().get('/leaderboard?limit=0')
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual([leader['player'] for leader in res.json['leaders']], ['Arthur Dent'])
+
+    def test_get_category_leaderboard(self):
+        self.client().post('/scores', json={'player': 'Arthur Dent', 'score': 1000, 'quiz_category': 1})
+        res = self.client().get('/category/2/leaderboard?player=Arthur Dent')
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['leaders'], [])
+        self.assertIsNone(data['player']['rank'])
+
+    # '/questions/statistics', methods=['GET']
+    def test_get_question_statistics(self):
+        before = self.client().get('/questions/statistics').json
+        self.client().post('/question', json=self.new_question)
+        res = self.client().get('/questions/statistics')
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['success'], True)
+        self.assertEqual(data['total_questions'], before['total_questions'] + 1)
+        self.assertEqual(data['statistics']['1']['difficulties']['100'], 1)
+
+    # '/questions/import', methods=['POST']
+    def test_import_questions(self):
+        body = '\n'.join(json.dumps(self.new_question) for _ in range(3))
+        res = self.client().post('/questions/import', data=body, content_type='application/x-ndjson')
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['success'], True)
+        self.assertEqual(data['imported'], 3)
+        self.assertEqual(data['errors'], [])
+
+    def test_import_questions_skips_unknown_category(self):
+        body = 'question,answer,category,difficulty\nWho?,Me,1000,1\n'
+        res = self.client().post('/questions/import', data=body, content_type='text/csv')
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['imported'], 0)
+        self.assertEqual(data['errors'][0]['row'], 1)
+
+    def test_import_questions_reports_malformed_json(self):
+        question = json.dumps(self.new_question)
+        body = '\n'.join([question, '{not json', question])
+        res = self.client().post('/questions/import', data=body, content_type='application/x-ndjson')
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['imported'], 2)
+        self.assertEqual(len(data['errors']), 1)
+        self.assertEqual(data['errors'][0]['row'], 2)
+        self.assertTrue(data['errors'][0]['error'].startswith('invalid JSON'))
+
+    def test_import_malformed_json_after_committed_batch(self):
+        question = json.dumps(self.new_question)
+        rows = read_ndjson(io.StringIO('\n'.join([question, question, '{not json', question])))
+        imported, errors = import_questions(rows, batch_size=2)
+
+        self.assertEqual(imported, 3)
+        self.assertEqual([error['row'] for error in errors], [3])
+
+    # '/questions/export', methods=['GET']
+    def test_export_questions(self):
+        res = self.client().get('/questions/export')
+        lines = res.data.decode().splitlines()
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.mimetype, 'application/x-ndjson')
+        self.assertTrue(lines)
+        self.assertIn('question', json.loads(lines[0]))
+
 
 # Make the tests conveniently executable
 if __name__ == "__main__":
@@ -0,0 +1,148 @@
+import os
+import json
+import random
+import statistics
+import time
+import unittest
+
+from sqlalchemy import event
+
+from flaskr import create_app
+from models import db, Question, Category, question_statistics, question_pools
+
+# SQLite in memory by default, e.g. PERF_DATABASE_URL=postgres://laura@localhost:5432/trivia_perf
+database_path = os.environ.get('PERF_DATABASE_URL', 'sqlite://')
+# number of questions to measure with, e.g. PERF_SIZES=1000,100000,1000000
+sizes = [int(size) for size in os.environ.get('PERF_SIZES', '1000').split(',')]
+# requests per route and size, the median latency is compared
+requests_per_route = int(os.environ.get('PERF_REQUESTS', 20))
+# results of an earlier run (PERF_RESULTS) to compare against
+baseline_path = os.environ.get('PERF_BASELINE')
+results_path = os.environ.get('PERF_RESULTS')
+# allowed slowdown compared to the baseline, 0.5 = 50% slower
+tolerance = float(os.environ.get('PERF_TOLERANCE', 0.5))
+
+CATEGORIES = ['Science', 'Art', 'Geography', 'History', 'Entertainment', 'Sports']
+SEED_BATCH_SIZE = 10000
+
+# maximum number of SQL statements per request
+QUERY_BUDGETS = {
+    '/questions': 3,
+    '/questions/search': 2,
+    '/category/<id>/questions': 2,
+    '/quizzes': 2,
+}
+
+# maximum median latency in ms, by number of questions
+LATENCY_BUDGETS = {
+    1000: {'/questions': 20, '/questions/search': 20, '/category/<id>/questions': 20, '/quizzes': 20},
+    100000: {'/questions': 20, '/questions/search': 150, '/category/<id>/questions': 20, '/quizzes': 50},
+    1000000: {'/questions': 50, '/questions/search': 1500, '/category/<id>/questions': 50, '/quizzes': 250},
+}
+
+
+class TriviaPerformanceTestCase(unittest.TestCase):
+    """This class measures latency and query counts of the trivia routes"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = create_app({'database_path': database_path})
+        cls.client = cls.app.test_client()
+        cls.app_context = cls.app.app_context()
+        cls.app_context.push()
+
+        db.drop_all()
+        db.create_all()
+        db.session.execute(Category.__table__.insert(), [{'type': name} for name in CATEGORIES])
+        db.session.commit()
+
+        cls.queries = 0
+        event.listen(db.engine, 'before_cursor_execute', cls.count_query)
+
+        cls.results = {}
+        cls.baseline = {}
+        if baseline_path:
+            with open(baseline_path) as file:
+                cls.baseline = json.load(file)
+
+    @classmethod
+    def tearDownClass(cls):
+        event.remove(db.engine, 'before_cursor_execute', cls.count_query)
+        db.session.remove()
+        db.drop_all()
+        cls.app_context.pop()
+        question_statistics.invalidate()
+        question_pools.invalidate()
+
+        if results_path:
+            with open(results_path, 'w') as file:
+                json.dump(cls.results, file, indent=2, sort_keys=True)
+
+    @classmethod
+    def count_query(cls, *args):
+        cls.queries += 1
+
+    @staticmethod
+    def seed(size):
+        """Adds questions until the bank holds size questions."""
+        missing = size - Question.query.count()
+        insert = Question.__table__.insert()
+
+        while missing > 0:
+            batch = min(missing, SEED_BATCH_SIZE)
+            db.session.execute(insert, [{
+                'question': f'Question {random.getrandbits(32)} about {random.choice(CATEGORIES)}',
+                'answer': 'Answer',
+                'category': random.randint(1, len(CATEGORIES)),
+                'difficulty': random.randint(1, 5)
+            } for _ in range(batch)])
+            db.session.commit()
+            missing -= batch
+
+    def routes(self):
+        return {
+            '/questions': lambda: self.client.get('/questions?page=2'),
+            '/questions/search': lambda: self.client.post('/questions/search', json={'searchTerm': 'geography'}),
+            '/category/<id>/questions': lambda: self.client.get(f'/category/{random.randint(1, 6)}/questions'),
+            '/quizzes': lambda: self.client.post('/quizzes', json={
+                'previous_questions': [random.randint(1, 100) for _ in range(5)],
+                'quiz_category': random.randint(0, 6)
+            }),
+        }
+
+    def measure(self, request):
+        latencies = []
+        queries = []
+
+        for _ in range(requests_per_route):
+            self.__class__.queries = 0
+            start = time.perf_counter()
+            res = request()
+            latencies.append((time.perf_counter() - start) * 1000)
+            queries.append(self.__class__.queries)
+            self.assertEqual(res.status_code, 200)
+
+        return statistics.median(latencies), max(queries)
+
+    def test_routes_stay_within_budget(self):
+        for size in sizes:
+            self.seed(size)
+            budgets = LATENCY_BUDGETS.get(size, LATENCY_BUDGETS[max(LATENCY_BUDGETS)])
+
+            for route, request in self.routes().items():
+                latency, queries = self.measure(request)
+                key = f'{route} @ {size}'
+                self.results[key] = {'latency_ms': round(latency, 2), 'queries': queries}
+
+                with self.subTest(route=route, size=size):
+                    self.assertLessEqual(queries, QUERY_BUDGETS[route], f'{key} exceeds its query budget')
+                    self.assertLessEqual(latency, budgets[route], f'{key} exceeds its latency budget')
+
+                    if key in self.baseline:
+                        allowed = self.baseline[key]['latency_ms'] * (1 + tolerance)
+                        self.assertLessEqual(latency, allowed, f'{key} regressed against the baseline')
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,163 @@
+import asyncio
+import json
+import time
+import unittest
+
+from quiz_rooms import QuizRoom, handle_player, rooms
+
+
+class QuizRoomTestCase(unittest.TestCase):
+    """This class represents the quiz room test case, without sockets"""
+
+    def setUp(self):
+        self.room = QuizRoom('test')
+        # messages are recorded instead of sent
+        self.messages = []
+        self.room.broadcast = self.messages.append
+
+        self.arthur, self.ford = object(), object()
+        self.room.join(self.arthur, 'Arthur Dent')
+        self.room.join(self.ford, 'Ford Prefect')
+
+    def send_question(self):
+        self.room.answers = {}
+        self.room.all_answered.clear()
+        self.room.sent_at = time.monotonic()
+
+    # join()
+
+    def test_join_with_taken_name_is_refused(self):
+        impostor = object()
+
+        self.assertFalse(self.room.join(impostor, 'Arthur Dent'))
+        self.assertNotIn(impostor, self.room.players)
+        self.assertEqual(sorted(self.room.players.values()), ['Arthur Dent', 'Ford Prefect'])
+
+    def test_taken_name_can_join_after_leave(self):
+        self.room.leave(self.arthur)
+
+        self.assertTrue(self.room.join(object(), 'Arthur Dent'))
+
+    # answer()
+
+    def test_answer_before_question_is_ignored(self):
+        self.room.answer(self.arthur, '42')
+
+        self.assertEqual(self.room.answers, {})
+
+    def test_only_first_answer_counts(self):
+        self.send_question()
+        self.room.answer(self.arthur, '42')
+        self.room.answer(self.arthur, '43')
+
+        self.assertEqual(self.room.answers['Arthur Dent'][0], '42')
+        self.assertFalse(self.room.all_answered.is_set())
+
+    def test_all_answered_after_every_player(self):
+        self.send_question()
+        self.room.answer(self.arthur, '42')
+        self.room.answer(self.ford, '42')
+
+        self.assertTrue(self.room.all_answered.is_set())
+
+    # score_round()
+
+    def test_score_round(self):
+        self.room.answers = {'Ford Prefect': ('towel', 2.0), 'Arthur Dent': (' Forty-Two ', 1.0)}
+        results = self.room.score_round('forty-two')
+
+        self.assertEqual([result['player'] for result in results], ['Arthur Dent', 'Ford Prefect'])
+        self.assertEqual([result['correct'] for result in results], [True, False])
+        self.assertEqual(results[0]['time_ms'], 1000)
+        self.assertEqual(self.room.scores, {'Arthur Dent': 1, 'Ford Prefect': 0})
+
+    # leave()
+
+    def test_leave(self):
+        self.room.leave(self.ford)
+
+        self.assertEqual(list(self.room.players.values()), ['Arthur Dent'])
+        self.assertEqual(self.messages[-1], {'type': 'players', 'players': ['Arthur Dent']})
+
+    def test_leave_ends_round_when_the_others_answered(self):
+        self.send_question()
+        self.room.answer(self.arthur, '42')
+        self.room.leave(self.ford)
+
+        self.assertTrue(self.room.all_answered.is_set())
+
+
+class FakeWebSocket:
+    """Hands the given messages to handle_player and keeps what it sends"""
+
+    def __init__(self, *messages):
+        self.messages = [json.dumps(message) for message in messages]
+        self.sent = []
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self.messages:
+            raise StopAsyncIteration
+        return self.messages.pop(0)
+
+    async def send(self, message):
+        self.sent.append(json.loads(message))
+
+
+class HandlePlayerTestCase(unittest.TestCase):
+    """This class represents the message handling test case"""
+
+    def tearDown(self):
+        rooms.clear()
+
+    def test_malformed_start_answers_error(self):
+        websocket = FakeWebSocket({'type': 'join', 'room': 'test', 'player': 'Arthur Dent'},
+                                  {'type': 'start', 'rounds': 'many'},
+                                  {'type': 'start', 'quiz_category': 'abc'})
+        room = rooms['test'] = QuizRoom('test')
+        room.broadcast = lambda message: None
+        asyncio.run(handle_player(websocket))
+
+        self.assertEqual(websocket.sent, [{'type': 'error', 'message': 'bad request'}] * 2)
+        self.assertFalse(room.playing)
+
+    def test_join_with_taken_name_answers_error(self):
+        room = rooms['test'] = QuizRoom('test')
+        room.broadcast = lambda message: None
+        arthur = object()
+        room.join(arthur, 'Arthur Dent')
+        websocket = FakeWebSocket({'type': 'join', 'room': 'test', 'player': 'Arthur Dent'},
+                                  {'type': 'answer', 'answer': '42'},
+                                  {'type': 'join', 'room': 'test', 'player': 'Zaphod'})
+        asyncio.run(handle_player(websocket))
+
+        self.assertEqual(websocket.sent, [{'type': 'error', 'message': 'the name is taken'},
+                                          {'type': 'error', 'message': 'join a room first'}])
+        # Zaphod joined, and left when the connection closed
+        self.assertEqual(list(room.players.values()), ['Arthur Dent'])
+
+    def test_start_keeps_task(self):
+        played = []
+
+        async def play(quiz_category, rounds):
+            played.append((quiz_category, rounds))
+
+        async def run():
+            await handle_player(websocket)
+            await room.task
+
+        websocket = FakeWebSocket({'type': 'join', 'room': 'test', 'player': 'Arthur Dent'},
+                                  {'type': 'start', 'quiz_category': 2, 'rounds': 3})
+        room = rooms['test'] = QuizRoom('test')
+        room.broadcast = lambda message: None
+        room.play = play
+        asyncio.run(run())
+
+        self.assertIsInstance(room.task, asyncio.Task)
+        self.assertEqual(played, [(2, 3)])
+
+
+if __name__ == "__main__":
+    unittest.main()
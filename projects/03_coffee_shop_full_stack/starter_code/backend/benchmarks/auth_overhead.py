@@ -0,0 +1,103 @@
+"""Benchmark of the auth overhead per request, with and without the JWKS and token caches.
+
+Run from the backend folder:
+    python benchmarks/auth_overhead.py --jwks-latency-ms 50
+
+A local stub JWKS server stands in for Auth0; --jwks-latency-ms adds an
+artificial delay to every key fetch to mimic the network round trip.
+"""
+import argparse
+import base64
+import json
+import os
+import sys
+import threading
+import time
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from socketserver import ThreadingMixIn
+
+from Crypto.PublicKey import RSA
+from jose import jwt
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+KID = 'benchmark-key'
+
+
+def b64_int(value):
+    data = value.to_bytes((value.bit_length() + 7) // 8, 'big')
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode()
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+def start_jwks_server(public_key, latency):
+    body = json.dumps({'keys': [{
+        'kty': 'RSA', 'kid': KID, 'use': 'sig', 'alg': 'RS256',
+        'n': b64_int(public_key.n), 'e': b64_int(public_key.e)
+    }]}).encode()
+
+    class JWKSHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(latency)
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('localhost', 0), JWKSHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--jwks-latency-ms', type=float, default=0)
+    args = parser.parse_args()
+
+    private_key = RSA.generate(2048)
+    server = start_jwks_server(private_key.publickey(), args.jwks_latency_ms / 1000)
+    os.environ['AUTH0_JWKS_URL'] = f'http://localhost:{server.server_port}/.well-known/jwks.json'
+
+    from src.auth import auth
+
+    token = jwt.encode({
+        'iss': f'https://{auth.AUTH0_DOMAIN}/',
+        'aud': auth.API_AUDIENCE,
+        'exp': int(time.time()) + 3600,
+        'permissions': ['get:drinks-detail']
+    }, private_key.export_key().decode(), algorithm='RS256', headers={'kid': KID})
+
+    def run(clear_keys, clear_tokens):
+        auth.token_cache.clear()
+        start = time.perf_counter()
+        for _ in range(args.requests):
+            if clear_keys:
+                auth.key_source.clear()
+            if clear_tokens:
+                auth.token_cache.clear()
+            auth.verify_decode_jwt(token)
+        return (time.perf_counter() - start) / args.requests * 1000
+
+    uncached = run(clear_keys=True, clear_tokens=True)
+    keys_cached = run(clear_keys=False, clear_tokens=True)
+    tokens_cached = run(clear_keys=False, clear_tokens=False)
+
+    print(f'auth overhead per request, mean of {args.requests} (ms), '
+          f'JWKS latency {args.jwks_latency_ms:.0f} ms')
+    print(f'fetch JWKS every request: {uncached:>8.3f}')
+    print(f'cached JWKS:              {keys_cached:>8.3f}')
+    print(f'cached JWKS and tokens:   {tokens_cached:>8.3f}')
+    print(f'token cache: {auth.token_cache.stats()}')
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+"""Load test of concurrent orders against a limited stock.
+
+Run from the backend folder:
+    python benchmarks/orders_load.py --threads 8 --batch 1
+    python benchmarks/orders_load.py --database-url postgresql://laura@localhost:5432/coffee_orders
+
+Threads place random orders through the API until the stock runs out. The
+test then checks that no ingredient was oversold: the stock taken must
+equal the parts of all placed orders and never go below zero.
+THE DATABASE IS EMPTIED, by default it is a new SQLite file.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCHMARKS_DIR)
+sys.path.insert(0, BACKEND_DIR)
+
+COLORS = ['brown', 'white', 'black', 'pink', 'grey']
+
+
+def run_thread(app, args, headers, deadline, results):
+    client = app.test_client()
+    refused_in_a_row = 0
+
+    while time.perf_counter() < deadline and refused_in_a_row < args.give_up_after:
+        orders = [{'drinks': [{'id': random.randint(1, args.drinks), 'quantity': random.randint(1, 2)}]}
+                  for _ in range(args.batch)]
+        if args.batch == 1:
+            res = client.post('/orders', headers=headers, json=orders[0])
+            placed = [res.json['order']] if res.status_code == 200 else []
+            if res.status_code not in (200, 409):
+                results['errors'] += 1
+        else:
+            res = client.post('/orders/batch', headers=headers, json={'orders': orders})
+            if res.status_code != 200:
+                results['errors'] += 1
+                continue
+            placed = [order for order in res.json['orders'] if 'id' in order]
+
+        results['placed'].extend(placed)
+        results['refused'] += len(orders) - len(placed)
+        refused_in_a_row = 0 if placed else refused_in_a_row + 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database-url')
+    parser.add_argument('--sqlite-mode', default='wal')
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--batch', type=int, default=1, help='orders per request, >1 uses /orders/batch')
+    parser.add_argument('--drinks', type=int, default=10)
+    parser.add_argument('--ingredients', type=int, default=5)
+    parser.add_argument('--stock', type=int, default=2000, help='initial parts of every ingredient')
+    parser.add_argument('--duration', type=float, default=30, help='maximum seconds')
+    parser.add_argument('--give-up-after', type=int, default=20,
+                        help='a thread stops after this many refused requests in a row')
+    args = parser.parse_args()
+
+    from Crypto.PublicKey import RSA
+    from jose import jwt
+    from auth_overhead import KID, start_jwks_server
+
+    private_key = RSA.generate(2048)
+    server = start_jwks_server(private_key.publickey(), 0)
+    os.environ.update({
+        'AUTH0_JWKS_URL': f'http://localhost:{server.server_port}/.well-known/jwks.json',
+        'DATABASE_URL': args.database_url or 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'orders.db'),
+        'SQLITE_MODE': args.sqlite_mode
+    })
+
+    from src.api import app
+    from src.auth import auth
+    from src.database.models import db, Drink, Stock
+
+    db.drop_all()
+    db.create_all()
+    names = [f'ingredient {n}' for n in range(args.ingredients)]
+    recipes = {}
+    for n in range(1, args.drinks + 1):
+        recipe = [{'name': name, 'color': random.choice(COLORS), 'parts': random.randint(1, 3)}
+                  for name in random.sample(names, random.randint(1, min(3, len(names))))]
+        db.session.add(Drink(id=n, title=f'Drink {n}', recipe=recipe))
+        recipes[n] = recipe
+    db.session.execute(Stock.__table__.insert(), [{'name': name, 'quantity': args.stock} for name in names])
+    db.session.commit()
+    db.session.remove()
+
+    token = jwt.encode({
+        'iss': f'https://{auth.AUTH0_DOMAIN}/',
+        'aud': auth.API_AUDIENCE,
+        'exp': int(time.time()) + 3600,
+        'permissions': ['post:orders']
+    }, private_key.export_key().decode(), algorithm='RS256', headers={'kid': KID})
+    headers = {'Authorization': f'Bearer {token}'}
+
+    results = {'placed': [], 'refused': 0, 'errors': 0}
+    start = time.perf_counter()
+    threads = [threading.Thread(target=run_thread, args=(app, args, headers, start + args.duration, results))
+               for _ in range(args.threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    server.shutdown()
+
+    consumed = dict.fromkeys(names, 0)
+    for order in results['placed']:
+        for item in order['drinks']:
+            for part in recipes[item['id']]:
+                consumed[part['name']] += part['parts'] * item['quantity']
+    stock = dict(db.session.query(Stock.name, Stock.quantity))
+
+    engine = db.engine.dialect.name
+    print(f'{engine}, {args.threads} threads, {args.batch} orders per request')
+    print(f'placed {len(results["placed"])} orders in {elapsed:.1f} s: '
+          f'{len(results["placed"]) / elapsed:.0f} orders/s, {results["refused"]} refused, '
+          f'{results["errors"]} errors')
+    oversold = False
+    for name in names:
+        taken = args.stock - stock[name]
+        ok = taken == consumed[name] and stock[name] >= 0
+        oversold = oversold or not ok
+        print(f'{name:<16} left {stock[name]:>6}  taken {taken:>6}  ordered {consumed[name]:>6}  '
+              f'{"ok" if ok else "OVERSOLD"}')
+    sys.exit(1 if oversold else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+"""Benchmark of mixed /drinks reads and PATCH writes in each SQLite mode.
+
+Run from the backend folder:
+    python benchmarks/sqlite_concurrency.py --processes 4 --threads 4
+
+Every mode gets a fresh database file in a temporary folder; the workers
+are forked processes, each running several threads with their own test
+client. Writes are authorized with tokens of a local stub JWKS server.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCHMARKS_DIR)
+sys.path.insert(0, BACKEND_DIR)
+
+COLORS = ['brown', 'white', 'black', 'pink', 'grey']
+
+
+def run_thread(app, args, deadline, results):
+    client = app.test_client()
+    headers = {'Authorization': f'Bearer {args.token}'}
+
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        if random.random() < args.write_ratio:
+            kind = 'write'
+            res = client.patch(f'/drinks/{random.randint(1, args.drinks)}', headers=headers, json={
+                'recipe': [{'name': 'coffee', 'color': random.choice(COLORS), 'parts': random.randint(1, 9)}]
+            })
+        else:
+            kind = 'read'
+            res = client.get('/drinks')
+        elapsed = (time.perf_counter() - start) * 1000
+
+        results[kind].append(elapsed)
+        if res.status_code != 200:
+            results['errors'] += 1
+
+
+def run_process(app, args, deadline, queue):
+    results = {'read': [], 'write': [], 'errors': 0}
+    threads = [threading.Thread(target=run_thread, args=(app, args, deadline, results))
+               for _ in range(args.threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    queue.put(results)
+
+
+def run_mode(args):
+    """Runs one mode in this process; prints the results as JSON."""
+    from Crypto.PublicKey import RSA
+    from jose import jwt
+    from auth_overhead import KID, start_jwks_server
+
+    private_key = RSA.generate(2048)
+    server = start_jwks_server(private_key.publickey(), 0)
+    folder = tempfile.mkdtemp()
+    os.environ.update({
+        'AUTH0_JWKS_URL': f'http://localhost:{server.server_port}/.well-known/jwks.json',
+        'DATABASE_URL': 'sqlite:///' + os.path.join(folder, 'coffee_shop.db'),
+        'SQLITE_MODE': args.run,
+        'MENU_CACHE_MAX_AGE': str(args.menu_max_age)
+    })
+
+    from flask_migrate import upgrade
+    from src.manage import app
+    from src.auth import auth
+    from src.database.models import db, Drink
+
+    with app.app_context():
+        upgrade()
+    db.session.add_all([
+        Drink(title=f'Drink {n}', recipe=[{'name': 'coffee', 'color': 'brown', 'parts': 1}])
+        for n in range(1, args.drinks + 1)
+    ])
+    db.session.commit()
+    db.session.remove()
+    db.engine.dispose()
+
+    args.token = jwt.encode({
+        'iss': f'https://{auth.AUTH0_DOMAIN}/',
+        'aud': auth.API_AUDIENCE,
+        'exp': int(time.time()) + 3600,
+        'permissions': ['patch:drinks']
+    }, private_key.export_key().decode(), algorithm='RS256', headers={'kid': KID})
+
+    context = multiprocessing.get_context('fork')
+    queue = context.Queue()
+    deadline = time.perf_counter() + args.duration
+    processes = [context.Process(target=run_process, args=(app, args, deadline, queue))
+                 for _ in range(args.processes)]
+    for process in processes:
+        process.start()
+    results = [queue.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    reads = [latency for result in results for latency in result['read']]
+    writes = [latency for result in results for latency in result['write']]
+    print(json.dumps({
+        'reads_per_second': len(reads) / args.duration,
+        'writes_per_second': len(writes) / args.duration,
+        'read_p95_ms': percentile(reads, 95),
+        'write_p95_ms': percentile(writes, 95),
+        'errors': sum(result['errors'] for result in results)
+    }))
+    server.shutdown()
+
+
+def percentile(values, percent):
+    if len(values) < 2:
+        return values[0] if values else 0.0
+    return statistics.quantiles(values, n=100)[percent - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--modes', default='default,wal', help='comma separated SQLITE_MODE values')
+    parser.add_argument('--processes', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=4, help='threads per process')
+    parser.add_argument('--duration', type=float, default=5, help='seconds per mode')
+    parser.add_argument('--write-ratio', type=float, default=0.2)
+    parser.add_argument('--drinks', type=int, default=20)
+    parser.add_argument('--menu-max-age', type=float, default=0.001,
+                        help='MENU_CACHE_MAX_AGE, small so that reads reach the database')
+    parser.add_argument('--run', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        run_mode(args)
+        return
+
+    print(f'{args.processes} processes x {args.threads} threads, {args.duration:.0f} s per mode, '
+          f'{args.write_ratio:.0%} writes')
+    print(f'{"mode":<10}{"reads/s":>10}{"writes/s":>10}{"read p95":>10}{"write p95":>10}{"errors":>8}')
+    for mode in args.modes.split(','):
+        # a fresh interpreter per mode, SQLITE_MODE is read at import
+        output = subprocess.run([sys.executable, __file__, '--run', mode] + sys.argv[1:],
+                                check=True, stdout=subprocess.PIPE, cwd=BACKEND_DIR).stdout
+        result = json.loads(output.decode().strip().splitlines()[-1])
+        print(f'{mode:<10}{result["reads_per_second"]:>10.0f}{result["writes_per_second"]:>10.0f}'
+              f'{result["read_p95_ms"]:>10.1f}{result["write_p95_ms"]:>10.1f}{result["errors"]:>8}')
+
+
+if __name__ == '__main__':
+    main()
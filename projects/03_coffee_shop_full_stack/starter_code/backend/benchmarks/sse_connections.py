@@ -0,0 +1,145 @@
+"""Benchmark of idle /drinks/stream connections on one gevent worker.
+
+Run from the backend folder (needs gunicorn and gevent):
+    python benchmarks/sse_connections.py --clients 2000
+
+Starts one gunicorn gevent worker on a new SQLite file, opens --clients
+idle event streams, reports the worker's memory per connection, then
+creates a drink and measures how long the event takes to reach every client.
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.request import Request, urlopen
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCHMARKS_DIR)
+sys.path.insert(0, BACKEND_DIR)
+
+
+def worker_rss_kb(master_pid):
+    with open(f'/proc/{master_pid}/task/{master_pid}/children') as file:
+        worker_pid = int(file.read().split()[0])
+    with open(f'/proc/{worker_pid}/status') as file:
+        for line in file:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1])
+
+
+def wait_until_ready(url, timeout=15):
+    deadline = time.time() + timeout
+    while True:
+        try:
+            urlopen(url, timeout=1).read()
+            return
+        except OSError:
+            if time.time() > deadline:
+                raise
+            time.sleep(0.1)
+
+
+async def open_stream(host, port):
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(f'GET /drinks/stream HTTP/1.1\r\nHost: {host}\r\n\r\n'.encode())
+    await reader.readuntil(b'retry: 5000')
+    return reader, writer
+
+
+async def wait_for_event(reader, kind):
+    await reader.readuntil(f'event: {kind}'.encode())
+    return time.perf_counter()
+
+
+async def run_clients(args, master_pid, create_drink):
+    streams = []
+    for start in range(0, args.clients, 200):
+        streams += await asyncio.gather(*[open_stream(args.host, args.port)
+                                          for _ in range(start, min(start + 200, args.clients))])
+    await asyncio.sleep(1)
+    rss = worker_rss_kb(master_pid)
+
+    waiting = [asyncio.ensure_future(wait_for_event(reader, 'created')) for reader, writer in streams]
+    await asyncio.sleep(0.5)
+    sent_at = time.perf_counter()
+    await asyncio.get_running_loop().run_in_executor(None, create_drink)
+    received = await asyncio.wait_for(asyncio.gather(*waiting), 60)
+
+    for reader, writer in streams:
+        writer.close()
+    return rss, [(at - sent_at) * 1000 for at in received]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clients', type=int, default=1000)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    if args.clients + 100 > hard:
+        sys.exit(f'the open file limit ({hard}) is too low for {args.clients} clients')
+
+    from Crypto.PublicKey import RSA
+    from jose import jwt
+    from auth_overhead import KID, start_jwks_server
+
+    private_key = RSA.generate(2048)
+    jwks_server = start_jwks_server(private_key.publickey(), 0)
+    env = dict(os.environ,
+               AUTH0_JWKS_URL=f'http://localhost:{jwks_server.server_port}/.well-known/jwks.json',
+               DATABASE_URL='sqlite:///' + os.path.join(tempfile.mkdtemp(), 'coffee_shop.db'))
+    os.environ.update(env)
+
+    from src.api import app
+    from src.auth import auth
+    from src.database.models import db, seed_db
+
+    db.create_all()
+    seed_db()
+    db.session.remove()
+    db.engine.dispose()
+
+    token = jwt.encode({
+        'iss': f'https://{auth.AUTH0_DOMAIN}/',
+        'aud': auth.API_AUDIENCE,
+        'exp': int(time.time()) + 3600,
+        'permissions': ['post:drinks']
+    }, private_key.export_key().decode(), algorithm='RS256', headers={'kid': KID})
+
+    def create_drink():
+        body = json.dumps({'title': 'Stream', 'recipe': [{'name': 'milk', 'color': 'white', 'parts': 1}]})
+        urlopen(Request(f'http://{args.host}:{args.port}/drinks', data=body.encode(), headers={
+            'Authorization': f'Bearer {token}', 'Content-Type': 'application/json'
+        })).read()
+
+    server = subprocess.Popen([
+        sys.executable, '-m', 'gunicorn', '-k', 'gevent', '-w', '1',
+        '--worker-connections', str(args.clients + 100), '-b', f'{args.host}:{args.port}', 'src.api:app'
+    ], cwd=BACKEND_DIR, env=env, stderr=subprocess.DEVNULL)
+    try:
+        wait_until_ready(f'http://{args.host}:{args.port}/drinks')
+        idle_rss = worker_rss_kb(server.pid)
+        rss, latencies = asyncio.run(run_clients(args, server.pid, create_drink))
+    finally:
+        server.terminate()
+        server.wait()
+        jwks_server.shutdown()
+
+    print(f'{args.clients} idle /drinks/stream connections on one gevent worker')
+    print(f'worker memory: {idle_rss / 1024:.1f} MB idle, {rss / 1024:.1f} MB connected, '
+          f'{(rss - idle_rss) / args.clients:.1f} KB per connection')
+    print(f'event delivered to {len(latencies)} clients, ms after the POST: '
+          f'median {statistics.median(latencies):.1f}, max {max(latencies):.1f}')
+
+
+if __name__ == '__main__':
+    main()
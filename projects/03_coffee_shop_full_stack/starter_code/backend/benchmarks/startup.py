@@ -0,0 +1,73 @@
+"""Benchmark of the time until a fresh process serves its first request.
+
+Run from the backend folder:
+    python benchmarks/startup.py --runs 10 --reset
+
+Every run is a new interpreter, like a new gunicorn worker. --reset adds
+runs that call db_drop_and_create_all() after the import, as the app used
+to do on every start.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PREPARE = '''
+from flask_migrate import upgrade
+from src.manage import app
+from src.database.models import seed_db
+with app.app_context():
+    upgrade()
+    seed_db()
+'''
+
+START = '''
+import json, time
+start = time.perf_counter()
+from src.api import app
+imported = time.perf_counter()
+if RESET:
+    from src.database.models import db_drop_and_create_all
+    db_drop_and_create_all()
+ready = time.perf_counter()
+status = app.test_client().get('/drinks').status_code
+served = time.perf_counter()
+print(json.dumps({'import': imported - start, 'setup': ready - imported,
+                  'first_request': served - ready, 'status': status}))
+'''
+
+
+def run(code, env):
+    output = subprocess.run([sys.executable, '-c', code], check=True, env=env, cwd=BACKEND_DIR,
+                            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL).stdout
+    return json.loads(output.decode().strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--reset', action='store_true', help='also measure the old drop and create on start')
+    args = parser.parse_args()
+
+    env = dict(os.environ, DATABASE_URL='sqlite:///' + os.path.join(tempfile.mkdtemp(), 'coffee_shop.db'))
+    subprocess.run([sys.executable, '-c', PREPARE], check=True, env=env, cwd=BACKEND_DIR,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    variants = [('no database I/O', False)] + ([('drop and create', True)] if args.reset else [])
+    print(f'median of {args.runs} fresh processes (ms)')
+    print(f'{"start":<18}{"import":>10}{"setup":>10}{"1st request":>13}')
+    for name, reset in variants:
+        results = [run(f'RESET = {reset}\n' + START, env) for _ in range(args.runs)]
+        assert all(result['status'] == 200 for result in results)
+        median = {key: statistics.median(result[key] for result in results) * 1000
+                  for key in ('import', 'setup', 'first_request')}
+        print(f'{name:<18}{median["import"]:>10.1f}{median["setup"]:>10.1f}{median["first_request"]:>13.1f}')
+
+
+if __name__ == '__main__':
+    main()
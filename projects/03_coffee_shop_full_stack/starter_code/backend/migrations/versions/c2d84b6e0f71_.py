@@ -0,0 +1,26 @@
+"""drink version for the recipe cache
+
+Revision ID: c2d84b6e0f71
+Revises: a7c3e5f19b20
+Create Date: 2020-04-25 09:41:13.672954
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c2d84b6e0f71'
+down_revision = 'a7c3e5f19b20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # existing drinks start at version 1
+    op.add_column('drink', sa.Column('version', sa.Integer(), nullable=False, server_default='1'))
+
+
+def downgrade():
+    with op.batch_alter_table('drink') as batch_op:
+        batch_op.drop_column('version')
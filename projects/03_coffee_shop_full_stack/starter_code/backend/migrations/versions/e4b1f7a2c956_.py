@@ -0,0 +1,68 @@
+"""normalized ingredients instead of the recipe blob
+
+Revision ID: e4b1f7a2c956
+Revises: c2d84b6e0f71
+Create Date: 2020-05-02 14:08:51.230417
+
+"""
+import json
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4b1f7a2c956'
+down_revision = 'c2d84b6e0f71'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    ingredient = op.create_table('ingredient',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('drink_id', sa.Integer(), nullable=False),
+    sa.Column('position', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=80), nullable=False),
+    sa.Column('color', sa.String(length=80), nullable=False),
+    sa.Column('parts', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['drink_id'], ['drink.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_ingredient_drink_id'), 'ingredient', ['drink_id'], unique=False)
+    op.create_index('ix_ingredient_name_drink_id', 'ingredient', ['name', 'drink_id'], unique=False)
+
+    # move the parts of every recipe blob into rows
+    rows = []
+    for drink_id, recipe in op.get_bind().execute(sa.text('SELECT id, recipe FROM drink')):
+        for position, part in enumerate(json.loads(recipe)):
+            rows.append({
+                'drink_id': drink_id,
+                'position': position,
+                'name': str(part['name']),
+                'color': str(part['color']),
+                'parts': int(part['parts'])
+            })
+    if rows:
+        op.bulk_insert(ingredient, rows)
+
+    with op.batch_alter_table('drink') as batch_op:
+        batch_op.drop_column('recipe')
+
+
+def downgrade():
+    with op.batch_alter_table('drink') as batch_op:
+        batch_op.add_column(sa.Column('recipe', sa.String(length=180), nullable=False, server_default='[]'))
+
+    bind = op.get_bind()
+    recipes = {}
+    for drink_id, name, color, parts in bind.execute(sa.text(
+            'SELECT drink_id, name, color, parts FROM ingredient ORDER BY drink_id, position')):
+        recipes.setdefault(drink_id, []).append({'name': name, 'color': color, 'parts': parts})
+    for drink_id, recipe in recipes.items():
+        bind.execute(sa.text('UPDATE drink SET recipe = :recipe WHERE id = :id'),
+                     recipe=json.dumps(recipe), id=drink_id)
+
+    op.drop_index('ix_ingredient_name_drink_id', table_name='ingredient')
+    op.drop_index(op.f('ix_ingredient_drink_id'), table_name='ingredient')
+    op.drop_table('ingredient')
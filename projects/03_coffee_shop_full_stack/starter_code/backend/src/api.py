@@ -1,18 +1,31 @@
 import os
-from flask import Flask, request, jsonify, abort
+from flask import Flask, request, jsonify, abort, Response
 from sqlalchemy.exc import SQLAlchemyError
-import json
 from flask_cors import CORS
 
-from .database.models import db_drop_and_create_all, setup_db, Drink
-from .auth.auth import AuthError, requires_auth
+from .database.models import setup_db, Drink, Stock, drinks_with_ingredient, ingredient_totals
+from .database.batch import upsert_drinks
+from .database.menu import menu
+from .events import menu_events
+from .database.orders import OutOfStock, parse_order, parse_orders, place_orders, restock
+from .auth.auth import AuthError, requires_auth, audit_log, metrics, token_cache
 
+# importing the app does not touch the database, the schema and the test
+# drink are created with the commands of src/manage.py
 app = Flask(__name__)
 setup_db(app)
 CORS(app)
 
-# NOTE: THIS WILL DROP ALL RECORDS AND START YOUR DB FROM SCRATCH
-db_drop_and_create_all()
+
+# ##--------------------------------------------------## #
+# ##--------------------- Helpers --------------------## #
+# ##--------------------------------------------------## #
+
+# sends a pre-serialized menu body, or 304 if the client's ETag still matches
+def menu_response(body, etag):
+    response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    return response.make_conditional(request)
 
 
 # ##--------------------------------------------------## #
@@ -23,38 +36,64 @@ db_drop_and_create_all()
 # ##----------------- get all drinks -----------------## #
 @app.route('/drinks', methods=['GET'])
 def get_drinks():
-    drinks_query = Drink.query.all()
-
-    drinks = []
-    for drink in drinks_query:
-        drinks.append(drink.short())
+    snapshot = menu.snapshot()
 
-    if not drinks:
+    if not snapshot.count:
         abort(404)
 
-    return jsonify({
-        'success': True,
-        'drinks': drinks
-    }), 200
+    return menu_response(snapshot.short_body, snapshot.short_etag)
+
+
+# ##---------------- stream menu changes -------------## #
+# server-sent events instead of polling /drinks, see README "Live menu"
+@app.route('/drinks/stream', methods=['GET'])
+def stream_drinks():
+    subscriber = menu_events.subscribe()
+
+    return Response(menu_events.stream(subscriber), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        # no buffering in nginx, events must reach the client right away
+        'X-Accel-Buffering': 'no'
+    })
 
 
 # ##----------- get all drinks in details ------------## #
 @app.route('/drinks-detail', methods=['GET'])
 @requires_auth('get:drinks-detail')
 def get_drink_details(payload):
-    drinks_query = Drink.query.all()
+    snapshot = menu.snapshot()
 
-    drinks = []
-    for drink in drinks_query:
-        drinks.append(drink.long())
+    if not snapshot.count:
+        abort(404)
+
+    return menu_response(snapshot.long_body, snapshot.long_etag)
+
+
+# ##----------------- get ingredients ----------------## #
+@app.route('/ingredients', methods=['GET'])
+def get_ingredients():
+    return jsonify({
+        'success': True,
+        'ingredients': [{
+            'name': name,
+            'drinks': drinks,
+            'parts': parts
+        } for name, drinks, parts in ingredient_totals()]
+    })
+
+
+# ##----------- get drinks by ingredient -------------## #
+@app.route('/ingredients/<name>/drinks', methods=['GET'])
+def get_drinks_with_ingredient(name):
+    drinks = drinks_with_ingredient(name)
 
     if not drinks:
         abort(404)
 
     return jsonify({
         'success': True,
-        'drinks': drinks
-    }), 200
+        'drinks': [drink.short() for drink in drinks]
+    })
 
 
 # ##------------------ create drink ------------------## #
@@ -68,19 +107,56 @@ def create_drink(payload):
         abort(404)
 
     try:
-        new_drink = Drink(title=title, recipe=json.dumps(recipe))
+        new_drink = Drink(title=title, recipe=recipe)
         new_drink.insert()
 
-    except SQLAlchemyError as error:
-        print(error)
+    except (ValueError, KeyError, TypeError):
         abort(422)
 
+    except SQLAlchemyError:
+        abort(422)
+
+    menu.rebuild()
+    menu_events.publish('created', drink=new_drink.short())
+
     return jsonify({
         'success': True,
         'drinks': [new_drink.long()]
     }), 200
 
 
+# ##------------- create or update drinks ------------## #
+# a whole menu in one request, by title: one token and permission check,
+# one transaction, one menu rebuild
+@app.route('/drinks/batch', methods=['PUT'])
+@requires_auth(['post:drinks', 'patch:drinks'])
+def upsert_drink_batch(payload):
+    drinks = request.get_json().get('drinks')
+    if not isinstance(drinks, list) or not drinks:
+        abort(422)
+
+    try:
+        results = upsert_drinks(drinks)
+
+    except SQLAlchemyError:
+        abort(422)
+
+    if any(not isinstance(result, Exception) for result in results):
+        menu.rebuild()
+    for result in results:
+        if not isinstance(result, Exception):
+            menu_events.publish('created' if result['created'] else 'updated', drink=result['drink'])
+
+    return jsonify({
+        'success': True,
+        'drinks': [{
+            'success': False,
+            'error': 422,
+            'message': str(result)
+        } if isinstance(result, Exception) else dict(result, success=True) for result in results]
+    })
+
+
 # ##------------------ update drink ------------------## #
 @app.route('/drinks/<int:drink_id>', methods=['PATCH'])
 @requires_auth('patch:drinks')
@@ -97,18 +173,21 @@ def update_drink(payload, drink_id):
     if not (title or recipe):
         abort(404)
 
-    if title:
-        drink.title = title
+    try:
+        if title:
+            drink.title = title
 
-    if recipe:
-        drink.recipe = json.dumps(recipe)
+        if recipe:
+            drink.recipe = recipe
 
-    try:
         drink.update()
 
-    except SQLAlchemyError:
+    except (ValueError, KeyError, TypeError, SQLAlchemyError):
         abort(422)
 
+    menu.rebuild()
+    menu_events.publish('updated', drink=drink.short())
+
     return jsonify({
         'success': True,
         'drinks': [drink.long()]
@@ -130,16 +209,131 @@ def delete_drink(payload, drink_id):
     except SQLAlchemyError:
         abort(422)
 
+    menu.rebuild()
+    menu_events.publish('deleted', id=drink_id)
+
     return jsonify({
         'success': True,
         'delete': drink_id
     }), 200
 
 
+# ##-------------------- get stock -------------------## #
+@app.route('/stock', methods=['GET'])
+@requires_auth('get:drinks-detail')
+def get_stock(payload):
+    return jsonify({
+        'success': True,
+        'stock': [stock.format() for stock in Stock.query.order_by(Stock.name)]
+    })
+
+
+# ##--------------------- restock --------------------## #
+@app.route('/stock', methods=['POST'])
+@requires_auth('patch:stock')
+def add_stock(payload):
+    deliveries = request.get_json().get('stock')
+
+    if not isinstance(deliveries, dict) or not deliveries:
+        abort(422)
+
+    try:
+        restock(deliveries)
+
+    except (ValueError, SQLAlchemyError):
+        abort(422)
+
+    return jsonify({
+        'success': True,
+        'stock': [stock.format() for stock in Stock.query.filter(Stock.name.in_(deliveries))]
+    })
+
+
+# ##------------------- place order ------------------## #
+@app.route('/orders', methods=['POST'])
+@requires_auth('post:orders')
+def create_order(payload):
+    try:
+        order = place_orders([parse_order(request.get_json()['drinks'])])[0]
+
+    except (ValueError, KeyError, TypeError, SQLAlchemyError):
+        abort(422)
+
+    if isinstance(order, ValueError):
+        abort(422)
+    if isinstance(order, OutOfStock):
+        return out_of_stock(order)
+
+    return jsonify({
+        'success': True,
+        'order': order
+    })
+
+
+# ##------------- place orders in a batch ------------## #
+# every order is placed or refused on its own, all in one transaction;
+# a malformed order or one with an unknown drink is refused with 422
+@app.route('/orders/batch', methods=['POST'])
+@requires_auth('post:orders')
+def create_orders(payload):
+    try:
+        orders = request.get_json()['orders']
+        if not isinstance(orders, list) or not orders:
+            abort(422)
+        results = place_orders(parse_orders(orders))
+
+    except (KeyError, TypeError, SQLAlchemyError):
+        abort(422)
+
+    return jsonify({
+        'success': True,
+        'placed': sum(1 for result in results if not isinstance(result, Exception)),
+        'orders': [order_error(result) if isinstance(result, Exception) else result
+                   for result in results]
+    })
+
+
+# ##------------------ auth metrics ------------------## #
+# where the time of requires_auth goes, for this worker process
+@app.route('/auth/metrics', methods=['GET'])
+@requires_auth('get:auth-metrics')
+def get_auth_metrics(payload):
+    return jsonify({
+        'success': True,
+        'auth': metrics.stats(),
+        'token_cache': token_cache.stats(),
+        'audit_log': audit_log.stats() if audit_log is not None else None
+    })
+
+
 # ##--------------------------------------------------## #
 # ##---------------- Error Handling ------------------## #
 # ##--------------------------------------------------## #
 
+def out_of_stock_error(error):
+    return {
+        "success": False,
+        "error": 409,
+        "message": "out of stock",
+        "ingredients": error.ingredients
+    }
+
+
+def out_of_stock(error):
+    return jsonify(out_of_stock_error(error)), 409
+
+
+# an order of a batch that was refused
+def order_error(error):
+    if isinstance(error, OutOfStock):
+        return out_of_stock_error(error)
+    return {
+        "success": False,
+        "error": 422,
+        "message": str(error)
+    }
+
+
 @app.errorhandler(422)
 def unprocessable(error):
     return jsonify({
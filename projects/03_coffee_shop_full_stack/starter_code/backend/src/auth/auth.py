@@ -1,154 +1,54 @@
-import json
-from flask import request, abort
-from functools import wraps
-from jose import jwt
-from urllib.request import urlopen
+import logging
+import os
+
+from shared_auth import Auth, AuditLog, AuthError, JWKSKeySource, PEMKeySource, get_token_auth_header
 
 AUTH0_DOMAIN = 'coffee-shop-lb.eu.auth0.com'
-ALGORITHMS = ['RS256']
+# comma separated, some of shared_auth.SUPPORTED_ALGORITHMS
+ALGORITHMS = os.environ.get('AUTH0_ALGORITHMS', 'RS256').split(',')
 API_AUDIENCE = 'coffee'
-
-
-# AuthError Exception: standardized way to communicate auth failure modes
-
-class AuthError(Exception):
-    def __init__(self, error, status_code):
-        self.error = error
-        self.status_code = status_code
-
-
-def get_token_auth_header():
-    # get the header from the request
-    auth = request.headers.get('Authorization', None)
-    # raise an AuthError if no header is present
-    if not auth:
-        raise AuthError({
-            'code': 'authorization_header_missing',
-            'description': 'Authorization header is expected.'
-        }, 401)
-
-    # split bearer and the token
-    parts = auth.split(' ')
-    if parts[0].lower() != 'bearer':
-        raise AuthError({
-            'code': 'invalid_header',
-            'description': 'Authorization header must start with "Bearer".'
-        }, 401)
-
-    # raise an AuthError if the header is malformed
-    elif len(parts) == 1:
-        raise AuthError({
-            'code': 'invalid_header',
-            'description': 'Token not found.'
-        }, 401)
-
-    elif len(parts) > 2:
-        raise AuthError({
-            'code': 'invalid_header',
-            'description': 'Authorization header must be bearer token.'
-        }, 401)
-
-    # return the token part of the header
-    token = parts[1]
-    return token
-
-
-def check_permissions(permission, payload):
-    # raise an AuthError if permissions are not included in the payload
-    if 'permissions' not in payload:
-        abort(400)
-
-    # raise an AuthError if the requested permission string is not in the
-    # payload permissions array
-    if permission not in payload['permissions']:
-        abort(401)
-
-    # return true otherwise
-    return True
+# can point to a local stub JWKS server for development and tests
+JWKS_URL = os.environ.get('AUTH0_JWKS_URL', f'https://{AUTH0_DOMAIN}/.well-known/jwks.json')
+# verifies with a local public key instead of the key set, e.g. offline
+PUBLIC_KEY_FILE = os.environ.get('AUTH0_PUBLIC_KEY_FILE')
+# the sampled audit log of requires_auth: a file, - for stderr or an empty value to turn it off
+AUDIT_LOG = os.environ.get('AUTH_AUDIT_LOG', '-')
 
 
 # !!NOTE urlopen has a common certificate error described here:
 # https://stackoverflow.com/questions/50236117/scraping-ssl-certificate-verify-failed-error-for-http-en-wikipedia-org
 
-def verify_decode_jwt(token):
-    # verify the token using Auth0 /.well-known/jwks.json
-    jsonurl = urlopen(f'https://{AUTH0_DOMAIN}/.well-known/jwks.json')
-    jwks = json.loads(jsonurl.read())
-    unverified_header = jwt.get_unverified_header(token)
-    rsa_key = {}
-    # check whether token is an Auth0 token with key id (kid)
-    if 'kid' not in unverified_header:
-        raise AuthError({
-            'code': 'invalid_header',
-            'description': 'Authorization malformed.'
-        }, 401)
-
-    for key in jwks['keys']:
-        if key['kid'] == unverified_header['kid']:
-            rsa_key = {
-                'kty': key['kty'],
-                'kid': key['kid'],
-                'use': key['use'],
-                'n': key['n'],
-                'e': key['e']
-            }
-    if rsa_key:
-        try:
-            # decode the payload from the token
-            payload = jwt.decode(
-                token,
-                rsa_key,
-                algorithms=ALGORITHMS,
-                audience=API_AUDIENCE,
-                issuer='https://' + AUTH0_DOMAIN + '/'
-            )
-
-            # return the decoded payload
-            return payload
-
-        # validate the claims
-        except jwt.ExpiredSignatureError:
-            raise AuthError({
-                'code': 'token_expired',
-                'description': 'Token expired.'
-            }, 401)
-
-        except jwt.JWTClaimsError:
-            raise AuthError({
-                'code': 'invalid_claims',
-                'description': 'Incorrect claims. Please, check the audience and issuer.'
-            }, 401)
-        except Exception:
-            raise AuthError({
-                'code': 'invalid_header',
-                'description': 'Unable to parse authentication token.'
-            }, 400)
-    raise AuthError({
-        'code': 'invalid_header',
-        'description': 'Unable to find the appropriate key.'
-    }, 400)
-
-
-def requires_auth(permission=''):
-    def requires_auth_decorator(f):
-        @wraps(f)
-        def wrapper(*args, **kwargs):
-            # get the token
-            token = get_token_auth_header()
-
-            try:
-                # decode the jwt
-                payload = verify_decode_jwt(token)
-            except AuthError as error:
-                print(error)
-                abort(401)
-
-            # validate claims and check the requested permission
-            check_permissions(permission, payload)
-
-            # return the decorator which passes the decoded payload to the decorated method
-            return f(payload, *args, **kwargs)
-
-        return wrapper
-
-    return requires_auth_decorator
+if PUBLIC_KEY_FILE:
+    key_source = PEMKeySource.from_file(PUBLIC_KEY_FILE, ALGORITHMS[0])
+else:
+    # signing keys by kid, fetched once instead of on every request
+    key_source = JWKSKeySource(JWKS_URL, ALGORITHMS)
+
+# every failure and a sample of the authorized requests, written by a
+# background thread instead of printed by the request
+audit_log = AuditLog(
+    logging.FileHandler(AUDIT_LOG, delay=True) if AUDIT_LOG != '-' else None,
+    sample_rate=float(os.environ.get('AUTH_AUDIT_SAMPLE_RATE', 0.01))
+) if AUDIT_LOG else None
+
+auth = Auth(
+    key_source,
+    audience=API_AUDIENCE,
+    issuer=f'https://{AUTH0_DOMAIN}/',
+    algorithms=ALGORITHMS,
+    # payloads of verified tokens, 0 turns the cache off
+    token_cache_size=int(os.environ.get('AUTH_TOKEN_CACHE_SIZE', 1024)),
+    # the postman collection expects 401 for a missing permission
+    permission_denied_status=401,
+    # turns on session cookies, checked with an HMAC instead of the token signature
+    session_secret=os.environ.get('AUTH_SESSION_SECRET'),
+    session_max_age=int(os.environ.get('AUTH_SESSION_MAX_AGE', 300)),
+    audit_log=audit_log
+)
+token_cache = auth.token_cache
+# timings per stage and counts per outcome of requires_auth, see GET /auth/metrics
+metrics = auth.metrics
+
+verify_decode_jwt = auth.verify_decode_jwt
+check_permissions = auth.check_permissions
+requires_auth = auth.requires_auth
@@ -0,0 +1,107 @@
+from sqlalchemy import text
+
+from .models import db, Drink, Ingredient
+
+# rows per IN (...) list, below the 999 variables of older SQLite builds
+CHUNK_SIZE = 500
+
+# one statement inserts a new drink or bumps the version of an existing one,
+# so a concurrent single-drink update of the same drink fails instead of
+# being overwritten; the same syntax works in PostgreSQL and SQLite >= 3.24,
+# SQLAlchemy 1.3 only has a construct for the former
+upsert_drink = text(
+    'INSERT INTO drink (title, version) VALUES (:title, 1) '
+    'ON CONFLICT (title) DO UPDATE SET version = drink.version + 1'
+)
+
+
+def chunks(values):
+    values = list(values)
+    for start in range(0, len(values), CHUNK_SIZE):
+        yield values[start:start + CHUNK_SIZE]
+
+
+# validate_drink(drink)
+#     (title, [Ingredient, ...]) of a {'title': ..., 'recipe': [...]} item
+#     raises ValueError, KeyError or TypeError for a malformed item
+
+def validate_drink(drink):
+    title = drink['title']
+    if not isinstance(title, str) or not 0 < len(title) <= 80:
+        raise ValueError('a title must have 1 to 80 characters')
+
+    recipe = drink['recipe']
+    if not isinstance(recipe, list) or not recipe:
+        raise ValueError('a recipe is a non-empty list of ingredients')
+
+    return title, [Ingredient.from_dict(position, part) for position, part in enumerate(recipe)]
+
+
+# upsert_drinks(drinks)
+#     creates or replaces the drinks by title, in one transaction
+#     returns per item either {'created', 'drink': short form} for a written drink,
+#     or the ValueError that rejected it
+#     every valid item is written, an invalid one does not stop the batch
+
+def upsert_drinks(drinks):
+    results = []
+    recipes = {}
+    for drink in drinks:
+        try:
+            title, ingredients = validate_drink(drink)
+            if title in recipes:
+                raise ValueError(f'{title} appears twice in the batch')
+        except ValueError as error:
+            results.append(error)
+            continue
+        except KeyError as error:
+            results.append(ValueError(f'{error.args[0]} is missing'))
+            continue
+        except TypeError:
+            results.append(ValueError('a drink is an object with a title and a recipe'))
+            continue
+
+        recipes[title] = ingredients
+        results.append(title)
+
+    if not recipes:
+        return results
+
+    try:
+        connection = db.session.connection()
+        existing = set()
+        for titles in chunks(recipes):
+            existing.update(title for title, in db.session.query(Drink.title).filter(Drink.title.in_(titles)))
+
+        connection.execute(upsert_drink, [{'title': title} for title in recipes])
+
+        ids = {}
+        for titles in chunks(recipes):
+            ids.update((title, drink_id) for drink_id, title in
+                       db.session.query(Drink.id, Drink.title).filter(Drink.title.in_(titles)))
+
+        # the recipes are replaced as a whole
+        for drink_ids in chunks(ids.values()):
+            connection.execute(Ingredient.__table__.delete().where(Ingredient.drink_id.in_(drink_ids)))
+        connection.execute(Ingredient.__table__.insert(), [{
+            'drink_id': ids[title],
+            'position': ingredient.position,
+            'name': ingredient.name,
+            'color': ingredient.color,
+            'parts': ingredient.parts
+        } for title, ingredients in recipes.items() for ingredient in ingredients])
+
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    # the session holds no drinks, the written ones are not reloaded
+    return [result if isinstance(result, Exception) else {
+        'created': result not in existing,
+        'drink': {
+            'id': ids[result],
+            'title': result,
+            'recipe': [ingredient.short() for ingredient in recipes[result]]
+        }
+    } for result in results]
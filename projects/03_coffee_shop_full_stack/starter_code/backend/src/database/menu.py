@@ -0,0 +1,165 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import namedtuple
+from itertools import groupby
+
+from .models import db, Drink, Ingredient
+
+# serialized /drinks and /drinks-detail bodies of one state of the menu
+MenuSnapshot = namedtuple('MenuSnapshot', [
+    'built_at', 'count', 'short_body', 'short_etag', 'long_body', 'long_etag'
+])
+
+
+# the menu as (drink id, title, name, color, parts) rows, ordered by drink and
+# position, in one joined query; plain rows skip building a model per ingredient
+def query_menu_rows():
+    return db.session.query(Drink.id, Drink.title, Ingredient.name, Ingredient.color, Ingredient.parts) \
+        .outerjoin(Drink.ingredients) \
+        .order_by(Drink.id, Ingredient.position) \
+        .all()
+
+
+# builds the same forms as Drink.short() and Drink.long()
+# built_at is when the rows were queried, not when they were serialized
+def build_snapshot(rows, built_at):
+    short_drinks = []
+    long_drinks = []
+    for (drink_id, title), parts in groupby(rows, key=lambda row: row[:2]):
+        parts = [row[2:] for row in parts if row[2] is not None]
+        short_drinks.append({
+            'id': drink_id,
+            'title': title,
+            'recipe': [{'color': color, 'parts': count} for name, color, count in parts]
+        })
+        long_drinks.append({
+            'id': drink_id,
+            'title': title,
+            'recipe': [{'name': name, 'color': color, 'parts': count} for name, color, count in parts]
+        })
+
+    short_body = json.dumps({'success': True, 'drinks': short_drinks}).encode()
+    long_body = json.dumps({'success': True, 'drinks': long_drinks}).encode()
+
+    return MenuSnapshot(
+        built_at=built_at,
+        count=len(short_drinks),
+        short_body=short_body,
+        short_etag=hashlib.sha1(short_body).hexdigest(),
+        long_body=long_body,
+        long_etag=hashlib.sha1(long_body).hexdigest()
+    )
+
+
+# LocalMenuStore
+#     keeps the snapshot in this process
+
+class LocalMenuStore:
+    def __init__(self):
+        self._snapshot = None
+
+    def get(self):
+        return self._snapshot
+
+    def set(self, snapshot):
+        # a single reference swap, readers see either the old or the new menu;
+        # MenuCache's lock already orders the rebuilds of this process
+        self._snapshot = snapshot
+        return True
+
+
+# RedisMenuStore
+#     shares the snapshot between all worker processes through one Redis hash
+#     - set() is a compare-and-set on built_at in one Lua script: a worker
+#       whose query started before another worker's keeps the newer
+#       snapshot instead of overwriting it with a menu missing a write
+
+# KEYS[1]: the hash, ARGV[1]: built_at of the new snapshot, then its fields and values
+SET_IF_NEWER = """
+local current = redis.call('HGET', KEYS[1], 'built_at')
+if current and tonumber(current) > tonumber(ARGV[1]) then
+    return 0
+end
+redis.call('HSET', KEYS[1], unpack(ARGV, 2))
+return 1
+"""
+
+
+class RedisMenuStore:
+    def __init__(self, url, key='coffee-shop:menu'):
+        import redis
+
+        self._redis = redis.Redis.from_url(url)
+        self._key = key
+        self._set_if_newer = self._redis.register_script(SET_IF_NEWER)
+
+    def get(self):
+        values = self._redis.hmget(self._key, MenuSnapshot._fields)
+        if values[0] is None:
+            return None
+
+        built_at, count, short_body, short_etag, long_body, long_etag = values
+        return MenuSnapshot(float(built_at), int(count), short_body, short_etag.decode(),
+                            long_body, long_etag.decode())
+
+    # set(snapshot)
+    #     stores the snapshot, False if the stored one was queried later
+
+    def set(self, snapshot):
+        fields = [item for pair in snapshot._asdict().items() for item in pair]
+        return bool(self._set_if_newer(keys=[self._key], args=[repr(snapshot.built_at)] + fields))
+
+
+# MenuCache
+#     serves the menu from the store and rebuilds it from the database
+#     after every write; max_age bounds how long a snapshot can miss writes
+#     made by another worker, e.g. if the Redis store was not reachable
+
+class MenuCache:
+    def __init__(self, store, max_age=None):
+        self.store = store
+        self.max_age = max_age
+        self._lock = threading.Lock()
+
+    def _expired(self, snapshot):
+        return snapshot is None or (self.max_age and time.time() - snapshot.built_at > self.max_age)
+
+    def _build(self):
+        # taken before the query, a later query always has a later built_at
+        built_at = time.time()
+        snapshot = build_snapshot(query_menu_rows(), built_at)
+        if not self.store.set(snapshot):
+            # another worker stored a newer menu meanwhile
+            return self.store.get() or snapshot
+        return snapshot
+
+    def snapshot(self):
+        snapshot = self.store.get()
+        if self._expired(snapshot):
+            with self._lock:
+                # readers that waited for the lock take the snapshot the
+                # first one built, one rebuild per expiry
+                snapshot = self.store.get()
+                if self._expired(snapshot):
+                    snapshot = self._build()
+        return snapshot
+
+    def rebuild(self):
+        # after a write; the lock keeps a slow rebuild of this process from
+        # overwriting a newer one, the store's set() does so across workers
+        with self._lock:
+            return self._build()
+
+
+def create_menu_cache():
+    redis_url = os.environ.get('MENU_CACHE_REDIS_URL')
+    max_age = float(os.environ.get('MENU_CACHE_MAX_AGE', 5))
+    if redis_url:
+        return MenuCache(RedisMenuStore(redis_url), max_age=max_age)
+    return MenuCache(LocalMenuStore(), max_age=max_age)
+
+
+menu = create_menu_cache()
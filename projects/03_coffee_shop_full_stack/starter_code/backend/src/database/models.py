@@ -1,26 +1,81 @@
 import os
-from sqlalchemy import Column, String, Integer
+import sqlite3
+from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, Index, CheckConstraint, distinct, event, func
+from sqlalchemy.orm import joinedload
+from sqlalchemy.orm.attributes import flag_modified
+from sqlalchemy.pool import QueuePool
 from flask_sqlalchemy import SQLAlchemy
 import json
 
 database_filename = "database.db"
 project_dir = os.path.dirname(os.path.abspath(__file__))
-database_path = "sqlite:///{}".format(os.path.join(project_dir, database_filename))
+# used by src/manage.py, the app itself does not load Flask-Migrate
+migrations_dir = os.path.join(os.path.dirname(os.path.dirname(project_dir)), 'migrations')
+database_path = os.environ.get(
+    'DATABASE_URL', "sqlite:///{}".format(os.path.join(project_dir, database_filename)))
+
+# PRAGMAs run on every new SQLite connection, chosen with SQLITE_MODE
+# - default: SQLite's own rollback journal, a writer blocks all readers
+# - wal: readers and the single writer no longer block each other; with
+#   synchronous=NORMAL a commit does not wait for fsync (a power loss can
+#   lose the last commits, never corrupt the file); busy_timeout lets a
+#   second writer wait for the lock instead of failing at once; its
+#   connections are pooled, so the page cache survives between requests
+# both turn foreign keys on, SQLite ignores them otherwise and ON DELETE
+# CASCADE would leave the ingredients of a deleted drink behind
+SQLITE_MODES = {
+    'default': {
+        'foreign_keys': 'ON',
+        'journal_mode': 'DELETE',
+        'synchronous': 'FULL'
+    },
+    'wal': {
+        'foreign_keys': 'ON',
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': 5000,
+        'mmap_size': 64 * 1024 * 1024,
+        'cache_size': -16000
+    }
+}
+sqlite_mode = os.environ.get('SQLITE_MODE', 'wal')
 
 db = SQLAlchemy()
 
 
 # setup_db(app)
 # binds a flask application and a SQLAlchemy service
+# no database I/O happens here, the schema is created with `flask db upgrade`
+# through src/manage.py
 
 def setup_db(app):
     app.config["SQLALCHEMY_DATABASE_URI"] = database_path
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    if database_path.startswith('sqlite:///') and sqlite_mode == 'wal':
+        app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
+            'poolclass': QueuePool,
+            'connect_args': {'check_same_thread': False}
+        }
     db.app = app
     db.init_app(app)
 
+    # creating the engine does not connect yet
+    if db.engine.dialect.name == 'sqlite':
+        event.listen(db.engine, 'connect', set_sqlite_pragmas)
+
+
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_MODES[sqlite_mode].items():
+        cursor.execute(f'PRAGMA {name}={value}')
+    cursor.close()
+
 
 # !!NOTE you can change the database_filename variable to have multiple verisons of a database
+# NOTE: THIS WILL DROP ALL RECORDS AND START YOUR DB FROM SCRATCH
 def db_drop_and_create_all():
     # drops the database tables and starts fresh
     db.drop_all()
@@ -28,9 +83,20 @@ def db_drop_and_create_all():
     # can be used to initialize a clean database
     db.create_all()
 
-    # creates first entry for postman testing
-    new_drink = Drink(title="Test", recipe='[{"name": "test", "color": "pink", "parts": 100}]')
+    seed_db()
+
+
+# seed_db()
+#     creates the first entry for postman testing, unless there are drinks already
+#     returns True if the drink was added
+
+def seed_db():
+    if Drink.query.first() is not None:
+        return False
+
+    new_drink = Drink(title="Test", recipe=[{"name": "test", "color": "pink", "parts": 100}])
     new_drink.insert()
+    return True
 
 
 # a persistent drink entity, extends the base SQLAlchemy Model
@@ -39,18 +105,39 @@ class Drink(db.Model):
     id = Column(Integer().with_variant(Integer, "sqlite"), primary_key=True)
     # String Title
     title = Column(String(80), unique=True)
-    # the ingredients blob - this stores a lazy json blob
+    # the recipe, one Ingredient row per part, in the order they were given
+    ingredients = db.relationship('Ingredient', order_by='Ingredient.position',
+                                  cascade='all, delete-orphan', passive_deletes=True)
+    # incremented by SQLAlchemy on every update, a concurrent update of the
+    # same drink fails instead of silently overwriting it
+    version = Column(Integer, nullable=False)
+
+    __mapper_args__ = {'version_id_col': version}
+
+    # the recipe in its api form
     # the required datatype is [{'color': string, 'name':string, 'parts':number}]
-    recipe = Column(String(180), nullable=False)
+    # setting it replaces all ingredients, e.g. Drink(title=req_title, recipe=req_recipe)
+    # raises ValueError, KeyError or TypeError for a malformed recipe
+    @property
+    def recipe(self):
+        return [ingredient.long() for ingredient in self.ingredients]
+
+    @recipe.setter
+    def recipe(self, recipe):
+        if not isinstance(recipe, list) or not recipe:
+            raise ValueError('a recipe is a non-empty list of ingredients')
+
+        self.ingredients = [Ingredient.from_dict(position, part) for position, part in enumerate(recipe)]
+        # a changed recipe alone does not update the drink row, bump the version anyway
+        if self.id is not None:
+            flag_modified(self, 'title')
 
     # short form representation of the Drink model
     def short(self):
-        print(json.loads(self.recipe))
-        short_recipe = [{'color': r['color'], 'parts': r['parts']} for r in json.loads(self.recipe)]
         return {
             'id': self.id,
             'title': self.title,
-            'recipe': short_recipe
+            'recipe': [ingredient.short() for ingredient in self.ingredients]
         }
 
     # long form representation of the Drink model
@@ -58,7 +145,7 @@ class Drink(db.Model):
         return {
             'id': self.id,
             'title': self.title,
-            'recipe': json.loads(self.recipe)
+            'recipe': self.recipe
         }
 
     # insert()
@@ -97,3 +184,93 @@ class Drink(db.Model):
 
     def __repr__(self):
         return json.dumps(self.short())
+
+
+# one part of a drink's recipe
+class Ingredient(db.Model):
+    id = Column(Integer, primary_key=True)
+    drink_id = Column(Integer, ForeignKey('drink.id', ondelete='CASCADE'), nullable=False, index=True)
+    # order of the ingredient in the recipe
+    position = Column(Integer, nullable=False)
+    name = Column(String(80), nullable=False)
+    color = Column(String(80), nullable=False)
+    parts = Column(Integer, nullable=False)
+
+    # "which drinks use milk" is answered from the index alone
+    __table_args__ = (Index('ix_ingredient_name_drink_id', 'name', 'drink_id'),)
+
+    @classmethod
+    def from_dict(cls, position, part):
+        parts = part['parts']
+        if not isinstance(parts, int) or isinstance(parts, bool) or parts < 1:
+            raise ValueError('parts must be a positive whole number')
+
+        name, color = str(part['name']), str(part['color'])
+        if not 0 < len(name) <= 80 or not 0 < len(color) <= 80:
+            raise ValueError('names and colors must have 1 to 80 characters')
+
+        return cls(position=position, name=name, color=color, parts=parts)
+
+    def short(self):
+        return {'color': self.color, 'parts': self.parts}
+
+    def long(self):
+        return {'name': self.name, 'color': self.color, 'parts': self.parts}
+
+
+# the parts of an ingredient in store, only changed through src/database/orders.py
+class Stock(db.Model):
+    name = Column(String(80), primary_key=True)
+    quantity = Column(Integer, nullable=False)
+
+    __table_args__ = (CheckConstraint('quantity >= 0', name='ck_stock_quantity'),)
+
+    def format(self):
+        return {'name': self.name, 'quantity': self.quantity}
+
+
+# a placed order of one or more drinks
+class Order(db.Model):
+    __tablename__ = 'orders'
+
+    id = Column(Integer, primary_key=True)
+    placed_at = Column(DateTime, nullable=False, server_default=func.now())
+    items = db.relationship('OrderItem', cascade='all, delete-orphan')
+
+    def format(self):
+        return {
+            'id': self.id,
+            'drinks': [{'id': item.drink_id, 'quantity': item.quantity} for item in self.items]
+        }
+
+
+class OrderItem(db.Model):
+    __tablename__ = 'order_items'
+
+    order_id = Column(Integer, ForeignKey('orders.id', ondelete='CASCADE'), primary_key=True)
+    # no foreign key, a drink can leave the menu after it was ordered
+    drink_id = Column(Integer, primary_key=True)
+    quantity = Column(Integer, nullable=False)
+
+
+# drinks_with_ingredient(name)
+#     the drinks whose recipe uses the ingredient, with their full recipes,
+#     in a single query
+
+def drinks_with_ingredient(name):
+    using = db.session.query(Ingredient.drink_id).filter(Ingredient.name == name)
+    return Drink.query.options(joinedload(Drink.ingredients)) \
+        .filter(Drink.id.in_(using)) \
+        .order_by(Drink.id) \
+        .all()
+
+
+# ingredient_totals()
+#     (name, number of drinks, total parts) of every ingredient on the menu
+
+def ingredient_totals():
+    return db.session.query(
+        Ingredient.name,
+        func.count(distinct(Ingredient.drink_id)),
+        func.sum(Ingredient.parts)
+    ).group_by(Ingredient.name).order_by(Ingredient.name).all()
@@ -0,0 +1,176 @@
+from sqlalchemy import and_, bindparam
+
+from .models import db, Ingredient, Stock, Order, OrderItem
+from .batch import chunks
+
+
+class OutOfStock(Exception):
+    def __init__(self, ingredients):
+        super().__init__(f'out of stock: {", ".join(ingredients)}')
+        self.ingredients = ingredients
+
+
+# stock changes are single conditional UPDATEs, the database checks and
+# decrements in one step, so concurrent orders can never oversell
+take_stock = Stock.__table__.update() \
+    .where(and_(Stock.name == bindparam('ingredient'), Stock.quantity >= bindparam('parts'))) \
+    .values(quantity=Stock.quantity - bindparam('parts'))
+
+return_stock = Stock.__table__.update() \
+    .where(Stock.name == bindparam('ingredient')) \
+    .values(quantity=Stock.quantity + bindparam('parts'))
+
+
+# parse_order(drinks)
+#     [{'id': drink id, 'quantity': n}, ...] of a request as {drink id: quantity}
+#     raises ValueError, KeyError or TypeError for a malformed order
+
+def parse_order(drinks):
+    if not isinstance(drinks, list) or not drinks:
+        raise ValueError('an order is a non-empty list of drinks')
+
+    items = {}
+    for drink in drinks:
+        drink_id = drink['id']
+        quantity = drink.get('quantity', 1)
+        if not isinstance(drink_id, int) or not isinstance(quantity, int) \
+                or isinstance(quantity, bool) or quantity < 1:
+            raise ValueError('drink ids and quantities must be positive whole numbers')
+        items[drink_id] = items.get(drink_id, 0) + quantity
+    return items
+
+
+# parse_orders(orders)
+#     parse_order() of every {'drinks': [...]} of a batch, or the ValueError
+#     that rejected it, so a malformed order does not stop the batch
+
+def parse_orders(orders):
+    parsed = []
+    for order in orders:
+        try:
+            parsed.append(parse_order(order['drinks']))
+        except ValueError as error:
+            parsed.append(error)
+        except (KeyError, TypeError):
+            parsed.append(ValueError('an order is an object with a list of drinks'))
+    return parsed
+
+
+# required_parts(orders)
+#     the parts needed per ingredient by each order, from a single query
+#     over the recipes of all drinks in the orders
+#     an order with a drink that is not on the menu gets a ValueError instead,
+#     like an order that was already rejected
+
+def required_parts(orders):
+    drink_ids = {drink_id for items in orders if not isinstance(items, ValueError) for drink_id in items}
+    recipes = {}
+    for drink_id, name, parts in db.session.query(Ingredient.drink_id, Ingredient.name, Ingredient.parts) \
+            .filter(Ingredient.drink_id.in_(drink_ids)):
+        recipes.setdefault(drink_id, []).append((name, parts))
+
+    needed = []
+    for items in orders:
+        if isinstance(items, ValueError):
+            needed.append(items)
+            continue
+
+        missing = items.keys() - recipes.keys()
+        if missing:
+            needed.append(ValueError(f'unknown drinks: {sorted(missing)}'))
+            continue
+
+        parts_by_name = {}
+        for drink_id, quantity in items.items():
+            for name, parts in recipes[drink_id]:
+                parts_by_name[name] = parts_by_name.get(name, 0) + parts * quantity
+        needed.append(parts_by_name)
+    return needed
+
+
+# lock_stock(names)
+#     locks the stock rows of the ingredients in name order, for the rest
+#     of the transaction (SELECT ... FOR UPDATE, SQLite locks the whole
+#     database on the first write instead)
+#     a batch locks every row it may take before its first order, so two
+#     batches wait for each other in the same order and never deadlock
+
+def lock_stock(names):
+    for chunk in chunks(sorted(names)):
+        db.session.query(Stock.name).filter(Stock.name.in_(chunk)) \
+            .order_by(Stock.name).with_for_update().all()
+
+
+# take(parts_by_name)
+#     decrements the stock of every ingredient, or none of them
+#     the rows are already locked by lock_stock; an ingredient without
+#     stock counts as out of stock
+
+def take(parts_by_name):
+    connection = db.session.connection()
+    taken = []
+    for name in sorted(parts_by_name):
+        params = {'ingredient': name, 'parts': parts_by_name[name]}
+        if connection.execute(take_stock, params).rowcount != 1:
+            # give back what this order took so far, still in the same transaction
+            if taken:
+                connection.execute(return_stock, taken)
+            raise OutOfStock([name])
+        taken.append(params)
+
+
+# place_orders(orders)
+#     places every order of the list that is in stock, in one transaction
+#     returns the formatted order, an OutOfStock error or the ValueError that
+#     rejected it per order, in the same order
+
+def place_orders(orders):
+    results = []
+    try:
+        needed = required_parts(orders)
+        lock_stock(set().union(*(parts_by_name for parts_by_name in needed
+                                 if not isinstance(parts_by_name, ValueError))))
+
+        for items, parts_by_name in zip(orders, needed):
+            if isinstance(parts_by_name, ValueError):
+                results.append(parts_by_name)
+                continue
+
+            try:
+                take(parts_by_name)
+            except OutOfStock as error:
+                results.append(error)
+                continue
+
+            order = Order(items=[OrderItem(drink_id=drink_id, quantity=quantity)
+                                 for drink_id, quantity in items.items()])
+            db.session.add(order)
+            results.append(order)
+
+        # formatted before the commit expires the orders
+        db.session.flush()
+        results = [result if isinstance(result, Exception) else result.format() for result in results]
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return results
+
+
+# restock(deliveries)
+#     adds {ingredient: parts} to the stock, creating missing ingredients
+
+def restock(deliveries):
+    try:
+        connection = db.session.connection()
+        for name, parts in sorted(deliveries.items()):
+            if not isinstance(parts, int) or isinstance(parts, bool) or parts < 1:
+                raise ValueError('deliveries must be positive whole numbers')
+
+            if connection.execute(return_stock, {'ingredient': name, 'parts': parts}).rowcount != 1:
+                connection.execute(Stock.__table__.insert(), {'name': name, 'quantity': parts})
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
@@ -0,0 +1,122 @@
+import json
+import os
+import queue
+import threading
+import time
+
+# a comment line keeps idle connections open through proxies and lets the
+# server notice clients that went away
+KEEPALIVE_SECONDS = 15
+# events waiting per client, a client that falls further behind gets a reset
+SUBSCRIBER_QUEUE_SIZE = 100
+# asks clients to reload /drinks, e.g. after they missed events
+RESET = 'event: reset\ndata: {}\n\n'
+
+
+# encodes a menu change as a server-sent event, e.g.
+#     event: updated
+#     data: {"drink": {"id": 1, "title": "Latte", "recipe": [...]}}
+def encode_event(kind, **data):
+    return f'event: {kind}\ndata: {json.dumps(data)}\n\n'
+
+
+# LocalBroker
+#     fans events out to the clients connected to this process
+#     - every client has its own bounded queue, publish never waits for a
+#       slow client; a client whose queue is full is sent a reset instead
+#     - an idle client costs one queue and, with an async worker, one greenlet
+
+class LocalBroker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = set()
+
+    def subscribe(self):
+        subscriber = queue.Queue(SUBSCRIBER_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    def publish(self, kind, **data):
+        self.dispatch(encode_event(kind, **data))
+
+    def dispatch(self, message):
+        with self._lock:
+            subscribers = list(self._subscribers)
+
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(message)
+            except queue.Full:
+                # the client missed events, replace its backlog with a reset
+                with subscriber.mutex:
+                    subscriber.queue.clear()
+                subscriber.put_nowait(RESET)
+
+    # the body of a /drinks/stream response
+    def stream(self, subscriber):
+        try:
+            # reconnect after 5 seconds if the connection drops
+            yield 'retry: 5000\n\n'
+            while True:
+                try:
+                    yield subscriber.get(timeout=KEEPALIVE_SECONDS)
+                except queue.Empty:
+                    yield ': keep-alive\n\n'
+        finally:
+            self.unsubscribe(subscriber)
+
+
+# RedisBroker
+#     publishes through a Redis channel, so a change made in one worker process
+#     reaches the clients of all workers; each process listens on the channel
+#     in one background thread and fans the events out locally
+
+class RedisBroker(LocalBroker):
+    def __init__(self, url, channel='coffee-shop:menu-events'):
+        import redis
+
+        super().__init__()
+        self._redis = redis.Redis.from_url(url)
+        self._errors = (redis.RedisError, OSError)
+        self._channel = channel
+        self._listener = None
+
+    def subscribe(self):
+        with self._lock:
+            if self._listener is None:
+                self._listener = threading.Thread(target=self._listen, daemon=True)
+                self._listener.start()
+        return super().subscribe()
+
+    def publish(self, kind, **data):
+        self._redis.publish(self._channel, encode_event(kind, **data))
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self._channel)
+                for message in pubsub.listen():
+                    self.dispatch(message['data'].decode())
+            except self._errors:
+                # events may have been lost while disconnected
+                self.dispatch(RESET)
+                time.sleep(1)
+
+
+def create_broker():
+    redis_url = os.environ.get('MENU_EVENTS_REDIS_URL')
+    if redis_url:
+        return RedisBroker(redis_url)
+    return LocalBroker()
+
+
+menu_events = create_broker()
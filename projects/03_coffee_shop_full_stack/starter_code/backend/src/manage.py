@@ -0,0 +1,32 @@
+import click
+from flask_migrate import Migrate, stamp
+
+from .api import app
+from .database.models import db, db_drop_and_create_all, seed_db, migrations_dir
+
+# the app with its database commands, kept out of src/api.py so that the
+# workers serving requests do not import Flask-Migrate and alembic
+#     export FLASK_APP=manage.py
+#     flask db upgrade
+#     flask seed-db
+migrate = Migrate(app, db, directory=migrations_dir)
+
+
+# flask seed-db
+#     adds the test drink to an empty menu, run after `flask db upgrade`
+@app.cli.command('seed-db')
+def seed_db_command():
+    if seed_db():
+        click.echo('Added the test drink.')
+    else:
+        click.echo('The menu already has drinks, nothing added.')
+
+
+# flask reset-db
+#     drops all drinks and starts from the seeded schema
+@app.cli.command('reset-db')
+@click.confirmation_option(prompt='This drops all drinks. Continue?')
+def reset_db_command():
+    db_drop_and_create_all()
+    stamp()
+    click.echo('Recreated the database with the test drink.')
@@ -0,0 +1,123 @@
+import unittest
+
+# sets DATABASE_URL and AUTH0_JWKS_URL before src.api reads them
+from testing import issuer
+
+from src.api import app
+from src.database.batch import upsert_drinks
+from src.database.models import db, Drink, Ingredient
+
+
+class DrinkBatchTestCase(unittest.TestCase):
+    """Checks upsert_drinks and PUT /drinks/batch against a fresh SQLite database"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app_context = app.app_context()
+        cls.app_context.push()
+        cls.headers = {'Authorization': f'Bearer {issuer.mint(["post:drinks", "patch:drinks"])}'}
+
+    @classmethod
+    def tearDownClass(cls):
+        db.session.remove()
+        db.engine.dispose()
+        cls.app_context.pop()
+
+    def setUp(self):
+        db.create_all()
+        self.client = app.test_client()
+
+        self.latte = Drink(title='Latte', recipe=[{'name': 'milk', 'color': 'white', 'parts': 2},
+                                                 {'name': 'espresso', 'color': 'brown', 'parts': 1}])
+        self.latte.insert()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+
+    def ingredients(self, drink_id):
+        return [(ingredient.position, ingredient.name, ingredient.parts) for ingredient in
+                Ingredient.query.filter(Ingredient.drink_id == drink_id).order_by(Ingredient.position)]
+
+    # upsert_drinks()
+
+    def test_created_on_insert_not_on_update(self):
+        results = upsert_drinks([{'title': 'Latte', 'recipe': [{'name': 'milk', 'color': 'white', 'parts': 1}]},
+                                 {'title': 'Mocha', 'recipe': [{'name': 'choc', 'color': 'brown', 'parts': 1}]}])
+
+        self.assertEqual([result['created'] for result in results], [False, True])
+        self.assertEqual(results[0]['drink']['id'], self.latte.id)
+        self.assertEqual(Drink.query.count(), 2)
+
+    def test_update_bumps_version(self):
+        upsert_drinks([{'title': 'Latte', 'recipe': [{'name': 'milk', 'color': 'white', 'parts': 1}]}])
+        db.session.expire_all()
+
+        self.assertEqual(Drink.query.get(self.latte.id).version, 2)
+
+    def test_recipe_is_replaced_as_a_whole(self):
+        results = upsert_drinks([{'title': 'Latte', 'recipe': [{'name': 'oat milk', 'color': 'beige', 'parts': 3}]}])
+
+        self.assertEqual(results[0]['drink']['recipe'], [{'color': 'beige', 'parts': 3}])
+        self.assertEqual(self.ingredients(self.latte.id), [(0, 'oat milk', 3)])
+
+    def test_title_twice_in_batch_rejects_the_second(self):
+        results = upsert_drinks([{'title': 'Mocha', 'recipe': [{'name': 'choc', 'color': 'brown', 'parts': 1}]},
+                                 {'title': 'Mocha', 'recipe': [{'name': 'milk', 'color': 'white', 'parts': 1}]}])
+
+        self.assertTrue(results[0]['created'])
+        self.assertIsInstance(results[1], ValueError)
+        self.assertIn('appears twice', str(results[1]))
+        self.assertEqual(self.ingredients(results[0]['drink']['id']), [(0, 'choc', 1)])
+
+    def test_invalid_items_do_not_stop_the_batch(self):
+        results = upsert_drinks([{'title': '', 'recipe': [{'name': 'milk', 'color': 'white', 'parts': 1}]},
+                                 {'title': 'Mocha'},
+                                 'Mocha',
+                                 {'title': 'Mocha', 'recipe': [{'name': 'choc', 'color': 'brown', 'parts': 0}]},
+                                 {'title': 'Cortado', 'recipe': [{'name': 'milk', 'color': 'white', 'parts': 1}]}])
+
+        self.assertTrue(all(isinstance(result, ValueError) for result in results[:4]))
+        self.assertEqual(str(results[1]), 'recipe is missing')
+        self.assertTrue(results[4]['created'])
+        self.assertEqual([drink.title for drink in Drink.query.order_by(Drink.title)], ['Cortado', 'Latte'])
+
+    def test_only_invalid_items_write_nothing(self):
+        results = upsert_drinks([{'title': 'Latte', 'recipe': []}])
+
+        self.assertIsInstance(results[0], ValueError)
+        self.assertEqual(self.ingredients(self.latte.id), [(0, 'milk', 2), (1, 'espresso', 1)])
+
+    # '/drinks/batch', methods=['PUT']
+
+    def test_put_batch_reports_each_item(self):
+        res = self.client.put('/drinks/batch', json={'drinks': [
+            {'title': 'Latte', 'recipe': [{'name': 'milk', 'color': 'white', 'parts': 3}]},
+            {'title': 'Mocha', 'recipe': 'choc'},
+            {'title': 'Mocha', 'recipe': [{'name': 'choc', 'color': 'brown', 'parts': 1}]}
+        ]}, headers=self.headers)
+        drinks = res.json['drinks']
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual((drinks[0]['success'], drinks[0]['created']), (True, False))
+        self.assertEqual((drinks[1]['success'], drinks[1]['error']), (False, 422))
+        self.assertEqual((drinks[2]['success'], drinks[2]['created']), (True, True))
+        self.assertEqual(self.ingredients(self.latte.id), [(0, 'milk', 3)])
+
+    def test_422_put_batch_without_drinks(self):
+        res = self.client.put('/drinks/batch', json={'drinks': []}, headers=self.headers)
+
+        self.assertEqual(res.status_code, 422)
+
+    def test_401_put_batch_without_patch_permission(self):
+        headers = {'Authorization': f'Bearer {issuer.mint(["post:drinks"])}'}
+        res = self.client.put('/drinks/batch', json={'drinks': [
+            {'title': 'Mocha', 'recipe': [{'name': 'choc', 'color': 'brown', 'parts': 1}]}
+        ]}, headers=headers)
+
+        self.assertEqual(res.status_code, 401)
+        self.assertEqual(Drink.query.count(), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
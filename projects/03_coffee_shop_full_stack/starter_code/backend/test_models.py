@@ -0,0 +1,62 @@
+import os
+import tempfile
+import unittest
+
+# a throwaway SQLite file, set before the models read DATABASE_URL
+database_dir = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(database_dir, 'test.db')
+
+from flask import Flask
+
+from src.database.models import setup_db, db, Drink, Ingredient, ingredient_totals
+
+
+class DrinkModelTestCase(unittest.TestCase):
+    """Checks the drink and ingredient rows against a fresh SQLite database"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = Flask(__name__)
+        setup_db(cls.app)
+        cls.app_context = cls.app.app_context()
+        cls.app_context.push()
+
+    @classmethod
+    def tearDownClass(cls):
+        db.session.remove()
+        db.engine.dispose()
+        cls.app_context.pop()
+
+    def setUp(self):
+        db.create_all()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+
+    def test_delete_drink_deletes_its_ingredients(self):
+        latte = Drink(title='Latte', recipe=[{'name': 'milk', 'color': 'white', 'parts': 3}])
+        latte.insert()
+        # the ingredients are not loaded, the database has to delete them
+        db.session.expire_all()
+        Drink.query.get(latte.id).delete()
+
+        self.assertEqual(Ingredient.query.count(), 0)
+        self.assertEqual(ingredient_totals(), [])
+
+    def test_reused_drink_id_has_only_its_own_ingredients(self):
+        latte = Drink(title='Latte', recipe=[{'name': 'milk', 'color': 'white', 'parts': 3}])
+        latte.insert()
+        db.session.expire_all()
+        Drink.query.get(latte.id).delete()
+
+        mocha = Drink(title='Mocha', recipe=[{'name': 'choc', 'color': 'brown', 'parts': 1}])
+        mocha.insert()
+        db.session.expire_all()
+
+        self.assertEqual(Drink.query.get(mocha.id).long()['recipe'],
+                         [{'name': 'choc', 'color': 'brown', 'parts': 1}])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,126 @@
+import unittest
+
+# sets DATABASE_URL and AUTH0_JWKS_URL before src.api reads them
+from testing import issuer
+
+from src.api import app
+from src.database.models import db, Drink, Stock
+from src.database.orders import parse_order, restock, take_stock
+
+
+class OrdersTestCase(unittest.TestCase):
+    """Checks orders and stock against a fresh SQLite database"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app_context = app.app_context()
+        cls.app_context.push()
+        cls.headers = {'Authorization': f'Bearer {issuer.mint(["post:orders"])}'}
+
+    @classmethod
+    def tearDownClass(cls):
+        db.session.remove()
+        db.engine.dispose()
+        cls.app_context.pop()
+
+    def setUp(self):
+        db.create_all()
+        self.client = app.test_client()
+
+        self.latte = Drink(title='Latte', recipe=[{'name': 'milk', 'color': 'white', 'parts': 2},
+                                                 {'name': 'espresso', 'color': 'brown', 'parts': 1}])
+        self.latte.insert()
+        self.mocha = Drink(title='Mocha', recipe=[{'name': 'choc', 'color': 'brown', 'parts': 1},
+                                                 {'name': 'milk', 'color': 'white', 'parts': 1}])
+        self.mocha.insert()
+        restock({'milk': 3, 'espresso': 1, 'choc': 5})
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+
+    def stock(self):
+        db.session.expire_all()
+        return {stock.name: stock.quantity for stock in Stock.query}
+
+    # parse_order()
+
+    def test_parse_order_adds_up_quantities(self):
+        self.assertEqual(parse_order([{'id': 1}, {'id': 1, 'quantity': 2}, {'id': 2, 'quantity': 3}]),
+                         {1: 3, 2: 3})
+
+    def test_parse_order_rejects_malformed_orders(self):
+        for drinks in ([], 'latte', [{'id': '1'}], [{'id': 1, 'quantity': 0}], [{'id': 1, 'quantity': True}]):
+            with self.assertRaises(ValueError):
+                parse_order(drinks)
+        with self.assertRaises(KeyError):
+            parse_order([{'quantity': 1}])
+
+    # take_stock
+
+    def test_take_stock_never_goes_below_zero(self):
+        connection = db.session.connection()
+        taken = connection.execute(take_stock, {'ingredient': 'milk', 'parts': 4}).rowcount
+        db.session.commit()
+
+        self.assertEqual(taken, 0)
+        self.assertEqual(self.stock()['milk'], 3)
+
+    def test_take_stock_takes_all_that_is_left(self):
+        connection = db.session.connection()
+        taken = connection.execute(take_stock, {'ingredient': 'milk', 'parts': 3}).rowcount
+        db.session.commit()
+
+        self.assertEqual(taken, 1)
+        self.assertEqual(self.stock()['milk'], 0)
+
+    # '/orders', methods=['POST']
+
+    def test_place_order(self):
+        res = self.client.post('/orders', json={'drinks': [{'id': self.latte.id}]}, headers=self.headers)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json['order']['drinks'], [{'id': self.latte.id, 'quantity': 1}])
+        self.assertEqual(self.stock(), {'milk': 1, 'espresso': 0, 'choc': 5})
+
+    def test_409_order_out_of_stock_leaves_stock_unchanged(self):
+        # choc and espresso are taken first, in name order, then milk is short
+        # and they are given back
+        res = self.client.post('/orders', json={'drinks': [{'id': self.latte.id, 'quantity': 1},
+                                                           {'id': self.mocha.id, 'quantity': 2}]},
+                               headers=self.headers)
+
+        self.assertEqual(res.status_code, 409)
+        self.assertEqual(res.json['ingredients'], ['milk'])
+        self.assertEqual(self.stock(), {'milk': 3, 'espresso': 1, 'choc': 5})
+
+    def test_422_order_unknown_drink(self):
+        res = self.client.post('/orders', json={'drinks': [{'id': 1000}]}, headers=self.headers)
+
+        self.assertEqual(res.status_code, 422)
+
+    # '/orders/batch', methods=['POST']
+
+    def test_batch_places_and_refuses_orders_on_their_own(self):
+        res = self.client.post('/orders/batch', json={'orders': [
+            {'drinks': [{'id': self.latte.id}]},
+            {'drinks': [{'id': self.latte.id}]},
+            {'drinks': [{'id': 1000}]},
+            {'drinks': 'latte'},
+            {'drinks': [{'id': self.mocha.id}]}
+        ]}, headers=self.headers)
+        orders = res.json['orders']
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json['placed'], 2)
+        self.assertEqual(orders[0]['drinks'], [{'id': self.latte.id, 'quantity': 1}])
+        self.assertEqual((orders[1]['error'], orders[1]['ingredients']), (409, ['espresso']))
+        self.assertEqual(orders[2]['error'], 422)
+        self.assertIn('unknown drinks', orders[2]['message'])
+        self.assertEqual(orders[3]['error'], 422)
+        self.assertEqual(orders[4]['drinks'], [{'id': self.mocha.id, 'quantity': 1}])
+        self.assertEqual(self.stock(), {'milk': 0, 'espresso': 0, 'choc': 4})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,13 @@
+import os
+import tempfile
+
+from shared_auth.issuer import LocalIssuer
+
+# shared by the test modules that import src.api: a throwaway SQLite file and
+# a local stand-in for Auth0, set before the app reads DATABASE_URL and
+# AUTH0_JWKS_URL, which happens once per process
+database_dir = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(database_dir, 'test.db')
+os.environ['AUTH_AUDIT_LOG'] = ''
+issuer = LocalIssuer('https://coffee-shop-lb.eu.auth0.com/', 'coffee')
+os.environ['AUTH0_JWKS_URL'] = issuer.start()